@@ -2,37 +2,464 @@ from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import os
 import glob
-import tempfile
 import pandas as pd
 import numpy as np
 from werkzeug.utils import secure_filename
 import sys
+import json
+import zipfile
+import threading
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils import process_single_file
 from utils.buy_avg_calculator import BuyAvgReturnCalculator
-from utils.periodic_buy_calculator import PeriodicBuyCalculator
+from utils.periodic_buy_calculator import PeriodicBuyCalculator, PeriodicBuyPrefixIndex
 from utils.product_calculator import ProductNetValueCalculator
-from utils.buy_rules import EveryFridayRule, MonthlyDayRule
+from utils.result_cache import LRUCache
+from utils.run_manifest import content_sha256
+from utils.results_store import ResultsStore
+from utils.interval_index import IntervalQueryIndex
+from utils.excel_style import write_tables
+from utils.holding_period import HoldingPeriodAnalyzer, DEFAULT_HOLDING_DAYS, DEFAULT_PERCENTILES
+from utils.nav_series import NavSeries
+from utils.dca_simulator import DCASimulator
+from utils.buy_rules import parse_rule_spec
+from utils.nav_loader import read_latest_nav
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
 
 ALLOWED_EXTENSIONS = {'txt', 'xlsx', 'xls', 'csv'}
 
+# 设置 RESULT_CACHE_DIR 时结果同时写入磁盘，多个工作进程共享（目录必须只有当前用户可访问，否则拒绝启动）
+# 磁盘缓存按有效期（RESULT_CACHE_TTL 秒，默认1天）和总大小（RESULT_CACHE_MAX_MB，默认512MB）清理
+RESULT_CACHE_DIR = os.environ.get('RESULT_CACHE_DIR') or None
+DISK_CACHE_OPTIONS = {
+    'max_bytes': int(float(os.environ.get('RESULT_CACHE_MAX_MB', '512')) * 1024 * 1024),
+    'ttl': float(os.environ.get('RESULT_CACHE_TTL', str(24 * 3600))),
+}
+
+# 定期买入结果缓存：按 (文件内容哈希, 买入频率) 只计算一次，修改起始日期时直接查询前缀聚合
+# 计算器和前缀索引只在进程内缓存；买入明细表写入磁盘缓存，其他进程读取后重建，不重新计算
+periodic_buy_cache = LRUCache(max_size=32)
+PERIODIC_FREQUENCY_RULES = {'friday': 'friday', 'monthly': 'monthly:20'}  # frequency 参数对应的买入规则
+periodic_buy_tables = LRUCache(max_size=32, disk_dir=RESULT_CACHE_DIR, **DISK_CACHE_OPTIONS)
+
+# 计算结果缓存：result_id -> 原始数值结果表，分页、排序、列筛选直接读取，不重新计算
+computed_results = LRUCache(max_size=64, disk_dir=RESULT_CACHE_DIR, **DISK_CACHE_OPTIONS)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# 结果工作簿：计算完成后在后台线程中按缓存的结果表预先生成，下载时直接返回
+rendered_workbooks = LRUCache(max_size=64, disk_dir=RESULT_CACHE_DIR, **DISK_CACHE_OPTIONS)
+workbook_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('WORKBOOK_THREADS', '2')))
+workbook_jobs = {}  # result_id -> Future（生成中）
+workbook_jobs_lock = threading.Lock()
+
+# 区间指标索引缓存：按文件内容哈希或 (产品代码, 结果库更新时间) 每个产品只构建一次
+interval_index_cache = LRUCache(max_size=32)
+
+# 已解析的净值序列：按文件内容哈希只解析一次，不可变，各接口、各线程的计算器直接共享（不复制、不加锁）
+nav_series_cache = LRUCache(max_size=64)
+
+# 批量计算结果库（calculate.py --store 写入），按产品代码直接查询
+RESULTS_DB = os.environ.get('RESULTS_DB') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'results.db')
+_results_store = None
+
+
+def get_results_store():
+    """结果库（数据库文件不存在时返回None，不自动创建）"""
+    global _results_store
+    if _results_store is None and os.path.exists(RESULTS_DB):
+        _results_store = ResultsStore(RESULTS_DB)
+    return _results_store
+
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def read_upload(file):
+    """
+    读取上传文件内容（直接从请求流读入内存，不落盘）
+
+    Returns:
+        tuple: (安全文件名, 文件内容bytes)
+    """
+    return secure_filename(file.filename), file.read() # type: ignore
+
+
+def get_nav_series(data):
+    """上传内容对应的不可变净值序列（相同内容只解析一次）"""
+    return nav_series_cache.get_or_create(content_sha256(data), lambda: NavSeries.from_file(BytesIO(data)))
+
+
+def make_result_id(data, *params):
+    """由文件内容和计算参数生成结果标识（相同输入得到相同标识，多个工作进程之间一致）"""
+    key = '|'.join([content_sha256(data), *(str(p) for p in params)])
+    return content_sha256(key.encode('utf-8'))[:32]
+
+
+def save_result(result_id, tables, formats=None, download_name=None):
+    """
+    缓存一次计算的原始结果表（命名索引转为普通列）
+
+    Args:
+        result_id: 结果标识
+        tables: {表名: DataFrame}
+        formats: {表名: {列名: 'percent' | 'number'}}，非原始模式输出和生成工作簿时使用
+        download_name: 下载工作簿的文件名
+
+    Returns:
+        dict: 缓存的结果（'result_id', 'tables', 'formats', 'download_name'）
+    """
+    def build():
+        return {
+            'result_id': result_id,
+            'tables': {name: df.reset_index() if df.index.name is not None else df for name, df in tables.items()},
+            'formats': formats or {},
+            'download_name': download_name or f'{result_id}.xlsx',
+        }
+    return computed_results.get_or_create(result_id, build)
+
+
+def format_records(df, formats=None, raw=False):
+    """
+    DataFrame 转为可序列化的记录列表
+
+    Args:
+        df: 结果表
+        formats: {列名: 'percent' | 'number'}
+        raw: 为 True 时返回原始数值，否则按 formats 格式化为字符串（百分比/四位小数）
+
+    Returns:
+        list: 记录列表（NaN 转为 None，日期转为 YYYY-MM-DD）
+    """
+    frame = df.rename(columns=str)
+    for col in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[col]):
+            frame[col] = frame[col].dt.strftime('%Y-%m-%d')
+    frame = frame.astype(object).where(frame.notna(), None)
+    if not raw:
+        for col, kind in (formats or {}).items():
+            if col in frame.columns:
+                template = '{:.4%}' if kind == 'percent' else '{:.4f}'
+                frame[col] = frame[col].map(
+                    lambda x: template.format(x) if isinstance(x, (int, float, np.number)) else x)
+    return frame.to_dict('records')
+
+
+def page_table(df, offset=0, limit=None, columns=None, sort_by=None, ascending=True):
+    """
+    对结果表排序、筛选列并分页
+
+    Returns:
+        tuple: (总行数, 当前页DataFrame)
+    """
+    if sort_by is not None:
+        df = df.sort_values(sort_by, ascending=ascending, kind='stable', na_position='last')
+    if columns:
+        df = df[columns]
+    end = None if limit is None else offset + limit
+    return len(df), df.iloc[offset:end]
+
+
+def table_summaries(result):
+    """各结果表的行数和列名"""
+    return {
+        name: {'total': len(df), 'columns': [str(c) for c in df.columns]}
+        for name, df in result['tables'].items()
+    }
+
+
+def result_tables_payload(result, table_name, page_size=None):
+    """
+    /api/calculate 响应中与结果表相关的字段
+
+    不指定 page_size 时 table_data 为完整表格（与原接口一致）；
+    指定时只返回第一页，其余页通过 /api/results/<result_id>/table 获取。
+    """
+    total, page = page_table(result['tables'][table_name], limit=page_size)
+    payload = {
+        'result_id': result['result_id'],
+        'table_name': table_name,
+        'table_data': format_records(page, result['formats'].get(table_name)),
+        'tables': table_summaries(result),
+    }
+    if page_size:
+        payload.update(table_total=total, page_size=page_size)
+    return payload
+
+
+def render_workbook(result):
+    """由缓存的结果表生成工作簿（不重新计算）"""
+    percent_columns, overrides = {}, {}
+    for name, formats in result['formats'].items():
+        percent_columns[name] = [col for col, kind in formats.items() if kind == 'percent']
+        overrides[name] = {col: '0.0000' for col, kind in formats.items() if kind == 'number'}
+    output = BytesIO()
+    write_tables(output, result['tables'], percent_columns, overrides, padding=4)
+    data = output.getvalue()
+    rendered_workbooks.get_or_create(('workbook', result['result_id']), lambda: data)
+    return data
+
+
+def schedule_workbook(result):
+    """在后台生成结果工作簿（已生成或正在生成时跳过）"""
+    result_id = result['result_id']
+    with workbook_jobs_lock:
+        if result_id in workbook_jobs or ('workbook', result_id) in rendered_workbooks:
+            return
+        future = workbook_executor.submit(render_workbook, result)
+        workbook_jobs[result_id] = future
+    future.add_done_callback(lambda _: workbook_jobs.pop(result_id, None))
+
+
+def get_workbook(result_id):
+    """
+    获取结果工作簿：已生成的直接返回，后台生成中则等待，否则由缓存的结果表立即生成
+
+    Returns:
+        tuple: (工作簿bytes, 下载文件名)；结果不存在或已过期时为 (None, None)
+    """
+    result = computed_results.lookup(result_id)
+    download_name = result['download_name'] if result else f'{result_id}.xlsx'
+    data = rendered_workbooks.lookup(('workbook', result_id))
+    if data is None:
+        job = workbook_jobs.get(result_id)
+        if job is not None:
+            data = job.result()
+        elif result is not None:
+            data = render_workbook(result)
+    return data, download_name if data is not None else None
+
+
+def unique_name(name, used):
+    """ZIP 内文件名去重（同名时追加序号）"""
+    base, ext = os.path.splitext(name)
+    candidate, i = name, 1
+    while candidate in used:
+        i += 1
+        candidate = f'{base}_{i}{ext}'
+    used.add(candidate)
+    return candidate
+
+
+def parse_intervals(value):
+    """
+    解析区间列表参数（JSON）
+
+    支持 [["2020-01-01", "2020-12-31"], ...] 或 [{"start_date": ..., "end_date": ...}, ...]
+
+    Returns:
+        tuple: (起始日期列表, 结束日期列表)
+    """
+    intervals = json.loads(value) if isinstance(value, str) else value
+    starts, ends = [], []
+    for item in intervals or []:
+        if isinstance(item, dict):
+            starts.append(item['start_date'])
+            ends.append(item['end_date'])
+        else:
+            start, end = item
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def parse_start_dates(value):
+    """解析多个起始日期参数（JSON数组或逗号分隔字符串）"""
+    if not value:
+        return []
+    try:
+        dates = json.loads(value)
+        if not isinstance(dates, list):
+            dates = [dates]
+    except ValueError:
+        dates = value.split(',')
+    return [str(d).strip() for d in dates if str(d).strip()]
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
     return jsonify({'status': 'ok', 'message': 'API is running'})
 
 
+@app.route('/api/products', methods=['GET'])
+def list_products():
+    """结果库中的全部产品"""
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': '结果库不存在，请先运行 calculate.py --store'}), 404
+    return jsonify({'products': store.list_products()})
+
+
+@app.route('/api/products/<product_code>', methods=['GET'])
+def get_product(product_code):
+    """
+    按产品代码查询批量计算的业绩指标和结果表（无需上传文件）
+
+    查询参数:
+        tables: 只返回指定的结果表（逗号分隔，可选）
+        nav: 为 1 时同时返回净值序列，可配合 start_date/end_date 限定范围
+    """
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': '结果库不存在，请先运行 calculate.py --store'}), 404
+
+    tables = request.args.get('tables')
+    result = store.get_product(product_code, tables.split(',') if tables else None)
+    if result is None:
+        return jsonify({'error': f'未找到产品: {product_code}'}), 404
+
+    if request.args.get('nav') == '1':
+        result['nav_history'] = store.get_nav_history(
+            product_code, request.args.get('start_date'), request.args.get('end_date'))
+    return jsonify(result)
+
+
+@app.route('/api/interval-metrics', methods=['POST'])
+def interval_metrics():
+    """
+    批量查询任意区间的收益率、年化波动率、最高/最低净值和最大回撤
+
+    净值来源二选一：
+        file: 上传的净值文件
+        product_code: 结果库中的产品代码
+
+    参数:
+        intervals: JSON 区间列表，[["开始日期", "结束日期"], ...] 或 [{"start_date", "end_date"}, ...]
+    """
+    try:
+        payload = request.get_json(silent=True) or request.form
+        starts, ends = parse_intervals(payload.get('intervals'))
+    except (ValueError, KeyError, TypeError):
+        return jsonify({'error': 'intervals 格式错误'}), 400
+    if not starts:
+        return jsonify({'error': '请提供 intervals'}), 400
+
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '' or not allowed_file(file.filename):
+            return jsonify({'error': '不支持的文件格式'}), 400
+        _, data = read_upload(file)
+        index = interval_index_cache.get_or_create(
+            ('file', content_sha256(data)), lambda: IntervalQueryIndex.from_file(get_nav_series(data)))
+    else:
+        product_code = payload.get('product_code')
+        if not product_code:
+            return jsonify({'error': '请上传文件或提供 product_code'}), 400
+        store = get_results_store()
+        product = store.get_product(product_code, tables=[]) if store is not None else None
+        if product is None:
+            return jsonify({'error': f'未找到产品: {product_code}'}), 404
+
+        def build():
+            history = [row for row in store.get_nav_history(product_code) if row['unit_nav'] is not None]
+            return IntervalQueryIndex([row['date'] for row in history], [row['unit_nav'] for row in history])
+
+        index = interval_index_cache.get_or_create(('product', product_code, product['updated_at']), build)
+
+    try:
+        result = index.query(starts, ends)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': f'日期格式错误: {e}'}), 400
+    result = result.astype(object).where(result.notna(), None)
+    return jsonify({'success': True, 'count': len(result), 'results': result.to_dict('records')})
+
+
+@app.route('/api/holding-period', methods=['POST'])
+def holding_period():
+    """
+    持有期收益分布：任意一天买入、持有N天的盈利概率、收益率分位数和最差情况
+
+    参数:
+        file: 净值文件
+        days: 持有天数（JSON数组或逗号分隔，默认 30,90,180,365,730）
+        percentiles: 分位数（JSON数组或逗号分隔，默认 5,25,50,75,95）
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': '没有上传文件'}), 400
+    file = request.files['file']
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': '不支持的文件格式'}), 400
+
+    try:
+        days = [int(d) for d in parse_start_dates(request.form.get('days'))] or list(DEFAULT_HOLDING_DAYS)
+        percentiles = [float(p) for p in parse_start_dates(request.form.get('percentiles'))] or \
+            list(DEFAULT_PERCENTILES)
+        _, data = read_upload(file)
+        analyzer = HoldingPeriodAnalyzer(get_nav_series(data), days)
+        distribution = analyzer.get_distribution(percentiles).reset_index()
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'计算失败: {str(e)}'}), 500
+
+    distribution = distribution.astype(object).where(distribution.notna(), None)
+    return jsonify({
+        'success': True,
+        'product_info': analyzer.get_product_info(),
+        'distribution': distribution.to_dict('records'),
+        'worst_cases': analyzer.get_worst_cases().to_dict('records'),
+    })
+
+
+@app.route('/api/dca', methods=['POST'])
+def dca_simulation():
+    """
+    定投模拟：按买入规则每次投入固定金额，计算各起始日期的累计投入、期末市值、累计收益率和XIRR
+
+    参数:
+        file: 净值文件
+        rule: 买入规则描述（默认 friday，如 monthly:20、monthly:20:roll、weekly:0、expr:last(M)）
+        amount: 每次定投金额（默认 1000）
+        start_dates: 起始日期（JSON数组或逗号分隔，默认数据首日）
+        end_date: 估值截止日期（可选，默认最新净值日期）
+        path: 为 true 时同时返回第一个起始日期的每日持仓路径（含XIRR）
+    """
+    if 'file' not in request.files:
+        return jsonify({'error': '没有上传文件'}), 400
+    file = request.files['file']
+    if file.filename == '' or not allowed_file(file.filename):
+        return jsonify({'error': '不支持的文件格式'}), 400
+
+    try:
+        buy_rule = parse_rule_spec(request.form.get('rule') or 'friday')
+        amount = float(request.form.get('amount') or 1000)
+        end_date = request.form.get('end_date') or None
+        _, data = read_upload(file)
+        simulator = DCASimulator(get_nav_series(data), amount)
+        if len(simulator.trading_days) == 0:
+            return jsonify({'error': '文件中没有净值数据'}), 400
+        start_dates = parse_start_dates(request.form.get('start_dates')) or [simulator.trading_days[0]]
+        summary = simulator.sweep_start_dates(buy_rule, start_dates, end_date)
+        path = None
+        if str(request.form.get('path', '')).lower() in ('1', 'true', 'yes'):
+            path = simulator.simulate(buy_rule, start_dates[0], end_date, with_xirr_path=True).reset_index()
+            path['日期'] = path['日期'].dt.strftime('%Y-%m-%d')
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'计算失败: {str(e)}'}), 500
+
+    summary = summary.astype(object).where(summary.notna(), None)
+    result = {
+        'success': True,
+        'rule_name': buy_rule.get_rule_name(),
+        'summary': summary.to_dict('records'),
+    }
+    if path is not None:
+        result['path'] = path.astype(object).where(path.notna(), None).to_dict('records')
+    return jsonify(result)
+
+
 @app.route('/api/file-info', methods=['POST'])
 def file_info():
     """获取上传文件的信息（用于诊断）"""
@@ -44,31 +471,28 @@ def file_info():
         if file.filename == '':
             return jsonify({'error': '文件名为空'}), 400
         
-        # 保存临时文件
-        filename = secure_filename(file.filename) # type: ignore
-        temp_dir = tempfile.mkdtemp()
-        filepath = os.path.join(temp_dir, filename)
-        file.save(filepath)
+        # 读取上传内容（不落盘）
+        filename, data = read_upload(file)
         
         # 读取文件信息
         info = {
             'filename': filename,
-            'file_size': os.path.getsize(filepath),
+            'file_size': len(data),
         }
         
         # 尝试读取数据并获取列名
         try:
             if filename.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(filepath, nrows=1)
+                df = pd.read_excel(BytesIO(data), nrows=1)
             else:
                 # 尝试多种分隔符
                 try:
-                    df = pd.read_csv(filepath, sep='\t', nrows=1, encoding='utf-8')
+                    df = pd.read_csv(BytesIO(data), sep='\t', nrows=1, encoding='utf-8')
                 except:
                     try:
-                        df = pd.read_csv(filepath, sep=',', nrows=1, encoding='utf-8')
+                        df = pd.read_csv(BytesIO(data), sep=',', nrows=1, encoding='utf-8')
                     except:
-                        df = pd.read_csv(filepath, nrows=1, encoding='utf-8')
+                        df = pd.read_csv(BytesIO(data), nrows=1, encoding='utf-8')
             
             info['columns'] = list(df.columns)
             info['shape'] = df.shape
@@ -76,12 +500,18 @@ def file_info():
             info['preview'] = df.to_dict('records')
         except Exception as e:
             info['error'] = f"无法读取数据: {str(e)}"
-        
-        # 清理临时文件
+
+        # 标准净值文件：产品信息和最新净值（倒序文件只读取顶部几行，不解析全部历史；非净值文件时忽略）
         try:
-            os.remove(filepath)
-            os.rmdir(temp_dir)
-        except:
+            latest = read_latest_nav(BytesIO(data))
+            info['product'] = {
+                'name': latest['name'],
+                'code': latest['code'],
+                'latest_nav_date': latest['date'].strftime('%Y-%m-%d') if latest['date'] is not None else None,
+                'latest_nav': latest['unit_nav'],
+                'latest_cum_nav': latest['cum_nav'],
+            }
+        except Exception:
             pass
         
         return jsonify(info)
@@ -108,30 +538,42 @@ def calculate():
         # 获取参数
         calc_type = request.form.get('type', 'buy_avg')
         frequency = request.form.get('frequency', 'friday')
+        rule_spec = request.form.get('rule')  # 可选：买入规则描述，优先于 frequency（见 parse_rule_spec）
         start_date = request.form.get('start_date')  # 初始日期
+        start_dates = parse_start_dates(request.form.get('start_dates'))  # 批量起始日期
+        page_size = request.form.get('page_size')  # 可选：table_data 只返回第一页
+        try:
+            page_size = int(page_size) if page_size else None
+        except ValueError:
+            return jsonify({'error': 'page_size 必须为整数'}), 400
+        if page_size is not None and not 1 <= page_size <= MAX_PAGE_SIZE:
+            return jsonify({'error': f'page_size 必须在 1-{MAX_PAGE_SIZE} 之间'}), 400
         
-        # 保存临时文件
-        filename = secure_filename(file.filename) # type: ignore
-        temp_dir = tempfile.mkdtemp()
-        filepath = os.path.join(temp_dir, filename)
-        file.save(filepath)
+        # 读取上传内容（直接在内存中解析，不落盘）
+        filename, data = read_upload(file)
         
         # 根据类型执行不同的计算
         if calc_type == 'buy_avg':
-            result = calculate_buy_avg(filepath, frequency)
+            result = calculate_buy_avg(data, frequency, page_size)
         elif calc_type == 'periodic_buy':
-            result = calculate_periodic_buy(filepath, frequency, start_date)
+            rule_spec = (rule_spec or PERIODIC_FREQUENCY_RULES.get(frequency, '')).strip()
+            if not rule_spec:
+                return jsonify({'error': f"未知的买入频率: {frequency}，请使用 {'/'.join(PERIODIC_FREQUENCY_RULES)} 或通过 rule 指定买入规则"}), 400
+            try:
+                parse_rule_spec(rule_spec)
+            except ValueError as e:
+                return jsonify({'error': f'买入规则错误: {e}'}), 400
+            result = calculate_periodic_buy(data, rule_spec, start_date, start_dates, page_size)
         elif calc_type == 'calculate':
-            result = calculate_normal(filepath, frequency)
+            result = calculate_normal(data, frequency, page_size)
         else:
             return jsonify({'error': '未知的计算类型'}), 400
-        
-        # 清理临时文件
-        try:
-            os.remove(filepath)
-            os.rmdir(temp_dir)
-        except:
-            pass
+
+        # 后台预先生成结果工作簿，点击下载时直接返回
+        stored = computed_results.lookup(result['result_id'])
+        if stored is not None:
+            schedule_workbook(stored)
+        result['download_url'] = f"/api/download-excel/{result['result_id']}"
         
         return jsonify(result)
     
@@ -141,50 +583,43 @@ def calculate():
         return jsonify({'error': str(e)}), 500
 
 
-def calculate_buy_avg(filepath, frequency):
+def calculate_buy_avg(data, frequency, page_size=None):
     """计算买入平均收益 - 计算每月20日开放日以来的收益（与频率无关）"""
     try:
-        # BuyAvgReturnCalculator 只需要文件路径，不需要频率参数
-        # 它始终计算每月20日开放日以来的收益
-        calculator = BuyAvgReturnCalculator(filepath) # type: ignore
-        
-        # 调用计算方法
-        calculator.get_open_day_data() # type: ignore
-        calculator.calculate_returns_since_open_day() # type: ignore
-        result_dict = calculator.results # type: ignore
+        # BuyAvgReturnCalculator 只需要净值序列，不需要频率参数
+        # 它始终计算每月20日开放日以来的收益；结果由 compute() 返回，不写入计算器
+        calculator = BuyAvgReturnCalculator(get_nav_series(data))
+        open_day_df, results = calculator.compute()
         
         # 获取产品信息
         product_info = calculator.get_product_info()
         
         # 生成输出文本
-        output_text = calculator.generate_output_text()
-        
-        # 生成表格数据（买入开放日的平均收益）
-        table_data = []
-        if hasattr(calculator, 'open_day_df') and isinstance(calculator.open_day_df, pd.DataFrame) and calculator.results:
-            # 创建包含收益率的表格
-            records = []
-            for idx, row in calculator.open_day_df.iterrows():
-                year = idx.year # type: ignore
-                month = idx.month # type: ignore
-                
-                # 从 results 字典中获取收益率
-                return_rate = calculator.results.get(year, {}).get(month, 0)
-                
-                records.append({
-                    '日期': idx.strftime('%Y-%m-%d'), # type: ignore
-                    '年': year,
-                    '月': month,
-                    '开放日净值': f"{row['单位净值']:.4f}",
-                    '买入收益率': f"{return_rate*100:.4f}%"
-                })
-            
-            table_data = records
+        output_text = calculator.generate_output_text(results)
+        
+        # 生成表格数据（买入开放日的平均收益），保存原始数值，格式化在输出时进行
+        table = pd.DataFrame(columns=['日期', '年', '月', '开放日净值', '买入收益率'])
+        if isinstance(open_day_df, pd.DataFrame) and not open_day_df.empty and results:
+            open_days = pd.DatetimeIndex(open_day_df.index)
+            table = pd.DataFrame({
+                '日期': open_days.strftime('%Y-%m-%d'),
+                '年': open_days.year,
+                '月': open_days.month,
+                '开放日净值': pd.to_numeric(open_day_df['单位净值'], errors='coerce').to_numpy(),
+                '买入收益率': [results.get(d.year, {}).get(d.month, 0) for d in open_days],
+            })
+
+        stored = save_result(
+            make_result_id(data, 'buy_avg'),
+            {'开放日收益': table},
+            {'开放日收益': {'开放日净值': 'number', '买入收益率': 'percent'}},
+            download_name=f"{product_info.get('name', '产品')}_买入平均收益.xlsx",
+        )
         
         return {
             'success': True,
             'output': output_text,
-            'table_data': table_data,
+            **result_tables_payload(stored, '开放日收益', page_size),
             'summary': f"计算完成：{product_info.get('name', '产品')} 的每月20日开放日买入平均收益",
             'filename': f'买入平均收益.txt'
         }
@@ -192,70 +627,93 @@ def calculate_buy_avg(filepath, frequency):
         raise Exception(f"买入平均收益计算失败: {str(e)}")
 
 
-def calculate_periodic_buy(filepath, frequency, start_date):
-    """计算定期买入收益 - 根据指定频率的买入规则计算收益"""
+def get_periodic_buy_results(data, rule_spec):
+    """
+    获取定期买入的全历史结果和前缀聚合索引（按文件内容和买入规则缓存）
+
+    Args:
+        data: 上传文件内容
+        rule_spec: 买入规则描述（如 friday、monthly:20、expr:last(M)，见 parse_rule_spec）
+
+    Returns:
+        tuple: (calculator, PeriodicBuyPrefixIndex)
+    """
+    buy_rule = parse_rule_spec(rule_spec)
+    key = (content_sha256(data), rule_spec)
+
+    def compute():
+        # 初始化计算器 - 共享已解析的净值序列；计算完成后计算器只读，缓存后供各请求共用
+        calculator = PeriodicBuyCalculator(get_nav_series(data), buy_rule)
+        results_df = calculator.calculate_buy_returns(periodic_buy_tables.lookup(key))
+        periodic_buy_tables.get_or_create(key, lambda: results_df)
+        return calculator, PeriodicBuyPrefixIndex(results_df)
+
+    return periodic_buy_cache.get_or_create(key, compute)
+
+
+def calculate_periodic_buy(data, rule_spec, start_date, start_dates=None, page_size=None):
+    """计算定期买入收益 - 根据买入规则描述计算收益"""
     try:
-        # 根据频率参数选择买入规则
-        if frequency == 'friday':
-            buy_rule = EveryFridayRule()
-        elif frequency == 'monthly':
-            buy_rule = MonthlyDayRule(day=20)
-        else:
-            buy_rule = EveryFridayRule()  # 默认使用每周五规则
-        
-        # 初始化计算器 - PeriodicBuyCalculator 需要 file_path 和 buy_rule
-        calculator = PeriodicBuyCalculator(filepath, buy_rule) # type: ignore
+        calculator, prefix_index = get_periodic_buy_results(data, rule_spec)
+        rule_name = calculator.buy_rule.get_rule_name()
         
-        # 调用计算方法
-        results_df = calculator.calculate_buy_returns()
-        
-        # 如果指定了初始日期，过滤掉初始日期之前的买入记录
-        if start_date and isinstance(results_df, pd.DataFrame) and not results_df.empty:
-            start_date_obj = pd.to_datetime(start_date) # type: ignore
-            results_df = results_df[pd.to_datetime(results_df['买入日期']) >= start_date_obj] # type: ignore
+        # 如果指定了初始日期，取初始日期及之后的买入记录（二分查找，无需重新计算）
+        results_df = prefix_index.slice(start_date or None)
         
         # 获取产品信息
         product_info = calculator.get_product_info()
         
-        # 生成格式化输出文本
-        output_text = calculator.format_output_text(preview_count=20)
-        
-        # 生成完整表格数据 - 格式化收益率为百分比
-        table_data = []
-        if isinstance(results_df, pd.DataFrame):
-            df_display = results_df.copy()
-            # 格式化收益率列为百分比（4位小数）
-            for col in df_display.columns:
-                if '收益' in col or '收益率' in col:
-                    df_display[col] = df_display[col].apply(lambda x: f"{x*100:.4f}%")
-                elif col == '每日涨跌幅':
-                    df_display[col] = df_display[col].apply(lambda x: f"{x*100:.4f}%")
-            table_data = df_display.reset_index().to_dict('records')
+        # 生成格式化输出文本（基于筛选后的结果，不会触发重新计算）
+        output_text = calculator.format_output_text(preview_count=20, results_df=results_df)
+        
+        # 缓存原始数值结果表，收益率列在输出时格式化为百分比（4位小数）
+        table = results_df.reset_index(drop=True) if isinstance(results_df, pd.DataFrame) else pd.DataFrame()
+        percent_columns = {col: 'percent' for col in table.columns
+                           if '收益' in str(col) or col == '每日涨跌幅'}
+        stored = save_result(
+            make_result_id(data, 'periodic_buy', rule_spec, start_date or ''),
+            {'买入明细': table},
+            {'买入明细': percent_columns},
+            download_name=f"{product_info.get('name', '产品')}_定期买入_{rule_spec}.xlsx",
+        )
         
         # 计算汇总信息
         total_purchases = len(results_df) if isinstance(results_df, pd.DataFrame) else 0
         avg_return = results_df['区间收益率'].mean() if isinstance(results_df, pd.DataFrame) and '区间收益率' in results_df.columns else 0
         
-        return {
+        result = {
             'success': True,
             'output': output_text,
-            'table_data': table_data,
-            'summary': f"定期买入计算完成: 买入规则={frequency}, 共 {total_purchases} 次买入，平均收益率 {avg_return*100:.4f}%",
-            'filename': f'定期买入_{frequency}.txt'
+            **result_tables_payload(stored, '买入明细', page_size),
+            'summary': f"定期买入计算完成: 买入规则={rule_name}, 共 {total_purchases} 次买入，平均收益率 {avg_return*100:.4f}%",
+            'filename': f'定期买入_{rule_spec}.txt'
         }
+
+        # 批量起始日期：每个日期 O(log n) 查询买入次数和平均收益
+        if start_dates:
+            sweep_df = prefix_index.query(start_dates)
+            result['start_date_sweep'] = [
+                {
+                    'start_date': row['起始日期'],
+                    'count': int(row['买入次数']),
+                    'avg_return': None if pd.isna(row['平均区间收益率']) else float(row['平均区间收益率']),
+                    'avg_annualized_return': None if pd.isna(row['平均区间年化收益率']) else float(row['平均区间年化收益率']),
+                }
+                for _, row in sweep_df.iterrows()
+            ]
+
+        return result
     except Exception as e:
         raise Exception(f"定期买入计算失败: {str(e)}")
 
 
-def calculate_normal(filepath, frequency):
+def calculate_normal(data, frequency, page_size=None):
     """常规计算 - 产品净值和业绩指标（与频率无关）"""
     try:
-        # ProductNetValueCalculator 只需要文件路径和可选的 risk_free_rate
-        # 不需要频率参数，计算的是所有业绩指标
-        calculator = ProductNetValueCalculator(filepath)
-        
-        # 执行计算
-        calculator.run_all_calculations()
+        # ProductNetValueCalculator 只需要净值序列和可选的 risk_free_rate
+        # 不需要频率参数，计算的是所有业绩指标；指标由 compute() 返回，不写入计算器
+        calculator = ProductNetValueCalculator(get_nav_series(data))
+        metrics = calculator.compute()
         
         # 获取产品信息 - 返回元组 (product_name, latest_nav_date, latest_nav)
         product_name, latest_nav_date, latest_nav = calculator.get_product_info()
@@ -266,12 +724,10 @@ def calculate_normal(filepath, frequency):
         if not latest_nav:
             latest_nav = '未知'
         
-        # 构建所有数据表
-        metrics_df = calculator.build_metrics_df()
-        annual_returns_df = calculator.get_annual_returns()
-        weekly_dd = calculator.get_annual_max_drawdown(monthly=False)
-        monthly_dd = calculator.get_annual_max_drawdown(monthly=True)
-        monthly_matrix = calculator.get_monthly_return_matrix()
+        # 构建所有数据表（与Excel各工作表相同）并缓存
+        stored = save_result(make_result_id(data, 'calculate'), calculator.build_tables(metrics),
+                             download_name=f'{product_name}_净值计算.xlsx')
+        metrics_df = stored['tables']['业绩指标计算']
         
         # 生成输出文本
         output_lines = []
@@ -301,82 +757,16 @@ def calculate_normal(filepath, frequency):
         
         output_text = "\n".join(output_lines)
         
-        # 生成多个sheet的数据，确保可序列化
-        def df_to_records(df, sheet_name=""):
-            """将DataFrame安全地转换为可序列化的记录列表"""
-            if df is None:
-                print(f"警告: {sheet_name} 为None")
-                return []
-            if not isinstance(df, pd.DataFrame):
-                print(f"警告: {sheet_name} 不是DataFrame，类型为{type(df)}")
-                return []
-            if df.empty:
-                print(f"警告: {sheet_name} 为空DataFrame")
-                return []
-            
-            try:
-                # 重置索引，确保索引变成列
-                df_reset = df.reset_index(drop=True) if df.index.name or any(df.index != range(len(df))) else df.copy()
-                print(f"DEBUG {sheet_name}: 重置索引后有 {len(df_reset)} 行，列为 {list(df_reset.columns)}")
-                
-                # 将所有值转换为Python原生类型，处理NaN和日期
-                records = []
-                for idx, row in df_reset.iterrows():
-                    record = {}
-                    for col, val in row.items():
-                        col_name = str(col)
-                        # 处理NaN
-                        if pd.isna(val):
-                            record[col_name] = None
-                        # 处理日期时间
-                        elif isinstance(val, (pd.Timestamp, pd.datetime64)): # type: ignore
-                            try:
-                                record[col_name] = str(val.date()) if hasattr(val, 'date') else str(val)
-                            except:
-                                record[col_name] = str(val)
-                        # 处理numpy类型
-                        elif isinstance(val, (np.integer, np.floating)):
-                            record[col_name] = float(val) if isinstance(val, np.floating) else int(val)
-                        # 处理其他numpy类型
-                        elif isinstance(val, np.ndarray):
-                            record[col_name] = val.tolist()
-                        else:
-                            record[col_name] = val
-                    records.append(record)
-                
-                print(f"DEBUG {sheet_name}: 转换成功，共 {len(records)} 条记录")
-                return records
-            except Exception as e:
-                print(f"ERROR {sheet_name}: 转换DataFrame失败: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                return []
-        
-        # 生成多个sheet的数据
+        # 生成多个sheet的数据（原始数值，指定 page_size 时每个表只返回第一页）
         sheets_data = {
-            '业绩指标计算': df_to_records(metrics_df, '业绩指标计算'),
-            '年度收益率': df_to_records(annual_returns_df, '年度收益率'),
-            '周频计算历史最大回撤': df_to_records(weekly_dd, '周频计算历史最大回撤'),
-            '月频计算历史最大回撤': df_to_records(monthly_dd, '月频计算历史最大回撤'),
-            '成立以来月度收益': df_to_records(monthly_matrix, '成立以来月度收益')
+            name: format_records(page_table(df, limit=page_size)[1], raw=True)
+            for name, df in stored['tables'].items()
         }
         
-        # 调试日志
-        print(f"\n=== sheets_data summary ===")
-        print(f"sheets_data keys: {sheets_data.keys()}")
-        for key, data in sheets_data.items():
-            if isinstance(data, list):
-                print(f"{key}: {len(data)} records")
-                if data:
-                    print(f"  First record columns: {list(data[0].keys())}")
-            else:
-                print(f"{key}: INVALID TYPE {type(data)}")
-        print(f"============================\n")
-        
         return {
             'success': True,
             'output': output_text,
-            'table_data': metrics_df.to_dict('records') if isinstance(metrics_df, pd.DataFrame) and not metrics_df.empty else [],
+            **result_tables_payload(stored, '业绩指标计算', page_size),
             'sheets_data': sheets_data,
             'product_name': product_name,
             'summary': f"净值计算完成：{product_name}",
@@ -386,60 +776,150 @@ def calculate_normal(filepath, frequency):
         raise Exception(f"常规计算失败: {str(e)}")
 
 
+@app.route('/api/results/<result_id>', methods=['GET'])
+def get_result(result_id):
+    """查询已缓存计算结果的各表行数和列名"""
+    result = computed_results.lookup(result_id)
+    if result is None:
+        return jsonify({'error': '结果不存在或已过期，请重新计算'}), 404
+    return jsonify({'success': True, 'result_id': result_id, 'tables': table_summaries(result)})
+
+
+@app.route('/api/results/<result_id>/table', methods=['GET'])
+def get_result_table(result_id):
+    """
+    分页读取已缓存的计算结果表（不重新计算）
+
+    查询参数:
+        name: 表名（默认第一个表）
+        offset: 起始行（默认 0）
+        limit: 每页行数（默认 50，最多 1000）
+        columns: 只返回指定列（逗号分隔）
+        sort_by: 排序列（按原始数值排序）
+        order: asc / desc（默认 asc）
+        raw: 为 1 时返回原始数值，否则百分比等列格式化为字符串
+    """
+    result = computed_results.lookup(result_id)
+    if result is None:
+        return jsonify({'error': '结果不存在或已过期，请重新计算'}), 404
+
+    tables = result['tables']
+    name = request.args.get('name') or next(iter(tables), None)
+    if name not in tables:
+        return jsonify({'error': f'未找到结果表: {name}，可用: {list(tables)}'}), 404
+    df = tables[name].rename(columns=str)
+
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'offset 和 limit 必须为整数'}), 400
+    if offset < 0 or not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({'error': f'offset 不能为负数，limit 必须在 1-{MAX_PAGE_SIZE} 之间'}), 400
+
+    columns = [c for c in (request.args.get('columns') or '').split(',') if c]
+    sort_by = request.args.get('sort_by') or None
+    order = request.args.get('order', 'asc').lower()
+    unknown = [c for c in columns + ([sort_by] if sort_by else []) if c not in df.columns]
+    if unknown:
+        return jsonify({'error': f'未知的列: {unknown}'}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order 必须为 asc 或 desc'}), 400
+
+    total, page = page_table(df, offset, limit, columns, sort_by, ascending=order == 'asc')
+    return jsonify({
+        'success': True,
+        'result_id': result_id,
+        'name': name,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'columns': [str(c) for c in page.columns],
+        'rows': format_records(page, result['formats'].get(name), raw=request.args.get('raw') == '1'),
+    })
+
+
 @app.route('/api/download-excel', methods=['POST'])
 def download_excel():
-    """下载Excel文件"""
+    """下载Excel文件（上传文件方式，保留兼容；已计算过的文件直接使用缓存的结果）"""
     try:
         if 'file' not in request.files:
             return jsonify({'error': '未上传文件'}), 400
         
-        frequency = request.form.get('frequency', 'daily')
-        
         file = request.files['file']
         if file.filename == '':
             return jsonify({'error': '文件名为空'}), 400
         
-        # 保存临时文件
-        filename = secure_filename(file.filename) # type: ignore
-        temp_dir = tempfile.mkdtemp()
-        filepath = os.path.join(temp_dir, filename)
-        file.save(filepath)
-        
-        try:
-            # 执行常规计算
-            calculator = ProductNetValueCalculator(filepath)
-            calculator.run_all_calculations()
-            
-            # 获取产品信息
-            product_info = calculator.get_product_info()
-            if product_info:
-                product_name, latest_nav_date, latest_nav = product_info
-            else:
-                product_name = '产品'
-            
-            # 保存到临时Excel文件
-            output_file = os.path.join(temp_dir, 'output.xlsx')
-            calculator.save_to_excel(output_file)
-            
-            # 读取文件并返回
-            with open(output_file, 'rb') as f:
-                file_data = f.read()
-            
-            # 返回文件
-            response = send_file(
-                BytesIO(file_data),
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                as_attachment=True,
-                download_name=f'{product_name}_净值计算.xlsx'
-            )
-            return response
-        finally:
-            # 清理临时文件
-            import shutil
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        # 读取上传内容（不落盘）
+        filename, data = read_upload(file)
+        
+        # 相同文件内容已经计算过时直接复用结果，否则执行常规计算
+        result_id = make_result_id(data, 'calculate')
+        if computed_results.lookup(result_id) is None:
+            calculate_normal(data, None)
+        workbook, download_name = get_workbook(result_id)
+        if workbook is None:
+            return jsonify({'error': '下载失败: 结果生成失败'}), 500
+        
+        return send_file(
+            BytesIO(workbook),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=download_name
+        )
+    except Exception as e:
+        return jsonify({'error': f'下载失败: {str(e)}'}), 500
+
+
+@app.route('/api/download-excel/zip', methods=['GET', 'POST'])
+def download_excel_zip():
+    """
+    多个计算结果打包为一个ZIP下载
+
+    参数:
+        ids: 结果标识（查询参数逗号分隔，或 JSON {"result_ids": [...]}）
+    """
+    payload = request.get_json(silent=True) or {}
+    result_ids = payload.get('result_ids') or [i for i in (request.args.get('ids') or '').split(',') if i]
+    if not result_ids:
+        return jsonify({'error': '请提供结果标识 ids'}), 400
+
+    try:
+        workbooks = [(result_id, *get_workbook(result_id)) for result_id in result_ids]
+    except Exception as e:
+        return jsonify({'error': f'下载失败: {str(e)}'}), 500
+    missing = [result_id for result_id, data, _ in workbooks if data is None]
+    if missing:
+        return jsonify({'error': '结果不存在或已过期，请重新计算', 'missing': missing}), 404
+
+    output = BytesIO()
+    used = set()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for _, data, download_name in workbooks:
+            zf.writestr(unique_name(download_name, used), data)
+    output.seek(0)
+    return send_file(output, mimetype='application/zip', as_attachment=True, download_name='计算结果.zip')
+
+
+@app.route('/api/download-excel/<result_id>', methods=['GET'])
+def download_excel_by_id(result_id):
+    """按结果标识下载Excel（使用后台预先生成的工作簿，不重新计算）"""
+    try:
+        workbook, download_name = get_workbook(result_id)
     except Exception as e:
         return jsonify({'error': f'下载失败: {str(e)}'}), 500
+    if workbook is None:
+        return jsonify({'error': '结果不存在或已过期，请重新计算'}), 404
+    return send_file(
+        BytesIO(workbook),
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=download_name
+    )
 
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # 本地开发服务器；生产环境使用 gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(debug=os.environ.get('FLASK_DEBUG', '0') == '1',
+            host=os.environ.get('HOST', '0.0.0.0'),
+            port=int(os.environ.get('PORT', '5000')))
@@ -0,0 +1,43 @@
+"""
+gunicorn 配置 - 生产环境多进程 + 多线程服务
+
+    cd backend
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+所有参数都可以通过环境变量覆盖：
+- BIND: 监听地址（默认 0.0.0.0:5000）
+- WEB_CONCURRENCY: 工作进程数（默认 CPU核数 + 1，最多 8）
+- GUNICORN_THREADS: 每个进程的线程数（默认 4）
+- GUNICORN_TIMEOUT: 单个请求超时秒数（默认 120）
+- GUNICORN_MAX_REQUESTS: 进程处理多少个请求后重启，释放内存（默认 1000，0 表示不重启）
+- RESULT_CACHE_DIR: 工作进程共享的结果缓存目录（默认项目 output/result_cache；必须只有运行服务的用户可访问）
+- RESULT_CACHE_MAX_MB / RESULT_CACHE_TTL: 磁盘缓存总大小上限（MB，默认 512）和有效期（秒，默认 86400）
+"""
+import os
+import multiprocessing
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# 计算以 pandas/numpy 为主（大部分时间释放GIL），进程 × 线程 兼顾CPU和并发上传
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# 周期性重启工作进程，避免长期运行后的内存增长
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+# 主进程中导入应用并预热 pandas/openpyxl，工作进程 fork 后直接共享
+preload_app = True
+
+# 工作进程之间通过磁盘缓存共享计算结果（需在导入应用之前设置）
+# 不使用系统临时目录等公共可写位置：其他用户可能预先创建目录并放入缓存文件
+os.environ.setdefault('RESULT_CACHE_DIR', os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'result_cache'))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
@@ -0,0 +1,49 @@
+"""净值文件部分读取（read_nav_head）的测试"""
+import os
+import sys
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.nav_loader import read_nav_head, load_nav_file
+
+
+def _write_nav_file(path, dates):
+    """按给定日期顺序写一个标准格式的净值文件"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['测试产品', 'TEST001'])
+    sheet.append(['日期', '单位净值', '累计净值'])
+    for i, date in enumerate(dates):
+        nav = 1 + i / 100
+        sheet.append([int(date.strftime('%Y%m%d')), nav, nav])
+    workbook.save(path)
+    return str(path)
+
+
+def _dates():
+    return pd.bdate_range('2025-11-03', '2026-01-16')
+
+
+def test_stop_date_on_ascending_file(tmp_path):
+    file_path = _write_nav_file(tmp_path / '升序.xlsx', _dates())
+    _, _, full = load_nav_file(file_path)
+
+    _, _, head = read_nav_head(file_path, stop_date='2025-12-01')
+
+    expected = full[full.index > '2025-12-01']
+    assert len(head) == len(expected) > 0
+    assert head.index.equals(expected.index)
+
+
+def test_stop_date_and_max_rows_on_descending_file(tmp_path):
+    file_path = _write_nav_file(tmp_path / '倒序.xlsx', _dates()[::-1])
+    _, _, full = load_nav_file(file_path)
+
+    _, _, head = read_nav_head(file_path, stop_date='2025-12-01')
+    assert head.index.equals(full[full.index > '2025-12-01'].index)
+
+    _, _, latest = read_nav_head(file_path, max_rows=1)
+    assert latest.index.equals(full.index[-1:])
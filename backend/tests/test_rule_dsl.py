@@ -0,0 +1,94 @@
+"""买入规则表达式（utils/rule_dsl.py）的测试：在小型交易日历上与手工列出的日期比较"""
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.rule_dsl import ExprRule, compile_rule
+
+
+def _calendar(exclude=()):
+    """2024年1-3月的工作日（可去掉指定日期模拟节假日）"""
+    days = pd.bdate_range('2024-01-01', '2024-03-31')
+    return days[~days.isin(pd.DatetimeIndex(exclude))]
+
+
+def _buy_dates(expression, trading_days):
+    mask = ExprRule(expression).get_buy_mask(trading_days)
+    return [d.strftime('%Y-%m-%d') for d in trading_days[mask]]
+
+
+def test_last_trading_day_of_month():
+    days = _calendar(exclude=['2024-01-31'])
+    assert _buy_dates('last(M)', days) == ['2024-01-30', '2024-02-29', '2024-03-29']
+
+
+def test_precedence_not_and_or():
+    days = _calendar()
+    # & 优先于 |：每月1日且在2月，或者1月12日
+    assert _buy_dates('date(2024-01-12) | day(1) & month(2)', days) == ['2024-01-12', '2024-02-01']
+    # ! 优先于 &：非周五且为1月第一周
+    assert _buy_dates('!fri & before(2024-01-05)', days) == ['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04']
+    # 括号改变优先级
+    assert _buy_dates('(date(2024-01-12) | day(1)) & month(2)', days) == ['2024-02-01']
+
+
+def test_keyword_operators_match_symbols():
+    days = _calendar()
+    assert _buy_dates('fri and not month(1, 2)', days) == _buy_dates('fri & !month(1, 2)', days)
+
+
+def test_nth_weekday_negative_counts_from_month_end():
+    days = _calendar()
+    assert _buy_dates('nth_weekday(-1, fri)', days) == ['2024-01-26', '2024-02-23', '2024-03-29']
+    assert _buy_dates('nth_weekday(2, tue)', days) == ['2024-01-09', '2024-02-13', '2024-03-12']
+
+
+def test_every_counts_from_first_match():
+    days = _calendar()
+    assert _buy_dates('every(2, fri) & month(1)', days) == ['2024-01-05', '2024-01-19']
+
+
+def test_every_with_anchor_skips_earlier_matches():
+    days = _calendar()
+    assert _buy_dates('every(2, fri, 2024-01-12) & month(1)', days) == ['2024-01-12', '2024-01-26']
+
+
+def test_roll_moves_to_next_trading_day_in_month():
+    # 2024-02-10 为周六、2024-03-10 为周日；1月10日为节假日
+    days = _calendar(exclude=['2024-01-10'])
+    assert _buy_dates('day(10)', days) == []
+    assert _buy_dates('roll(day(10))', days) == ['2024-01-11', '2024-02-12', '2024-03-11']
+
+
+def test_roll_does_not_cross_period_end():
+    days = _calendar(exclude=['2024-03-29'])
+    # 3月31日为周日，当月已无后续交易日，不顺延到下月
+    assert _buy_dates('roll(day(31))', days) == ['2024-01-31']
+
+
+def test_get_buy_dates_uses_full_calendar():
+    days = _calendar()
+    rule = ExprRule('last(M)')
+    bought = rule.get_buy_dates(datetime(2024, 1, 1), datetime(2024, 2, 15), set(days.to_pydatetime()))
+    assert bought == [datetime(2024, 1, 31)]
+
+
+@pytest.mark.parametrize('expression, message', [
+    ('', '不能为空'),
+    ('foo(1)', '未知的规则函数'),
+    ('last(Q', '不完整'),
+    ('fri &', '不完整'),
+    ('fri )', '多余内容'),
+    ('month(13)', '1-12'),
+    ('nth_weekday(0, fri)', 'nth_weekday'),
+    ('every(0, fri)', '正整数'),
+    ('fri # mon', '无法识别'),
+])
+def test_errors(expression, message):
+    with pytest.raises(ValueError, match=message):
+        compile_rule(expression)
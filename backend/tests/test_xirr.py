@@ -0,0 +1,39 @@
+"""定投模拟 XIRR（xirr / xirr_batch）的测试"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.dca_simulator import xirr, xirr_batch
+
+
+def test_known_answer_single_period():
+    # 投入1000，365天后取回1100：年化10%
+    assert xirr([-1000, 1100], ['2021-01-01', '2022-01-01']) == pytest.approx(0.10, abs=1e-9)
+
+
+def test_known_answer_multiple_flows():
+    # 两次投入各1000，第2年末取回：按定义验证净现值为0
+    rate = xirr([-1000, -1000, 2300], ['2021-01-01', '2022-01-01', '2023-01-01'])
+    npv = -1000 * (1 + rate) ** 2 - 1000 * (1 + rate) + 2300
+    assert npv == pytest.approx(0.0, abs=1e-6)
+
+
+def test_same_date_flows_return_nan():
+    assert np.isnan(xirr_batch([[-1000, 1000]], [0, 0])[0])
+    assert np.isnan(xirr([-1000, 1200], ['2021-01-01', '2021-01-01']))
+
+
+def test_no_sign_change_returns_nan():
+    assert np.isnan(xirr([-1000, -1000], ['2021-01-01', '2022-01-01']))
+    assert np.isnan(xirr([1000, 1000], ['2021-01-01', '2022-01-01']))
+
+
+def test_batch_rows_are_independent():
+    amounts = np.array([[-1000, 1100], [-1000, 1000], [-1000, -1000]])
+    result = xirr_batch(amounts, [[0, 1], [0, 0], [0, 1]])
+    assert result[0] == pytest.approx(0.10, abs=1e-9)
+    assert np.isnan(result[1]) and np.isnan(result[2])
@@ -0,0 +1,28 @@
+"""
+生产环境入口 - 供 gunicorn 等 WSGI 服务器加载
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+配合 preload_app，在主进程中导入 pandas/openpyxl/utils 并预热Excel读写，
+fork 出的工作进程直接共享已加载的模块，第一个请求不再承担导入开销。
+"""
+from io import BytesIO
+import pandas as pd
+
+from app import app
+
+
+def warm_up():
+    """预热Excel读写路径（加载 pandas 的 Excel 引擎和 openpyxl/xlsxwriter 模块）"""
+    from utils.excel_style import excel_engine
+
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine=excel_engine()) as writer:
+        pd.DataFrame({'日期': [20240101], '单位净值': [1.0]}).to_excel(writer, index=False)
+    buffer.seek(0)
+    pd.read_excel(buffer, header=None)
+
+
+warm_up()
+
+__all__ = ['app']
@@ -0,0 +1,62 @@
+"""
+导入耗时基准 - 对比按需加载与一次性导入全部计算器的启动时间
+
+用法:
+    python benchmarks/import_time.py            # 默认每项运行 10 次
+    python benchmarks/import_time.py -n 20
+
+每一项都在新的 Python 进程中运行，取中位数（秒）。
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 名称 -> 子进程参数
+CASES = {
+    'python -c pass（解释器本身）': ['-c', 'pass'],
+    'import utils（按需加载）': ['-c', 'import utils'],
+    'import utils + 全部公开名称（等同原来的一次性导入）':
+        ['-c', 'import utils; [getattr(utils, name) for name in utils.__all__]'],
+    'calculate.py --help': ['calculate.py', '--help'],
+    'periodic_buy.py --help': ['periodic_buy.py', '--help'],
+    'merge_excel.py --help': ['merge_excel.py', '--help'],
+    'buy_avg_return.py --help': ['buy_avg_return.py', '--help'],
+}
+
+
+def measure(args: list, repeat: int) -> float:
+    """在新进程中运行 repeat 次，返回耗时中位数（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CLI 和 utils 包的导入耗时基准')
+    parser.add_argument('-n', '--repeat', type=int, default=10, help='每项运行次数（默认: 10）')
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}，每项 {args.repeat} 次，取中位数")
+    print("-" * 70)
+    results = {}
+    for name, case_args in CASES.items():
+        results[name] = measure(case_args, args.repeat)
+        print(f"{name:<50} {results[name] * 1000:>8.1f} ms")
+    print("-" * 70)
+
+    eager = results['import utils + 全部公开名称（等同原来的一次性导入）']
+    lazy = results['import utils（按需加载）']
+    print(f"按需加载节省: {(eager - lazy) * 1000:.1f} ms（{eager / lazy:.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
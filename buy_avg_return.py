@@ -3,7 +3,6 @@
 """
 import argparse
 import os
-from utils import BuyAvgReturnCalculator
 
 
 def main():
@@ -18,6 +17,12 @@ def main():
 
     # 指定输出目录
     python buy_avg_return.py -f 买入平均收益_净值列表/日度净值.xlsx -o ./买入平均_output
+
+    # 同时输出任意两个开放日之间的收益矩阵（某月买入、之后任一开放日赎回）
+    python buy_avg_return.py -f 买入平均收益_净值列表/日度净值.xlsx --cohort
+
+    # 多产品工作簿（每个sheet一个产品）：一次读入，所有产品写入同一个结果文件
+    python buy_avg_return.py -f 日度净值_合并.xlsx
         """
     )
 
@@ -29,6 +34,10 @@ def main():
     parser.add_argument('-o', '--output', type=str, default='./买入平均_output',
                         help='输出目录（默认: ./买入平均_output）')
 
+    # 开放日收益矩阵
+    parser.add_argument('--cohort', action='store_true',
+                        help='同时输出开放日收益矩阵（每个开放日买入、之后每个开放日赎回）及按持有长度的汇总')
+
     args = parser.parse_args()
 
     # 检查文件是否存在
@@ -46,27 +55,42 @@ def main():
     print(f"输出目录: {args.output}")
     print("=" * 60)
 
-    # 创建计算器并加载数据
+    # 一次打开工作簿读入全部sheet（pandas等在解析参数之后才导入，--help 无需等待）
+    # 多产品工作簿（如 merge_excel.py 生成的合并文件）每个sheet作为一个产品
     print("\n正在加载数据...")
-    calculator = BuyAvgReturnCalculator(args.file)
-    info = calculator.get_product_info()
-    print(f"产品名称: {info['name']}")
-    print(f"产品代码: {info['code']}")
-    print(f"数据日期范围: {info['date_range']}")
-
-    # 执行计算
-    print("\n正在计算每月20日开放日收益...")
-    calculator.get_open_day_data()
-    calculator.calculate_returns_since_open_day()
-    info = calculator.get_product_info()  # 重新获取信息
-    print(f"找到 {info['open_day_count']} 个开放日（每月20日）")
-
-    # 生成输出文件名
+    from utils import BuyAvgReturnCalculator
+    from utils.nav_loader import read_nav_sheets
+    sheets = read_nav_sheets(args.file)
+    if len(sheets) > 1:
+        print(f"多产品工作簿，共 {len(sheets)} 个产品sheet")
+
     base_name = os.path.splitext(os.path.basename(args.file))[0]
+    texts = []
+    for sheet_name, raw_df in (sheets.items() if sheets else [(None, args.file)]):
+        calculator = BuyAvgReturnCalculator(raw_df)
+        info = calculator.get_product_info()
+        print(f"\n产品名称: {info['name']}")
+        print(f"产品代码: {info['code']}")
+        print(f"数据日期范围: {info['date_range']}")
+
+        # 执行计算
+        print("正在计算每月20日开放日收益...")
+        calculator.get_open_day_data()
+        calculator.calculate_returns_since_open_day()
+        info = calculator.get_product_info()  # 重新获取信息
+        print(f"找到 {info['open_day_count']} 个开放日（每月20日）")
+        texts.append(calculator.generate_output_text())
+
+        if args.cohort:
+            cohort_base = base_name if len(sheets) <= 1 else f"{base_name}_{sheet_name}"
+            cohort_file = os.path.join(args.output, f"{cohort_base}_开放日收益矩阵.xlsx")
+            calculator.save_cohort_to_excel(cohort_file)
+            print(f"开放日收益矩阵已保存到: {cohort_file}")
+
+    # 保存结果（多产品时所有产品写入同一个文件）
     output_file = os.path.join(args.output, f"{base_name}_买入平均收益.txt")
-
-    # 保存结果
-    calculator.save_to_txt(output_file)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(texts))
 
     print(f"\n结果已保存到: {output_file}")
     print("\n" + "=" * 60)
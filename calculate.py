@@ -4,7 +4,195 @@
 支持单个文件或批量处理目录下的所有Excel文件
 """
 import argparse
-from utils import process_single_file, generate_summary_file
+import os
+import glob
+from utils.run_manifest import RunManifest, file_sha256
+
+# pandas 和各计算器在用到时才导入，--help 和参数错误时无需等待
+
+
+def process_input_file(file_path: str, args, manifest: RunManifest, params: dict, store=None,
+                       report=None, combined: list | None = None) -> list:
+    """
+    处理一个输入文件：多产品工作簿（如 merge_excel 生成的合并文件，每个sheet一个产品）
+    只打开一次、读入全部sheet后逐个计算；单sheet文件按原方式处理
+
+    Args:
+        file_path: Excel文件路径
+        其余参数同 process_with_manifest
+
+    Returns:
+        list: 每个产品的业绩指标DataFrame
+    """
+    import pandas as pd
+    from utils.nav_loader import read_nav_sheets
+
+    # 文件只计算一次哈希；未变化时在打开工作簿之前跳过
+    file_hash = file_sha256(file_path)
+    if can_skip(args, manifest, file_path, file_hash, params, store):
+        payload = manifest.get_entry(file_path)['payload']  # type: ignore
+        if not isinstance(payload, dict):
+            return [process_with_manifest(file_path, args, manifest, params, store, report, combined,
+                                          file_hash=file_hash)]
+        # 多产品工作簿：文件级记录保存全部sheet名，各sheet均已完成时整体跳过
+        sheet_paths = [f"{file_path}::{name}" for name in payload.get('sheets', [])]
+        if sheet_paths and all(can_skip(args, manifest, path, file_hash, params, store) for path in sheet_paths):
+            print(f"跳过（未变化）: {os.path.basename(file_path)}（{len(sheet_paths)} 个产品sheet）")
+            return [reuse_metrics(manifest, path) for path in sheet_paths]
+
+    with pd.ExcelFile(file_path) as workbook:
+        if len(workbook.sheet_names) <= 1:
+            sheets = None
+        else:
+            sheets = read_nav_sheets(workbook)
+    if not sheets or len(sheets) <= 1:
+        return [process_with_manifest(file_path, args, manifest, params, store, report, combined,
+                                      file_hash=file_hash)]
+
+    print(f"\n{os.path.basename(file_path)}: 多产品工作簿，共 {len(sheets)} 个产品sheet")
+    all_metrics = []
+    failed = False
+    for sheet in sheets.items():
+        try:
+            all_metrics.append(process_with_manifest(file_path, args, manifest, params, store, report,
+                                                     combined, sheet=sheet, file_hash=file_hash))
+        except Exception as e:
+            failed = True
+            print(f"处理失败 {os.path.basename(file_path)} [{sheet[0]}]: {e}")
+    if not failed:
+        manifest.mark_completed(file_path, file_hash, params, payload={'sheets': list(sheets)})
+    return all_metrics
+
+
+def can_skip(args, manifest: RunManifest, entry_path: str, file_hash: str, params: dict, store=None) -> bool:
+    """清单中该输入已按相同内容和参数完成，且本次不需要重新生成结果表时返回True"""
+    # 输出到ZIP或合并工作簿时需要每个产品的结果表，不跳过
+    if args.force or args.zip or args.combined:
+        return False
+    return manifest.is_completed(entry_path, file_hash, params) and (store is None or store.has_file(file_hash))
+
+
+def reuse_metrics(manifest: RunManifest, entry_path: str):
+    """由清单中保存的业绩指标重建DataFrame（标记为来自清单）"""
+    import pandas as pd
+
+    metrics_df = pd.DataFrame(manifest.get_entry(entry_path)['payload'])  # type: ignore
+    metrics_df.attrs['from_manifest'] = True
+    return metrics_df
+
+
+def process_with_manifest(file_path: str, args, manifest: RunManifest, params: dict, store=None,
+                          report=None, combined: list | None = None, sheet: tuple | None = None,
+                          file_hash: str | None = None):
+    """
+    按运行清单处理单个文件：内容和参数未变化时直接复用上次的业绩指标
+
+    Args:
+        file_path: Excel文件路径
+        args: 命令行参数
+        manifest: 运行清单
+        params: 本次计算参数
+        store: 结果库（可选），计算结果同时写入；结果库中没有该文件时不跳过
+        report: 工作簿并行输出器（可选），指定时结果工作簿交给它渲染，不在此处顺序写出
+        combined: 合并工作簿的产品结果表列表（可选），计算结果追加到其中
+        sheet: 多产品工作簿中的一个产品 (sheet名, 已读入的原始sheet)（可选），
+            运行清单按 "文件路径::sheet名" 分别记录
+        file_hash: 文件内容哈希（可选，调用方已计算时传入，避免重复读取文件）
+
+    Returns:
+        业绩指标DataFrame
+    """
+    import pandas as pd
+    from utils.tools import run_single_file
+
+    file_hash = file_hash or file_sha256(file_path)
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    source, entry_path = file_path, file_path
+    if sheet is not None:
+        base_name = f"{base_name}_{sheet[0]}"
+        source, entry_path = sheet[1], f"{file_path}::{sheet[0]}"
+    workbook_name = f"{base_name}_结果.xlsx"
+    output_path = os.path.join(args.output, workbook_name)
+    if args.zip:
+        output_path = f"{args.zip}::{workbook_name}"
+
+    if can_skip(args, manifest, entry_path, file_hash, params, store):
+        print(f"跳过（未变化）: {base_name if sheet is not None else os.path.basename(file_path)}")
+        return reuse_metrics(manifest, entry_path)
+
+    try:
+        calculator = run_single_file(
+            file_path=source,
+            output_dir=None if report is not None else args.output,
+            risk_free_rate=args.risk_free,
+            return_frequency=args.return_freq,
+            name=base_name
+        )
+        metrics_df = calculator.build_metrics_df()
+        if store is not None:
+            store.save_calculator(calculator, source_file=file_path, file_hash=file_hash)
+        if report is not None:
+            tables = calculator.build_tables()
+            report.submit(workbook_name, tables)
+            if combined is not None:
+                product_code = list(calculator.products.keys())[0] if calculator.products else ''
+                combined.append((calculator.get_product_info()[0], product_code, tables))
+    except Exception as e:
+        manifest.mark_failed(entry_path, file_hash, params, str(e))
+        raise
+
+    manifest.mark_completed(entry_path, file_hash, params,
+                            output_path=output_path,
+                            payload=metrics_df.to_dict('records'))
+    return metrics_df
+
+
+def ingest_nav(args, store):
+    """把各文件的新增净值增量写入结果库（日常更新净值时使用，读取量只与新增行数有关）"""
+    if args.file:
+        files = [args.file]
+    else:
+        files = sorted(glob.glob(os.path.join(args.dir, '*.xlsx')) + glob.glob(os.path.join(args.dir, '*.xls'))
+                       + glob.glob(os.path.join(args.dir, '*.xlsm')))
+    if not files:
+        print("错误: 没有找到Excel文件")
+        return
+
+    total = 0
+    for file_path in files:
+        try:
+            result = store.ingest_nav_file(file_path)
+        except Exception as e:
+            print(f"  ❌ {os.path.basename(file_path)}: {e}")
+            continue
+        total += result['new_rows']
+        print(f"  ✓ {result['product_name']} ({result['product_code']}): 新增 {result['new_rows']} 条净值，"
+              f"最新 {result['latest_nav_date']} {result['latest_nav']}")
+    print(f"\n✓ 共写入 {total} 条新增净值: {store.db_path}")
+
+
+def run_benchmark(args, input_files: list):
+    """计算所有产品相对基准的指标并保存"""
+    from utils.benchmark_analyzer import BenchmarkAnalyzer
+
+    if not os.path.exists(args.benchmark):
+        print(f"错误: 基准文件不存在 - {args.benchmark}")
+        return
+    benchmark_key = os.path.normcase(os.path.abspath(args.benchmark))
+    product_files = [f for f in input_files if os.path.normcase(os.path.abspath(f)) != benchmark_key]
+    if not product_files:
+        return
+
+    print(f"\n正在计算基准对比: {os.path.basename(args.benchmark)}")
+    analyzer = BenchmarkAnalyzer(args.benchmark, frequency=args.benchmark_freq, risk_free_rate=args.risk_free)
+    result = analyzer.analyze_files(product_files)
+    if result.empty:
+        print("没有可对比的产品")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    analyzer.save_to_excel(result, os.path.join(args.output, "基准对比.xlsx"))
+    print(result[['产品名称', '超额收益率', 'Beta', 'Alpha(年化)', '跟踪误差(年化)', '信息比率']].to_string(index=False))
 
 
 def main():
@@ -23,11 +211,38 @@ def main():
     # 处理目录下所有Excel文件
     python calculate.py -d ./净值目录
 
+    # 处理多产品工作簿（每个sheet一个产品，如 merge_excel.py 生成的合并文件），只打开一次
+    python calculate.py -f 日度净值_合并.xlsx --combined
+
     # 处理目录下所有文件并生成汇总
     python calculate.py -d ./净值目录 -s 汇总.xlsx
 
     # 指定无风险利率
     python calculate.py -f 产品净值.xlsx --risk-free 0.03
+
+    # 使用月度收益率计算波动率、夏普比率和风险指标
+    python calculate.py -d ./净值目录 --return-freq M
+
+    # 同时写入结果库，供后端 GET /api/products/<产品代码> 直接查询
+    python calculate.py -d ./净值目录 --store output/results.db
+
+    # 日常更新：只把各文件顶部的新增净值写入结果库（不解析全部历史、不重新计算指标）
+    python calculate.py -d ./净值目录 --store output/results.db --ingest-nav
+
+    # 4 个进程并行生成各产品结果工作簿
+    python calculate.py -d ./净值目录 --workers 4
+
+    # 全部结果工作簿打包为一个ZIP，并额外生成一个合并工作簿（每类结果一个工作表）
+    python calculate.py -d ./净值目录 --workers 4 --zip output/结果.zip --combined
+
+    # 监控目录：常驻内存，只重新计算变化的文件并刷新汇总（Ctrl+C 退出）
+    python calculate.py -d ./净值目录 --watch --interval 10
+
+    # 忽略运行清单，强制重新处理所有文件
+    python calculate.py -d ./净值目录 --force
+
+    # 与基准指数对比（基准文件格式与产品文件相同）
+    python calculate.py -d ./净值目录 --benchmark 沪深300.xlsx --benchmark-freq W
             """
     )
 
@@ -45,15 +260,98 @@ def main():
     # 计算参数
     parser.add_argument('--risk-free', type=float, default=0.02,
                         help='无风险利率（默认: 0.02）')
+    parser.add_argument('--return-freq', type=str, default='W', choices=['D', 'W', 'M'],
+                        help='波动率/夏普/风险指标的收益率频率: D(日度), W(周度), M(月度)（默认: W）')
+
+    # 结果工作簿输出参数
+    parser.add_argument('--workers', type=int, default=1,
+                        help='并行生成结果工作簿的进程数（默认: 1，顺序生成）')
+    parser.add_argument('--zip', type=str,
+                        help='把全部结果工作簿写入一个ZIP文件（不再逐个写入输出目录）')
+    parser.add_argument('--combined', type=str, nargs='?', const='全部产品结果.xlsx',
+                        help='额外生成合并工作簿，每类结果一个工作表、所有产品上下拼接（默认文件名: 全部产品结果.xlsx）')
+
+    # 基准对比参数
+    parser.add_argument('--benchmark', type=str,
+                        help='基准净值文件路径，生成基准对比.xlsx')
+    parser.add_argument('--benchmark-freq', type=str, default='W', choices=['D', 'W', 'M'],
+                        help='基准对比的收益率频率: D(日度), W(周度), M(月度)（默认: W）')
+
+    # 断点续跑参数
+    parser.add_argument('--manifest', type=str,
+                        help='运行清单文件路径（默认: 输出目录/.run_manifest.json）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略运行清单，重新处理所有文件')
+
+    # 结果库参数
+    parser.add_argument('--store', type=str,
+                        help='SQLite 结果库路径，写入业绩指标、各结果表和净值序列（供后端按产品代码查询）')
+    parser.add_argument('--ingest-nav', action='store_true',
+                        help='只把新增净值增量写入结果库（需配合 --store；倒序文件只读取顶部的新增行，不重新计算指标）')
+
+    # 监控模式参数
+    parser.add_argument('--watch', action='store_true',
+                        help='持续监控目录（需配合 -d），只重新计算变化的文件并刷新汇总')
+    parser.add_argument('--interval', type=float, default=5.0,
+                        help='监控模式的轮询间隔秒数（默认: 5）')
 
     args = parser.parse_args()
 
+    from utils.product_calculator import METRICS_VERSION
+
     print("=" * 60)
     print("产品净值计算器")
     print(f"无风险利率: {args.risk_free:.2%}")
     print("=" * 60)
 
     all_metrics = []
+    input_files = []
+    report = None
+    combined = [] if args.combined else None
+
+    # 运行清单：记录每个输入文件的哈希、参数和状态，重新运行时跳过未变化的文件
+    manifest_path = args.manifest or os.path.join(args.output, '.run_manifest.json')
+    manifest = RunManifest(manifest_path)
+    params = {'risk_free_rate': args.risk_free, 'return_frequency': args.return_freq,
+              'output_dir': os.path.abspath(args.output), 'metrics_version': METRICS_VERSION}
+
+    # 结果库：按产品代码保存计算结果
+    store = None
+    if args.store:
+        from utils.results_store import ResultsStore
+        store = ResultsStore(args.store)
+
+    if args.ingest_nav:
+        if store is None:
+            print("错误: --ingest-nav 需要用 --store 指定结果库")
+            return
+        ingest_nav(args, store)
+        return
+
+    if args.watch:
+        # 监控模式：解析后的净值和指标常驻内存，只重新计算变化的文件
+        if not args.dir or not os.path.isdir(args.dir):
+            print("错误: 监控模式需要用 -d 指定存在的目录")
+            return
+        from utils.nav_watcher import NavDirectoryWatcher
+        summary_name = args.summary or "业绩汇总.xlsx"
+        watcher = NavDirectoryWatcher(
+            args.dir,
+            output_dir=args.output,
+            summary_path=summary_name if os.path.isabs(summary_name) else os.path.join(args.output, summary_name),
+            risk_free_rate=args.risk_free,
+            return_frequency=args.return_freq,
+            manifest=None if args.force else manifest,
+            params=params,
+            store=store
+        )
+        watcher.run(interval=args.interval)
+        return
+
+    if args.workers > 1 or args.zip or args.combined:
+        # 结果工作簿交给进程池并行渲染，写入输出目录或ZIP
+        from utils.report_writer import WorkbookReportWriter
+        report = WorkbookReportWriter(output_dir=args.output, zip_path=args.zip, workers=args.workers)
 
     if args.file:
         # 处理单个文件
@@ -61,12 +359,8 @@ def main():
             print(f"错误: 文件不存在 - {args.file}")
             return
 
-        metrics_df = process_single_file(
-            file_path=args.file,
-            output_dir=args.output,
-            risk_free_rate=args.risk_free
-        )
-        all_metrics.append(metrics_df)
+        all_metrics.extend(process_input_file(args.file, args, manifest, params, store, report, combined))
+        input_files.append(args.file)
 
     elif args.dir:
         # 处理目录下所有Excel文件
@@ -84,19 +378,31 @@ def main():
             return
 
         print(f"\n找到 {len(excel_files)} 个Excel文件")
+        input_files.extend(sorted(excel_files))
 
+        skipped = 0
         for file_path in sorted(excel_files):
             try:
-                metrics_df = process_single_file(
-                    file_path=file_path,
-                    output_dir=args.output,
-                    risk_free_rate=args.risk_free
-                )
-                all_metrics.append(metrics_df)
+                for metrics_df in process_input_file(file_path, args, manifest, params, store, report, combined):
+                    if getattr(metrics_df, 'attrs', {}).get('from_manifest'):
+                        skipped += 1
+                    all_metrics.append(metrics_df)
             except Exception as e:
                 print(f"处理失败 {os.path.basename(file_path)}: {e}")
 
+        if skipped:
+            print(f"\n运行清单: {skipped} 个产品未变化已跳过，{len(all_metrics) - skipped} 个产品重新处理")
+
+    if report is not None:
+        if combined:
+            from utils.report_writer import combine_tables
+            report.submit(os.path.basename(args.combined), combine_tables(combined), padding=2)
+        written = report.close()
+        target = args.zip or args.output
+        print(f"\n✓ 已生成 {len(written)} 个结果工作簿: {target}")
+
     # 生成汇总文件（多个产品时）
+    from utils import generate_summary_file
     if len(all_metrics) > 1 and args.summary:
         summary_path = args.summary if os.path.isabs(args.summary) else os.path.join(args.output, args.summary)
         generate_summary_file(all_metrics, summary_path)
@@ -105,12 +411,14 @@ def main():
         summary_path = os.path.join(args.output, "业绩汇总.xlsx")
         generate_summary_file(all_metrics, summary_path)
 
+    # 基准对比（基准只读取、对齐一次）
+    if args.benchmark:
+        run_benchmark(args, input_files)
+
     print("\n" + "=" * 60)
     print("处理完成!")
     print("=" * 60)
 
 
 if __name__ == "__main__":
-    import os
-    import glob
     main()
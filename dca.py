@@ -0,0 +1,116 @@
+"""
+定投模拟 - 命令行版本
+按买入规则每次投入固定金额，计算不同起始日期的累计投入、期末市值、累计收益率和XIRR
+"""
+import argparse
+import os
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='定投模拟 - 按买入规则定期定额投入，计算累计收益率和XIRR',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+    # 从数据首日起每周五定投1000元
+    python dca.py -f 买入平均收益_净值列表/日度净值.xlsx
+
+    # 每月20日定投（遇非交易日顺延），比较多个起始日期
+    python dca.py -f 买入平均收益_净值列表/日度净值.xlsx --rule monthly:20:roll --start-dates 2019-01-01 2021-01-01 2023-01-01
+
+    # 多个产品，规则表达式，同时输出第一个起始日期的每日持仓路径（含XIRR）
+    python dca.py -f 产品1.xlsx 产品2.xlsx --rule "expr:last(M)" --amount 5000 --path
+        """
+    )
+
+    parser.add_argument('-f', '--file', type=str, nargs='+', required=True,
+                        help='Excel文件路径（可多个）')
+    parser.add_argument('-o', '--output', type=str, default='./定投_output',
+                        help='输出目录（默认: ./定投_output）')
+    parser.add_argument('--rule', type=str, default='friday',
+                        help='买入规则描述，如 friday、monthly:20、monthly:20:roll、weekly:0、expr:last(M)（默认: friday）')
+    parser.add_argument('--amount', type=float, default=1000.0,
+                        help='每次定投金额（默认: 1000）')
+    parser.add_argument('--start-dates', type=str, nargs='+',
+                        help='定投起始日期，格式 YYYY-MM-DD 或 YYYYMMDD（默认: 各产品数据首日）')
+    parser.add_argument('--end-date', type=str,
+                        help='估值截止日期（默认: 最新净值日期）')
+    parser.add_argument('--path', action='store_true',
+                        help='输出每个产品从第一个起始日期开始的每日持仓路径（含XIRR）')
+
+    args = parser.parse_args()
+
+    missing = [path for path in args.file if not os.path.exists(path)]
+    if missing:
+        print(f"错误: 文件不存在 - {', '.join(missing)}")
+        return
+
+    from utils.buy_rules import parse_rule_spec
+    try:
+        buy_rule = parse_rule_spec(args.rule)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+
+    print("=" * 60)
+    print("定投模拟")
+    print("=" * 60)
+    print(f"输入文件: {', '.join(args.file)}")
+    print(f"买入规则: {buy_rule.get_rule_name()}")
+    print(f"每次金额: {args.amount:g}")
+    print(f"起始日期: {', '.join(args.start_dates) if args.start_dates else '数据首日'}")
+    print(f"输出目录: {args.output}")
+    print("=" * 60)
+
+    import pandas as pd
+    from utils.dca_simulator import DCASimulator
+    from utils.excel_style import write_tables
+
+    summaries, paths = [], {}
+    for file_path in args.file:
+        try:
+            simulator = DCASimulator(file_path, args.amount)
+            if len(simulator.trading_days) == 0:
+                print(f"  ⚠️ 没有净值数据，跳过: {file_path}")
+                continue
+            start_dates = args.start_dates or [simulator.trading_days[0]]
+            summary = simulator.sweep_start_dates(buy_rule, start_dates, args.end_date)
+            if args.path:
+                path = simulator.simulate(buy_rule, start_dates[0], args.end_date, with_xirr_path=True)
+                paths[f"{simulator.product_name}_路径"[:31]] = path
+        except ValueError as e:
+            print(f"  ❌ {file_path}: {e}")
+            continue
+        summaries.append(summary)
+        print(f"  ✓ {simulator.product_name} ({simulator.product_code}): {len(summary)} 个起始日期")
+
+    if not summaries:
+        print("错误: 没有可计算的产品")
+        return
+
+    summary = pd.concat(summaries, ignore_index=True)
+    print(f"\n{'产品名称':<12} {'起始日期':>12} {'买入次数':>8} {'累计投入':>12} {'期末市值':>12} {'收益率':>10} {'XIRR':>10}")
+    for _, row in summary.iterrows():
+        xirr = f"{row['XIRR']:.2%}" if pd.notna(row['XIRR']) else '-'
+        total_return = f"{row['累计收益率']:.2%}" if pd.notna(row['累计收益率']) else '-'
+        print(f"{str(row['产品名称']):<12} {row['起始日期']:>12} {int(row['买入次数']):>8} "
+              f"{row['累计投入']:>12,.0f} {row['期末市值']:>12,.0f} {total_return:>10} {xirr:>10}")
+
+    tables = {'定投汇总': summary, **paths}
+    percent_columns = {name: ['收益率', 'XIRR'] for name in paths}
+    percent_columns['定投汇总'] = ['累计收益率', 'XIRR']
+    base_name = os.path.splitext(os.path.basename(args.file[0]))[0] if len(args.file) == 1 else '多产品'
+    output_file = os.path.join(args.output, f"{base_name}_定投模拟.xlsx")
+    write_tables(output_file, tables, percent_columns=percent_columns)
+    print(f"\n✓ 结果已保存到: {output_file}")
+
+    print("\n" + "=" * 60)
+    print("处理完成!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
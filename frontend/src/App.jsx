@@ -1,7 +1,8 @@
 import React, { useState } from 'react';
-import { Layout, Menu, Card, Upload, Button, Select, DatePicker, Space, message, Spin, Table, Divider, Tabs } from 'antd';
+import { Layout, Menu, Card, Upload, Button, Select, DatePicker, Input, Space, message, Spin, Divider, Tabs } from 'antd';
 import { UploadOutlined, CalculatorOutlined, DownloadOutlined, LineChartOutlined, FileExcelOutlined, FileTextOutlined } from '@ant-design/icons';
 import axios from 'axios';
+import RemoteTable from './RemoteTable';
 import './App.css';
 
 const { Header, Content, Footer } = Layout;
@@ -10,6 +11,17 @@ const { Option } = Select;
 // 获取API基础URL
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000';
 
+// 表格每页行数：计算接口只返回第一页，翻页和排序从服务端缓存的结果读取
+const PAGE_SIZE = 20;
+
+// 格式化数字，四位小数
+const renderNumber = (text) => {
+  if (typeof text === 'number') {
+    return text.toFixed(4);
+  }
+  return text === null ? '-' : text;
+};
+
 function App() {
   const [loading, setLoading] = useState(false);
   const [calculationType, setCalculationType] = useState('buy_avg');
@@ -17,6 +29,7 @@ function App() {
   const [results, setResults] = useState([]);  // 改为支持多个结果
   const [params, setParams] = useState({
     frequency: 'friday',
+    rule: '',
     startDate: null
   });
 
@@ -41,6 +54,10 @@ function App() {
         formData.append('file', file);
         formData.append('type', calculationType);
         formData.append('frequency', params.frequency);
+        if (params.frequency === 'custom') {
+          formData.append('rule', params.rule);
+        }
+        formData.append('page_size', PAGE_SIZE);
         if (params.startDate) {
           formData.append('start_date', params.startDate.format('YYYY-MM-DD'));
         }
@@ -94,49 +111,42 @@ function App() {
     window.URL.revokeObjectURL(url);
   };
 
-  const handleDownloadExcel = async (resultIndex) => {
-    if (!fileList || fileList.length === 0) {
-      message.warning('请先上传文件');
-      return;
+  // 保存服务端返回的文件（文件名取自响应头）
+  const saveBlob = (response, fallbackName) => {
+    const contentDisposition = response.headers['content-disposition'];
+    let downloadName = fallbackName;
+    const encoded = contentDisposition?.match(/filename\*=UTF-8''([^;]+)/);
+    if (encoded) {
+      downloadName = decodeURIComponent(encoded[1]);
+    } else if (contentDisposition) {
+      downloadName = decodeURIComponent(contentDisposition.split('filename=')[1]?.replace(/"/g, '') || fallbackName);
     }
-    
-    // 使用对应的文件
-    const file = fileList[resultIndex]?.originFileObj || fileList[0]?.originFileObj;
-    if (!file) {
-      message.warning('文件不存在');
+
+    const url = window.URL.createObjectURL(new Blob([response.data]));
+    const link = document.createElement('a');
+    link.href = url;
+    link.setAttribute('download', downloadName);
+    document.body.appendChild(link);
+    link.click();
+    if (link.parentNode) {
+      link.parentNode.removeChild(link);
+    }
+    window.URL.revokeObjectURL(url);
+  };
+
+  // 按结果标识下载：工作簿在计算完成后已由服务端预先生成，不重新上传和计算
+  const handleDownloadExcel = async (result) => {
+    if (!result?.result_id) {
+      message.warning('请先计算');
       return;
     }
-    
+
     try {
       setLoading(true);
-      const formData = new FormData();
-      formData.append('file', file);
-      formData.append('frequency', params.frequency);
-      
-      const response = await axios.post(`${API_BASE_URL}/api/download-excel`, formData, {
+      const response = await axios.get(`${API_BASE_URL}/api/download-excel/${result.result_id}`, {
         responseType: 'blob',
       });
-      
-      // 从响应头中获取文件名
-      const contentDisposition = response.headers['content-disposition'];
-      let downloadName = '净值计算.xlsx';
-      if (contentDisposition) {
-        const filename = decodeURIComponent(contentDisposition.split('filename=')[1]?.replace(/"/g, '') || downloadName);
-        downloadName = filename;
-      }
-      
-      // 下载文件
-      const url = window.URL.createObjectURL(new Blob([response.data]));
-      const link = document.createElement('a');
-      link.href = url;
-      link.setAttribute('download', downloadName);
-      document.body.appendChild(link);
-      link.click();
-      if (link.parentNode) {
-        link.parentNode.removeChild(link);
-      }
-      window.URL.revokeObjectURL(url);
-      
+      saveBlob(response, '净值计算.xlsx');
       message.success('Excel文件下载成功');
     } catch (error) {
       message.error('Excel文件下载失败: ' + (error.response?.data?.error || error.message));
@@ -145,6 +155,28 @@ function App() {
     }
   };
 
+  // 多个文件的结果打包为一个ZIP下载
+  const handleDownloadZip = async () => {
+    const resultIds = results.map((result) => result.result_id).filter(Boolean);
+    if (resultIds.length === 0) {
+      message.warning('请先计算');
+      return;
+    }
+
+    try {
+      setLoading(true);
+      const response = await axios.post(`${API_BASE_URL}/api/download-excel/zip`, { result_ids: resultIds }, {
+        responseType: 'blob',
+      });
+      saveBlob(response, '计算结果.zip');
+      message.success('ZIP文件下载成功');
+    } catch (error) {
+      message.error('ZIP文件下载失败: ' + (error.response?.data?.error || error.message));
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleDownloadSummary = (result) => {
     if (!result) return;
     
@@ -231,7 +263,16 @@ function App() {
                   >
                     <Option value="friday">每周五</Option>
                     <Option value="monthly">每月20日</Option>
+                    <Option value="custom">自定义规则</Option>
                   </Select>
+                  {params.frequency === 'custom' && (
+                    <Input
+                      value={params.rule}
+                      onChange={(e) => setParams({ ...params, rule: e.target.value })}
+                      style={{ width: 300, marginTop: '8px', display: 'block' }}
+                      placeholder="如 monthly:20:roll、expr:last(M)"
+                    />
+                  )}
                 </div>
               )}
 
@@ -274,7 +315,15 @@ function App() {
           )}
 
           {results && results.length > 0 && !loading && (
-            <Card title="计算结果" style={{ marginTop: '24px' }}>
+            <Card
+              title="计算结果"
+              style={{ marginTop: '24px' }}
+              extra={results.length > 1 && (
+                <Button icon={<FileExcelOutlined />} onClick={handleDownloadZip}>
+                  全部下载为ZIP
+                </Button>
+              )}
+            >
               <Space direction="vertical" size="large" style={{ width: '100%' }}>
                 {results.map((result, resultIndex) => (
                   <div key={resultIndex} style={{ borderTop: '1px solid #f0f0f0', paddingTop: '20px' }}>
@@ -283,22 +332,22 @@ function App() {
                         文件 {resultIndex + 1}: {result._fileName}
                       </h2>
                       <Space>
+                        {result.result_id && (
+                          <Button 
+                            type="primary" 
+                            icon={<FileExcelOutlined />}
+                            onClick={() => handleDownloadExcel(result)}
+                          >
+                            下载为Excel
+                          </Button>
+                        )}
                         {result.sheets_data && (
-                          <>
-                            <Button 
-                              type="primary" 
-                              icon={<FileExcelOutlined />}
-                              onClick={() => handleDownloadExcel(resultIndex)}
-                            >
-                              下载为Excel
-                            </Button>
-                            <Button 
-                              icon={<FileTextOutlined />}
-                              onClick={() => handleDownloadSummary(result)}
-                            >
-                              下载汇总表
-                            </Button>
-                          </>
+                          <Button 
+                            icon={<FileTextOutlined />}
+                            onClick={() => handleDownloadSummary(result)}
+                          >
+                            下载汇总表
+                          </Button>
                         )}
                         <Button 
                           icon={<DownloadOutlined />}
@@ -323,26 +372,16 @@ function App() {
                               children: (
                                 <div style={{ maxHeight: '600px', overflowY: 'auto' }}>
                                   {sheetData && Array.isArray(sheetData) && sheetData.length > 0 ? (
-                                    <Table
-                                      dataSource={sheetData.map((row, idx) => ({ ...row, _key: `${resultIndex}-${idx}` }))}
-                                      columns={sheetData[0] ? Object.keys(sheetData[0])
-                                        .filter(key => key !== '_key')
-                                        .map(key => ({
-                                          title: key,
-                                          dataIndex: key,
-                                          key: key,
-                                          render: (text) => {
-                                            // 格式化数字，四位小数
-                                            if (typeof text === 'number') {
-                                              return text.toFixed(4);
-                                            }
-                                            return text === null ? '-' : text;
-                                          }
-                                        })) : []}
-                                      pagination={{ pageSize: 20 }}
-                                      scroll={{ x: 'max-content' }}
-                                      size="small"
-                                      rowKey="_key"
+                                    <RemoteTable
+                                      apiBaseUrl={API_BASE_URL}
+                                      resultId={result.result_id}
+                                      tableName={sheetName}
+                                      columns={result.tables?.[sheetName]?.columns || Object.keys(sheetData[0])}
+                                      initialRows={sheetData}
+                                      total={result.tables?.[sheetName]?.total ?? sheetData.length}
+                                      pageSize={PAGE_SIZE}
+                                      raw
+                                      renderCell={renderNumber}
                                     />
                                   ) : (
                                     <p style={{ padding: '20px', textAlign: 'center', color: '#999' }}>
@@ -373,18 +412,14 @@ function App() {
                     {result.table_data && result.table_data.length > 0 && (
                       <div>
                         <h3 style={{ marginBottom: '16px' }}>数据表格：</h3>
-                        <Table
-                          dataSource={result.table_data}
-                          columns={result.table_data[0] ? Object.keys(result.table_data[0])
-                            .filter(key => key !== '_key')
-                            .map(key => ({
-                              title: key,
-                              dataIndex: key,
-                              key: key,
-                            })) : []}
-                          pagination={{ pageSize: 10 }}
-                          scroll={{ x: 'max-content' }}
-                          size="small"
+                        <RemoteTable
+                          apiBaseUrl={API_BASE_URL}
+                          resultId={result.result_id}
+                          tableName={result.table_name}
+                          columns={result.tables?.[result.table_name]?.columns || Object.keys(result.table_data[0])}
+                          initialRows={result.table_data}
+                          total={result.table_total ?? result.table_data.length}
+                          pageSize={PAGE_SIZE}
                         />
                       </div>
                     )}
@@ -0,0 +1,62 @@
+import React, { useEffect, useState } from 'react';
+import { Table, message } from 'antd';
+import axios from 'axios';
+
+// 服务端分页表格：按页从 /api/results/<result_id>/table 读取已缓存的结果，排序在服务端完成
+function RemoteTable({ apiBaseUrl, resultId, tableName, columns, initialRows, total, pageSize = 20, raw = false, renderCell }) {
+  const [rows, setRows] = useState(initialRows || []);
+  const [loading, setLoading] = useState(false);
+  const [query, setQuery] = useState({ current: 1, sortBy: null, order: null });
+
+  useEffect(() => {
+    // 第一页（未排序）已随计算结果返回，无需再次请求
+    if (query.current === 1 && !query.sortBy && initialRows) {
+      setRows(initialRows);
+      return;
+    }
+    setLoading(true);
+    axios.get(`${apiBaseUrl}/api/results/${resultId}/table`, {
+      params: {
+        name: tableName,
+        offset: (query.current - 1) * pageSize,
+        limit: pageSize,
+        sort_by: query.sortBy || undefined,
+        order: query.order || undefined,
+        raw: raw ? 1 : undefined,
+      },
+    })
+      .then((response) => setRows(response.data.rows))
+      .catch((error) => message.error('读取数据失败：' + (error.response?.data?.error || error.message)))
+      .finally(() => setLoading(false));
+  }, [apiBaseUrl, resultId, tableName, pageSize, raw, query, initialRows]);
+
+  const handleChange = (pagination, filters, sorter) => {
+    setQuery({
+      current: pagination.current,
+      sortBy: sorter.order ? sorter.field : null,
+      order: sorter.order === 'descend' ? 'desc' : sorter.order === 'ascend' ? 'asc' : null,
+    });
+  };
+
+  return (
+    <Table
+      dataSource={rows.map((row, idx) => ({ ...row, _key: `${resultId}-${tableName}-${query.current}-${idx}` }))}
+      columns={columns.map((key) => ({
+        title: key,
+        dataIndex: key,
+        key: key,
+        sorter: true,
+        sortOrder: query.sortBy === key ? (query.order === 'desc' ? 'descend' : 'ascend') : null,
+        render: renderCell,
+      }))}
+      loading={loading}
+      onChange={handleChange}
+      pagination={{ current: query.current, pageSize, total, showSizeChanger: false }}
+      scroll={{ x: 'max-content' }}
+      size="small"
+      rowKey="_key"
+    />
+  );
+}
+
+export default RemoteTable;
@@ -0,0 +1,79 @@
+"""
+持有期收益分布 - 命令行版本
+统计任意一天买入、持有N天的盈利概率、收益率分位数和最差情况
+"""
+import argparse
+import os
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='持有期收益分布 - 任意一天买入持有N天的盈利概率和收益率分布',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+    # 默认持有 30/90/180/365/730 天
+    python holding_period.py -f 买入平均收益_净值列表/日度净值.xlsx
+
+    # 指定持有天数和分位数
+    python holding_period.py -f 买入平均收益_净值列表/日度净值.xlsx --days 60 120 365 --percentiles 10 50 90
+
+    # 同时输出每个买入日的收益率明细
+    python holding_period.py -f 买入平均收益_净值列表/日度净值.xlsx --detail
+        """
+    )
+
+    parser.add_argument('-f', '--file', type=str, required=True,
+                        help='Excel文件路径')
+    parser.add_argument('-o', '--output', type=str, default='./持有期_output',
+                        help='输出目录（默认: ./持有期_output）')
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 90, 180, 365, 730],
+                        help='持有天数（自然日，默认: 30 90 180 365 730）')
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[5, 25, 50, 75, 95],
+                        help='输出的收益率分位数（默认: 5 25 50 75 95）')
+    parser.add_argument('--detail', action='store_true',
+                        help='输出每个买入日在各持有天数下的收益率明细')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"错误: 文件不存在 - {args.file}")
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+
+    print("=" * 60)
+    print("持有期收益分布")
+    print("=" * 60)
+    print(f"输入文件: {args.file}")
+    print(f"持有天数: {', '.join(str(d) for d in sorted(set(args.days)))}")
+    print(f"输出目录: {args.output}")
+    print("=" * 60)
+
+    from utils.holding_period import HoldingPeriodAnalyzer
+    try:
+        analyzer = HoldingPeriodAnalyzer(args.file, args.days)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+
+    info = analyzer.get_product_info()
+    print(f"产品名称: {info['name']}")
+    print(f"产品代码: {info['code']}")
+    print(f"数据日期范围: {info['date_range']}")
+
+    distribution = analyzer.get_distribution(args.percentiles)
+    analyzer.print_summary(distribution)
+
+    base_name = os.path.splitext(os.path.basename(args.file))[0]
+    output_file = os.path.join(args.output, f"{base_name}_持有期收益分布.xlsx")
+    analyzer.save_to_excel(output_file, include_detail=args.detail, percentiles=args.percentiles)
+
+    print("\n" + "=" * 60)
+    print("处理完成!")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,7 @@
 """
 import argparse
 import os
-from utils import MultiProductExcelProcessor
-from utils.buy_rules import EveryFridayRule, MonthlyDayRule, SpecificDateRule, WeeklyRule
+from utils.run_manifest import RunManifest
 
 
 def main():
@@ -32,6 +31,12 @@ def main():
 
   # 从指定目录的所有产品文件，并计算周期收益
   python merge_excel.py -d "买入平均收益_净值列表" -o "买入平均收益_净值列表/日度净值.xlsx" --rule friday
+
+  # 同时计算周度收益率相关性矩阵（也可输出为 .parquet）
+  python merge_excel.py -d "买入平均收益_净值列表" --correlation W --correlation-output 相关性矩阵.xlsx
+
+  # 忽略运行清单，强制重新处理
+  python merge_excel.py -d "买入平均收益_净值列表" --rule friday --force
         """
     )
 
@@ -67,6 +72,18 @@ def main():
     parser.add_argument('--returns-output', type=str, default=None,
                         help='收益计算结果输出文件路径（可选）')
 
+    # 相关性矩阵参数
+    parser.add_argument('--correlation', type=str, default=None, choices=['D', 'W', 'M'],
+                        help='计算产品收益率相关性矩阵: D(日度), W(周度), M(月度)')
+    parser.add_argument('--correlation-output', type=str, default=None,
+                        help='相关性矩阵输出文件（.xlsx 或 .parquet，默认：相关性矩阵.xlsx）')
+
+    # 断点续跑参数
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='运行清单文件路径（默认: 产品文件所在目录/.run_manifest.json）')
+    parser.add_argument('--force', action='store_true',
+                        help='忽略运行清单，重新处理所有产品')
+
     args = parser.parse_args()
 
     # 确定产品文件模式
@@ -98,6 +115,10 @@ def main():
     print()
 
     try:
+        # pandas等在解析参数、检查文件之后才导入
+        from utils import MultiProductExcelProcessor
+        from utils.buy_rules import EveryFridayRule, MonthlyDayRule, SpecificDateRule, WeeklyRule
+
         # 创建买入规则实例（如果指定了规则）
         buy_rule = None
         if args.rule:
@@ -120,16 +141,24 @@ def main():
                 print(f"❌ 错误: 创建买入规则失败 - {e}")
                 return
 
+        # 运行清单：未变化的产品直接复用上次的计算结果
+        manifest_path = args.manifest or os.path.join(os.path.dirname(products_pattern), '.run_manifest.json')
+        manifest = RunManifest(manifest_path)
+
         # 创建处理器并执行处理
         processor = MultiProductExcelProcessor(
             products_pattern=products_pattern,
             start_date=args.start_date,
-            buy_rule=buy_rule # type: ignore
+            buy_rule=buy_rule, # type: ignore
+            manifest=manifest,
+            force=args.force
         )
         processor.process(
             output_file=args.output,
             calculate_returns=(buy_rule is not None),
-            returns_output_file=args.returns_output
+            returns_output_file=args.returns_output,
+            correlation_frequency=args.correlation,
+            correlation_output=args.correlation_output
         )
 
         print()
@@ -4,8 +4,89 @@
 """
 import argparse
 import os
-from utils.periodic_buy_calculator import PeriodicBuyCalculator
-from utils.buy_rules import EveryFridayRule, MonthlyDayRule, SpecificDateRule, WeeklyRule
+
+
+def run_matrix(args):
+    """多产品 × 多规则矩阵模式"""
+    from utils.periodic_buy_calculator import build_rule_matrix, save_rule_matrix
+    from utils.buy_rules import parse_rule_spec
+
+    try:
+        buy_rules = [parse_rule_spec(spec) for spec in args.rules]
+    except Exception as e:
+        print(f"错误: 创建买入规则失败 - {e}")
+        return
+
+    print("=" * 80)
+    print("周期性买入收益矩阵")
+    print("=" * 80)
+    print(f"产品文件: {len(args.file)} 个")
+    print(f"买入规则: {', '.join(rule.get_rule_name() for rule in buy_rules)}")
+    print(f"输出目录: {args.output}")
+    print("=" * 80)
+
+    matrix = build_rule_matrix(args.file, buy_rules, include_detail=args.detail)
+
+    output_file = os.path.join(args.output, "买入收益矩阵.xlsx")
+    save_rule_matrix(matrix, output_file)
+
+    print("\n平均区间收益率:")
+    print(matrix['平均区间收益率'].map(lambda x: f"{x:.2%}" if x == x else '-').to_string())
+    print("\n平均区间年化收益率:")
+    print(matrix['平均区间年化收益率'].map(lambda x: f"{x:.2%}" if x == x else '-').to_string())
+    print(f"\nExcel结果已保存到: {output_file}")
+    print("\n" + "=" * 80)
+    print("处理完成!")
+    print("=" * 80)
+
+
+def output_rule_name(args) -> str:
+    """输出文件名中的规则名称"""
+    if args.rule == 'monthly':
+        return f"monthly{args.day}"
+    if args.rule == 'weekly':
+        return f"weekly{args.weekday}"
+    return args.rule
+
+
+def run_workbook(args, buy_rule, sheets: dict):
+    """多产品工作簿（每个sheet一个产品）的单规则模式：逐个sheet计算，输出一个多产品结果文件"""
+    import pandas as pd
+    from utils.periodic_buy_calculator import PeriodicBuyCalculator, PERIODIC_PERCENT_COLUMNS
+    from utils.excel_style import excel_engine, style_sheet
+
+    if args.date or args.holidays:
+        print("⚠️  多产品工作簿不支持 --date / --holidays，已忽略")
+    print(f"多产品工作簿，共 {len(sheets)} 个产品sheet\n")
+
+    results, texts = {}, []
+    for sheet_name, raw_df in sheets.items():
+        try:
+            calculator = PeriodicBuyCalculator(raw_df, buy_rule)
+            results[sheet_name] = calculator.calculate_buy_returns()
+            texts.append(calculator.format_output_text())
+            print(f"  ✓ {calculator.product_name}: {len(calculator.buy_dates)} 个买入日期")
+        except Exception as e:
+            print(f"  ❌ {sheet_name}: 计算失败 - {e}")
+
+    base_name = os.path.splitext(os.path.basename(args.file))[0]
+    output_base = os.path.join(args.output, f"{base_name}_{output_rule_name(args)}")
+    if args.format in ['txt', 'both']:
+        with open(f"{output_base}.txt", 'w', encoding='utf-8') as f:
+            f.write("\n\n".join(texts))
+        print(f"\nTXT结果已保存到: {output_base}.txt")
+    if args.format in ['excel', 'both']:
+        # 每个产品一个sheet（与输入工作簿的sheet名相同）
+        with pd.ExcelWriter(f"{output_base}.xlsx", engine=excel_engine()) as writer:
+            for sheet_name, results_df in results.items():
+                results_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                style_sheet(writer, sheet_name, results_df, min_width=15,
+                            percent_columns=PERIODIC_PERCENT_COLUMNS)
+        print(f"Excel结果已保存到: {output_base}.xlsx")
+
+    print("\n" + "=" * 80)
+    print("处理完成!")
+    print("=" * 80)
 
 
 def main():
@@ -21,6 +102,9 @@ def main():
     # 使用每月20日买入规则
     python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule monthly --day 20
 
+    # 每月20日买入，遇非交易日顺延到当月下一个交易日（可用节假日文件指定交易日历）
+    python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule monthly --day 20 --roll-forward --holidays 节假日.txt
+
     # 查询特定日期买入的收益（如2025-11-22周五买入）
     python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule friday --date 2025-11-22
 
@@ -29,27 +113,55 @@ def main():
 
     # 指定输出目录和格式
     python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule friday -o ./output --format both
+
+    # 规则表达式：每月最后一个交易日 / 每月第二个周二 / 隔周五 / 组合与日期范围
+    python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule expr --expr "last(M)"
+    python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule expr --expr "nth_weekday(2, tue)"
+    python periodic_buy.py -f 买入平均收益_净值列表/日度净值.xlsx --rule expr --expr "every(2, fri) & after(2020-01-01)"
+
+    # 多产品 × 多规则收益矩阵（每个文件只读取一次）
+    python periodic_buy.py -f 产品1.xlsx 产品2.xlsx --rules friday monthly:20 weekly:0 weekly:1 --detail
+
+    # 多产品工作簿（每个sheet一个产品，如 merge_excel.py 生成的合并文件）：一次读入全部产品
+    python periodic_buy.py -f 日度净值_合并.xlsx --rule friday --format both
+    python periodic_buy.py -f 日度净值_合并.xlsx --rules friday monthly:20
         """
     )
 
     # 文件参数
-    parser.add_argument('-f', '--file', type=str, required=True,
-                        help='Excel文件路径')
+    parser.add_argument('-f', '--file', type=str, nargs='+', required=True,
+                        help='Excel文件路径（矩阵模式下可指定多个；多产品工作簿的每个sheet作为一个产品）')
 
     # 买入规则参数
-    parser.add_argument('--rule', type=str, required=True,
-                        choices=['friday', 'monthly', 'weekly', 'specific'],
-                        help='买入规则: friday(每周五), monthly(每月指定日), weekly(每周指定日), specific(指定日期)')
+    parser.add_argument('--rule', type=str,
+                        choices=['friday', 'monthly', 'weekly', 'specific', 'expr'],
+                        help='买入规则: friday(每周五), monthly(每月指定日), weekly(每周指定日), specific(指定日期), '
+                             'expr(规则表达式)')
+
+    parser.add_argument('--rules', type=str, nargs='+',
+                        help='矩阵模式的规则列表，如: friday monthly:20 weekly:0 specific:2025-11-21')
+
+    parser.add_argument('--detail', action='store_true',
+                        help='矩阵模式下同时输出每次买入的明细')
     
     parser.add_argument('--day', type=int, default=20,
                         help='每月第几天买入（用于monthly规则，默认20）')
     
+    parser.add_argument('--roll-forward', action='store_true',
+                        help='每月指定日不是交易日时顺延到当月下一个交易日（用于monthly规则）')
+
+    parser.add_argument('--holidays', type=str,
+                        help='节假日文件（每行一个日期），用于生成交易日历；默认使用净值日期')
+
     parser.add_argument('--weekday', type=int, choices=range(7),
                         help='每周第几天买入（用于weekly规则，0=周一, 4=周五, 6=周日）')
     
     parser.add_argument('--target-date', type=str,
                         help='指定买入日期（用于specific规则，格式：YYYY-MM-DD 或 YYYYMMDD）')
 
+    parser.add_argument('--expr', type=str,
+                        help='规则表达式（用于expr规则），如 "last(M)"、"roll(day(20))"、"(fri | day(1)) & !month(2)"')
+
     # 查询特定日期参数
     parser.add_argument('--date', type=str,
                         help='只输出特定日期买入的收益（格式：YYYY-MM-DD 或 YYYYMMDD）')
@@ -65,19 +177,39 @@ def main():
     args = parser.parse_args()
 
     # 检查文件是否存在
-    if not os.path.exists(args.file):
-        print(f"错误: 文件不存在 - {args.file}")
-        return
+    for file_path in args.file:
+        if not os.path.exists(file_path):
+            print(f"错误: 文件不存在 - {file_path}")
+            return
 
     # 创建输出目录
     os.makedirs(args.output, exist_ok=True)
 
+    # 多产品 × 多规则矩阵模式
+    if args.rules:
+        run_matrix(args)
+        return
+
+    if args.rule is None:
+        print("错误: 必须指定 --rule（单规则）或 --rules（矩阵模式）")
+        return
+    if len(args.file) > 1:
+        print("错误: 单规则模式只支持一个文件，多个文件请使用 --rules 矩阵模式")
+        return
+    args.file = args.file[0]
+
+    # pandas等在解析参数之后才导入，--help 和参数错误无需等待
+    from utils.periodic_buy_calculator import PeriodicBuyCalculator
+    from utils.buy_rules import EveryFridayRule, MonthlyDayRule, SpecificDateRule, WeeklyRule
+    from utils.rule_dsl import ExprRule
+    from utils.trading_calendar import TradingCalendar
+
     # 根据规则创建买入规则实例
     try:
         if args.rule == 'friday':
             buy_rule = EveryFridayRule()
         elif args.rule == 'monthly':
-            buy_rule = MonthlyDayRule(day=args.day)
+            buy_rule = MonthlyDayRule(day=args.day, roll_forward=args.roll_forward)
         elif args.rule == 'weekly':
             if args.weekday is None:
                 print("错误: 使用 weekly 规则时必须指定 --weekday 参数")
@@ -88,6 +220,11 @@ def main():
                 print("错误: 使用 specific 规则时必须指定 --target-date 参数")
                 return
             buy_rule = SpecificDateRule(target_date=args.target_date)
+        elif args.rule == 'expr':
+            if args.expr is None:
+                print("错误: 使用 expr 规则时必须指定 --expr 参数")
+                return
+            buy_rule = ExprRule(args.expr)
         else:
             print(f"错误: 未知的买入规则 - {args.rule}")
             return
@@ -103,9 +240,18 @@ def main():
     print(f"输出目录: {args.output}")
     print("=" * 80)
 
-    # 创建计算器并加载数据
+    # 创建计算器并加载数据（多产品工作簿只打开一次，读入全部sheet）
     print("\n正在加载数据...")
-    calculator = PeriodicBuyCalculator(args.file, buy_rule)
+    from utils.nav_loader import read_nav_sheets
+    sheets = read_nav_sheets(args.file)
+    if len(sheets) > 1:
+        run_workbook(args, buy_rule, sheets)
+        return
+    calculator = PeriodicBuyCalculator(next(iter(sheets.values()), args.file), buy_rule)
+    if args.holidays:
+        calculator.calendar = TradingCalendar.from_holiday_file(
+            args.holidays, calculator.df.index.min(), calculator.df.index.max()
+        )
     info = calculator.get_product_info()
     print(f"产品名称: {info['name']}")
     print(f"产品代码: {info['code']}")
@@ -141,17 +287,11 @@ def main():
     # 执行计算
     print("\n正在计算买入收益...")
     calculator.calculate_buy_returns()
-    print(f"找到 {info['buy_count']} 个符合规则的买入日期")
+    print(f"找到 {len(calculator.buy_dates)} 个符合规则的买入日期")
 
     # 生成输出文件名
     base_name = os.path.splitext(os.path.basename(args.file))[0]
-    rule_name = args.rule
-    if args.rule == 'monthly':
-        rule_name = f"monthly{args.day}"
-    elif args.rule == 'weekly':
-        rule_name = f"weekly{args.weekday}"
-    
-    output_base = os.path.join(args.output, f"{base_name}_{rule_name}")
+    output_base = os.path.join(args.output, f"{base_name}_{output_rule_name(args)}")
 
     # 保存结果
     if args.format in ['txt', 'both']:
@@ -1,26 +1,103 @@
-"""工具包初始化文件"""
-
-from .product_calculator import ProductNetValueCalculator
-from .buy_avg_calculator import BuyAvgReturnCalculator
-from .tools import process_single_file, generate_summary_file
-from .periodic_buy_calculator import PeriodicBuyCalculator
-from .buy_rules import (
-    BuyRule, EveryFridayRule, MonthlyDayRule, 
-    SpecificDateRule, WeeklyRule, get_rule_by_name
-)
-from .multi_product_processor import MultiProductExcelProcessor
+"""工具包初始化文件
+
+各计算器依赖 pandas/numpy/openpyxl，导入较慢。这里按需加载：
+`from utils import X` 或 `utils.X` 第一次访问时才导入对应模块，
+`import utils.run_manifest` 等轻量子模块也不会连带导入 pandas。
+"""
+import importlib
+from typing import TYPE_CHECKING
+
+# 公开名称 -> 所在子模块
+_LAZY_IMPORTS = {
+    'ProductNetValueCalculator': 'product_calculator',
+    'BuyAvgReturnCalculator': 'buy_avg_calculator',
+    'process_single_file': 'tools',
+    'generate_summary_file': 'tools',
+    'PeriodicBuyCalculator': 'periodic_buy_calculator',
+    'build_rule_matrix': 'periodic_buy_calculator',
+    'save_rule_matrix': 'periodic_buy_calculator',
+    'BuyRule': 'buy_rules',
+    'EveryFridayRule': 'buy_rules',
+    'MonthlyDayRule': 'buy_rules',
+    'SpecificDateRule': 'buy_rules',
+    'WeeklyRule': 'buy_rules',
+    'get_rule_by_name': 'buy_rules',
+    'parse_rule_spec': 'buy_rules',
+    'MultiProductExcelProcessor': 'multi_product_processor',
+    'DCASimulator': 'dca_simulator',
+    'simulate_products': 'dca_simulator',
+    'xirr': 'dca_simulator',
+    'TradingCalendar': 'trading_calendar',
+    'annualize_return': 'trading_calendar',
+    'BenchmarkAnalyzer': 'benchmark_analyzer',
+    'pairwise_cov_corr': 'correlation',
+    'IntervalQueryIndex': 'interval_index',
+    'HoldingPeriodAnalyzer': 'holding_period',
+    'ExprRule': 'rule_dsl',
+    'compile_rule': 'rule_dsl',
+    'NavSeries': 'nav_series',
+}
+
+if TYPE_CHECKING:
+    from .product_calculator import ProductNetValueCalculator
+    from .buy_avg_calculator import BuyAvgReturnCalculator
+    from .tools import process_single_file, generate_summary_file
+    from .periodic_buy_calculator import PeriodicBuyCalculator, build_rule_matrix, save_rule_matrix
+    from .buy_rules import (
+        BuyRule, EveryFridayRule, MonthlyDayRule,
+        SpecificDateRule, WeeklyRule, get_rule_by_name, parse_rule_spec
+    )
+    from .multi_product_processor import MultiProductExcelProcessor
+    from .dca_simulator import DCASimulator, simulate_products, xirr
+    from .trading_calendar import TradingCalendar, annualize_return
+    from .benchmark_analyzer import BenchmarkAnalyzer
+    from .correlation import pairwise_cov_corr
+    from .interval_index import IntervalQueryIndex
+    from .holding_period import HoldingPeriodAnalyzer
+    from .rule_dsl import ExprRule, compile_rule
+    from .nav_series import NavSeries
+
+
+def __getattr__(name: str):
+    """第一次访问公开名称时导入对应子模块，并缓存到包的命名空间"""
+    module_name = _LAZY_IMPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
 
 __all__ = [
-    'ProductNetValueCalculator', 
-    'BuyAvgReturnCalculator', 
-    'process_single_file', 
+    'ProductNetValueCalculator',
+    'BuyAvgReturnCalculator',
+    'process_single_file',
     'generate_summary_file',
     'PeriodicBuyCalculator',
+    'build_rule_matrix',
+    'save_rule_matrix',
     'BuyRule',
     'EveryFridayRule',
     'MonthlyDayRule',
     'SpecificDateRule',
     'WeeklyRule',
     'get_rule_by_name',
-    'MultiProductExcelProcessor'
+    'parse_rule_spec',
+    'MultiProductExcelProcessor',
+    'DCASimulator',
+    'simulate_products',
+    'xirr',
+    'TradingCalendar',
+    'annualize_return',
+    'BenchmarkAnalyzer',
+    'pairwise_cov_corr',
+    'IntervalQueryIndex',
+    'HoldingPeriodAnalyzer',
+    'ExprRule',
+    'compile_rule',
+    'NavSeries'
 ]
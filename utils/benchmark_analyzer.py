@@ -0,0 +1,156 @@
+"""基准对比分析 - 多产品相对同一基准的超额收益、Beta、Alpha、跟踪误差、信息比率"""
+import os
+import numpy as np
+import pandas as pd
+from .nav_loader import load_nav_file
+from .trading_calendar import PERIODS_PER_YEAR
+from .returns import ReturnSeries, resample_nav, check_frequency
+from .excel_style import excel_engine, style_sheet
+
+
+class BenchmarkAnalyzer:
+    """基准对比分析器 - 基准只读取、对齐一次，所有产品一次性向量化计算"""
+
+    def __init__(self, benchmark_path: str, frequency: str = 'W', risk_free_rate: float = 0.02):
+        """
+        初始化分析器
+
+        Args:
+            benchmark_path: 基准净值文件路径（与产品文件格式相同）
+            frequency: 收益率频率（'D' 日度, 'W' 周度, 'M' 月度）
+            risk_free_rate: 无风险利率（年化）
+        """
+        check_frequency(frequency)
+        self.benchmark_path: str = benchmark_path
+        self.frequency: str = frequency
+        self.risk_free_rate: float = risk_free_rate
+        self.periods_per_year: int = PERIODS_PER_YEAR[frequency]
+
+        self.benchmark_name, self.benchmark_code, benchmark_df = load_nav_file(benchmark_path)
+        benchmark = ReturnSeries(benchmark_df['单位净值'])
+        self.benchmark_nav: pd.Series = benchmark.period_nav(frequency)
+        self.benchmark_returns: pd.Series = self.benchmark_nav.pct_change()
+
+    def _resample(self, nav: pd.Series) -> pd.Series:
+        """将净值重采样到分析频率（每期取最后一个净值）"""
+        return resample_nav(nav, self.frequency)
+
+    def analyze(self, products: dict) -> pd.DataFrame:
+        """
+        计算所有产品相对基准的指标
+
+        Args:
+            products: {产品名称: 以日期为索引的单位净值Series}
+
+        Returns:
+            pd.DataFrame: 每个产品一行
+        """
+        if not products:
+            return pd.DataFrame()
+
+        # 所有产品对齐到基准的日期索引，构成 T × N 收益率矩阵
+        navs = pd.concat({name: self._resample(nav) for name, nav in products.items()}, axis=1)
+        navs = navs.reindex(self.benchmark_nav.index)
+        P = navs.pct_change(fill_method=None).to_numpy(dtype=float)
+        b = self.benchmark_returns.to_numpy(dtype=float)[:, None]
+
+        # 逐产品只使用与基准同时有收益率的期间
+        mask = np.isfinite(P) & np.isfinite(b)
+        n = mask.sum(axis=0).astype(float)
+        Pz = np.where(mask, P, 0.0)
+        bz = np.where(mask, b, 0.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_p = Pz.sum(axis=0) / n
+            mean_b = bz.sum(axis=0) / n
+            dp = np.where(mask, Pz - mean_p, 0.0)
+            db = np.where(mask, bz - mean_b, 0.0)
+            cov = (dp * db).sum(axis=0) / (n - 1)
+            var_b = (db * db).sum(axis=0) / (n - 1)
+            var_p = (dp * dp).sum(axis=0) / (n - 1)
+            beta = cov / var_b
+            correlation = cov / np.sqrt(var_b * var_p)
+
+            # Jensen Alpha（年化）
+            rf_period = (1 + self.risk_free_rate) ** (1 / self.periods_per_year) - 1
+            alpha = (mean_p - rf_period - beta * (mean_b - rf_period)) * self.periods_per_year
+
+            # 超额收益、跟踪误差、信息比率
+            excess = np.where(mask, Pz - bz, 0.0)
+            mean_excess = excess.sum(axis=0) / n
+            tracking_error = np.sqrt((np.where(mask, excess - mean_excess, 0.0) ** 2).sum(axis=0) / (n - 1)) \
+                * np.sqrt(self.periods_per_year)
+            information_ratio = mean_excess * self.periods_per_year / tracking_error
+
+            # 区间累计收益（同期）
+            product_cum = np.expm1(np.where(mask, np.log1p(Pz), 0.0).sum(axis=0))
+            benchmark_cum = np.expm1(np.where(mask, np.log1p(bz), 0.0).sum(axis=0))
+
+            # 上行/下行捕获率
+            up = mask & (b > 0)
+            down = mask & (b < 0)
+            up_capture = (np.where(up, Pz, 0.0).sum(axis=0) / up.sum(axis=0)) / \
+                (np.where(up, bz, 0.0).sum(axis=0) / up.sum(axis=0))
+            down_capture = (np.where(down, Pz, 0.0).sum(axis=0) / down.sum(axis=0)) / \
+                (np.where(down, bz, 0.0).sum(axis=0) / down.sum(axis=0))
+
+        result = pd.DataFrame({
+            '产品名称': list(navs.columns),
+            '基准名称': self.benchmark_name,
+            '对齐期数': n.astype(int),
+            '产品区间收益率': product_cum,
+            '基准区间收益率': benchmark_cum,
+            '超额收益率': product_cum - benchmark_cum,
+            'Beta': beta,
+            'Alpha(年化)': alpha,
+            '相关系数': correlation,
+            '跟踪误差(年化)': tracking_error,
+            '信息比率': information_ratio,
+            '上行捕获率': up_capture,
+            '下行捕获率': down_capture,
+        })
+        return result.replace([np.inf, -np.inf], np.nan)
+
+    def analyze_files(self, file_paths: list) -> pd.DataFrame:
+        """
+        读取多个产品文件并计算相对基准的指标
+
+        Args:
+            file_paths: 产品Excel文件路径列表
+
+        Returns:
+            pd.DataFrame: 每个产品一行
+        """
+        products = {}
+        codes = {}
+        for file_path in file_paths:
+            try:
+                product_name, product_code, df = load_nav_file(file_path)
+            except Exception as e:
+                print(f"  ⚠️  加载失败: {os.path.basename(file_path)} - {e}")
+                continue
+            if product_name in products:
+                product_name = f"{product_name}({product_code})"
+            products[product_name] = df['单位净值']
+            codes[product_name] = product_code
+
+        result = self.analyze(products)
+        if not result.empty:
+            result.insert(1, '产品代码', result['产品名称'].map(codes))
+        return result
+
+    def save_to_excel(self, result: pd.DataFrame, output_path: str):
+        """
+        保存基准对比结果到Excel文件
+
+        Args:
+            result: analyze/analyze_files 的结果
+            output_path: 输出文件路径
+        """
+        percent_cols = {'产品区间收益率', '基准区间收益率', '超额收益率', 'Alpha(年化)',
+                        '跟踪误差(年化)', '上行捕获率', '下行捕获率'}
+        with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
+            result.to_excel(writer, sheet_name='基准对比', index=False)
+            style_sheet(writer, '基准对比', result, min_width=12, percent_columns=percent_cols)
+        print(f"基准对比结果已保存: {output_path}")
+        return output_path
@@ -1,23 +1,32 @@
 """买入平均收益计算器类"""
+from typing import BinaryIO
+import numpy as np
 import pandas as pd
+from .buy_rules import MonthlyDayRule
+from .trading_calendar import TradingCalendar
+from .nav_series import NavSeries
+from .excel_style import excel_engine, style_sheet
 
 
 class BuyAvgReturnCalculator:
     """买入平均收益计算器 - 计算每月20日开放日以来的收益"""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str | BinaryIO | pd.DataFrame | NavSeries):
         """
         初始化计算器
 
         Args:
-            file_path: Excel文件路径
+            file_path: Excel文件路径、二进制文件对象（如上传文件的 BytesIO），或 read_nav_sheets 读入的原始sheet，
+                或已解析的 NavSeries（多个计算器共享同一份数据，不重复解析、不复制）
         """
-        self.file_path: str = file_path
+        self.file_path: str | BinaryIO | pd.DataFrame | NavSeries = file_path
         self.df: pd.DataFrame = pd.DataFrame()
         self.product_name: str = ""
         self.product_code: str = ""
         self.open_day_df: pd.DataFrame = pd.DataFrame()
         self.results: dict = {}
+        self.calendar: TradingCalendar = TradingCalendar([])
+        self.series: NavSeries | None = None
         self._load_data()
 
     def _load_data(self):
@@ -30,29 +39,19 @@ class BuyAvgReturnCalculator:
         - A2-C2: 列标题（日期、单位净值、累计净值）
         - A3起: 数据
         """
-        # 读取原始数据，不使用header
-        raw_df = pd.read_excel(self.file_path, header=None)
+        # 已解析的不可变序列直接共享，不重新读取
+        series = NavSeries.load(self.file_path)
+        self.series = series
+        self.product_name = series.product_name
+        self.product_code = series.product_code
 
-        # 获取产品信息（A1产品名称，B1产品代码）
-        self.product_name = str(raw_df.iloc[0, 0]).strip()  # A1
-        self.product_code = str(raw_df.iloc[0, 1]).strip()  # B1
+        # 倒序（最新在前），与系统导出的文件一致
+        self.df = series.frame(ascending=False)
+        self.calendar = TradingCalendar(series.dates)
 
-        # 获取数据部分（A2行是标题，A3行开始是数据）
-        data_df = raw_df.iloc[2:].copy()
-        data_df.columns = ['日期', '单位净值', '累计净值']
-
-        # 清理空行
-        data_df = data_df.dropna(subset=['日期'])
-
-        # 转换日期
-        data_df['日期'] = pd.to_datetime(data_df['日期'], format='%Y%m%d')
-        data_df.set_index("日期", inplace=True)
-
-        self.df = data_df
-
-    def get_open_day_data(self, day: int = 20):
+    def find_open_days(self, day: int = 20) -> pd.DataFrame:
         """
-        获取指定日期的净值数据（开放日）
+        获取指定日期的净值数据（开放日），不修改实例状态
         如果没找到指定日期，则顺延到下一个交易日
 
         Args:
@@ -61,63 +60,42 @@ class BuyAvgReturnCalculator:
         Returns:
             DataFrame: 开放日数据
         """
-        # 确保索引是DatetimeIndex
-        df = self.df.copy()
+        # 升序排列，与交易日历一致（sort_index 返回新的DataFrame，共享的净值序列不受影响）
+        df = self.df.sort_index()
 
         # 添加年份和月份列
         df['year'] = df.index.year  # type: ignore
         df['month'] = df.index.month  # type: ignore
         df['day'] = df.index.day  # type: ignore
 
-        # 获取所有年月组合（按时间正序）
-        year_months = sorted(df.groupby([df.index.year, df.index.month]).groups.keys())  # type: ignore
-
-        open_day_records = []
-
-        for year, month in year_months:
-            month_data = df[(df.index.year == year) & (df.index.month == month)]  # type: ignore
-
-            # 尝试找指定日期的记录
-            target_day_data = month_data[month_data['day'] == day]
-
-            if not target_day_data.empty:
-                # 找到指定日期的记录
-                open_day_records.append(target_day_data.iloc[0])
-            else:
-                # 没找到指定日期，顺延到下一个交易日
-                # 找该月>=指定日期的第一条记录（取日期最小的，即最接近指定日期的下一天）
-                next_trading_data = month_data[month_data['day'] >= day]
-                if not next_trading_data.empty:
-                    # 按日期排序，取最早的（最接近指定日期的下一天）
-                    next_trading_data_sorted = next_trading_data.sort_index()
-                    open_day_records.append(next_trading_data_sorted.iloc[0])
-                # 如果当月没有>=指定日期的交易日，跳过该月
+        # 与买入规则共用顺延逻辑：每月指定日期，非交易日顺延到当月下一个交易日，当月没有则跳过
+        open_day_rule = MonthlyDayRule(day=day, roll_forward=True)
+        mask = open_day_rule.get_buy_mask(pd.DatetimeIndex(df.index), self.calendar)
+        open_day_records = df[mask]
 
-        if open_day_records:
-            open_day_df = pd.DataFrame(open_day_records)
+        if not open_day_records.empty:
+            open_day_df = open_day_records.copy()
             open_day_df.index.name = '日期'
         else:
             open_day_df = pd.DataFrame()
-
-        self.open_day_df = open_day_df
         return open_day_df
 
-    def calculate_returns_since_open_day(self):
+    def returns_since_open_days(self, open_day_df: pd.DataFrame) -> dict:
         """
-        计算每个开放日以来的收益
+        计算每个开放日以来的收益，不修改实例状态
+
+        Args:
+            open_day_df: find_open_days 的结果
 
         Returns:
             dict: {年份: {月份: 收益率}}
         """
-        if self.open_day_df.empty:
-            self.get_open_day_data()
-
         # 获取最新净值（数据是倒序的，第一行是最新）
         latest_nav = self.df['单位净值'].iloc[0]
 
         results = {}
 
-        for idx, row in self.open_day_df.iterrows():
+        for idx, row in open_day_df.iterrows():
             open_date = idx
             open_nav = row['单位净值']
             year = open_date.year # type: ignore
@@ -131,10 +109,124 @@ class BuyAvgReturnCalculator:
 
             results[year][month] = return_rate
 
-        self.results = results
         return results
 
-    def generate_output_text(self) -> str:
+    def compute(self, day: int = 20) -> tuple:
+        """
+        计算开放日和各开放日以来的收益并返回（不修改实例状态，同一个计算器可在多个线程中同时调用）
+
+        Args:
+            day: 开放日日期（默认20日）
+
+        Returns:
+            tuple: (开放日DataFrame, {年份: {月份: 收益率}})
+        """
+        open_day_df = self.find_open_days(day)
+        return open_day_df, self.returns_since_open_days(open_day_df)
+
+    def get_open_day_data(self, day: int = 20):
+        """
+        获取指定日期的净值数据（开放日），结果保存到 self.open_day_df
+
+        Args:
+            day: 开放日日期（默认20日）
+
+        Returns:
+            DataFrame: 开放日数据
+        """
+        self.open_day_df = self.find_open_days(day)
+        return self.open_day_df
+
+    def calculate_returns_since_open_day(self):
+        """
+        计算每个开放日以来的收益，结果保存到 self.results
+
+        Returns:
+            dict: {年份: {月份: 收益率}}
+        """
+        if self.open_day_df.empty:
+            self.get_open_day_data()
+        self.results = self.returns_since_open_days(self.open_day_df)
+        return self.results
+
+    def get_cohort_matrix(self) -> pd.DataFrame:
+        """
+        开放日收益矩阵：第 i 个开放日买入、第 j 个开放日赎回（i < j）的收益率
+
+        由开放日净值向量的外比值一次算出，对角线及以下为空。
+
+        Returns:
+            pd.DataFrame: 行为买入开放日，列为赎回开放日
+        """
+        open_day_df = self.open_day_df if not self.open_day_df.empty else self.find_open_days()
+        if open_day_df.empty:
+            return pd.DataFrame()
+
+        navs = pd.to_numeric(open_day_df['单位净值'], errors='coerce').to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = navs[None, :] / navs[:, None] - 1
+        matrix[np.tril_indices(len(navs))] = np.nan
+
+        labels = open_day_df.index.strftime('%Y-%m-%d')  # type: ignore
+        return pd.DataFrame(matrix, index=pd.Index(labels, name='买入开放日'),
+                            columns=pd.Index(labels, name='赎回开放日'))
+
+    def get_cohort_summary(self, matrix: pd.DataFrame | None = None) -> pd.DataFrame:
+        """
+        按持有开放日个数汇总开放日收益矩阵（第 k 条上对角线即持有 k 个开放日的全部样本）
+
+        Args:
+            matrix: get_cohort_matrix 的结果（可选，默认重新计算）
+
+        Returns:
+            pd.DataFrame: 以持有开放日个数为索引，每行一个持有长度
+        """
+        if matrix is None:
+            matrix = self.get_cohort_matrix()
+        m = len(matrix)
+        if m < 2:
+            return pd.DataFrame()
+
+        # 把上对角线对齐成列：by_lag[i, k-1] = matrix[i, i + k]
+        values = matrix.to_numpy(dtype=float)
+        rows = np.arange(m)[:, None]
+        lags = np.arange(1, m)[None, :]
+        cols = rows + lags
+        by_lag = np.where(cols < m, values[rows, np.minimum(cols, m - 1)], np.nan)
+
+        samples = np.isfinite(by_lag).sum(axis=0)
+        with np.errstate(invalid='ignore'):
+            summary = pd.DataFrame({
+                '样本数': samples,
+                '平均收益率': np.nanmean(by_lag, axis=0),
+                '收益率中位数': np.nanmedian(by_lag, axis=0),
+                '盈利概率': (by_lag > 0).sum(axis=0) / samples,
+                '最差收益率': np.nanmin(by_lag, axis=0),
+                '最好收益率': np.nanmax(by_lag, axis=0),
+            }, index=pd.Index(np.arange(1, m), name='持有开放日个数'))
+        return summary
+
+    def save_cohort_to_excel(self, output_path: str | BinaryIO):
+        """
+        保存开放日收益矩阵和按持有长度的汇总到Excel
+
+        Args:
+            output_path: 输出文件路径或二进制文件对象
+        """
+        matrix = self.get_cohort_matrix()
+        summary = self.get_cohort_summary(matrix)
+        sheets = {
+            '开放日收益矩阵': (matrix, list(matrix.columns)),
+            '按持有期汇总': (summary, [c for c in summary.columns if c != '样本数']),
+        }
+        with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
+            for sheet_name, (df, percent_columns) in sheets.items():
+                df.to_excel(writer, sheet_name=sheet_name)
+                style_sheet(writer, sheet_name, df.rename(columns=str), index=True,
+                            percent_columns=[str(c) for c in percent_columns], max_width=12)
+        return output_path
+
+    def generate_output_text(self, results: dict | None = None) -> str:
         """
         生成格式化的输出文本
 
@@ -144,18 +236,23 @@ class BuyAvgReturnCalculator:
         🔺8月买入平均收益##%
         ...
 
+        Args:
+            results: compute() 返回的收益（可选，默认使用实例上保存的结果）
+
         Returns:
             str: 格式化后的文本
         """
-        if not self.results:
-            self.calculate_returns_since_open_day()
+        if results is None:
+            if not self.results:
+                self.calculate_returns_since_open_day()
+            results = self.results
 
         lines = []
 
         # 按年份排序
-        for year in sorted(self.results.keys()):
+        for year in sorted(results.keys()):
             lines.append(f"⭐️{year}年")
-            months_data = self.results[year]
+            months_data = results[year]
 
             # 按月份排序
             for month in sorted(months_data.keys()):
@@ -165,7 +262,7 @@ class BuyAvgReturnCalculator:
                 lines.append(f"🔺{month}月买入平均收益{return_pct:.2f}%")
 
             # 年份之间空一行（除了最后一年）
-            if year != sorted(self.results.keys())[-1]:
+            if year != sorted(results.keys())[-1]:
                 lines.append("")
 
         return "\n".join(lines)
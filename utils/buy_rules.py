@@ -1,11 +1,21 @@
 """买入规则定义 - 可扩展的买入规则系统"""
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from .trading_calendar import TradingCalendar
 
 
 class BuyRule(ABC):
-    """买入规则基类"""
+    """
+    买入规则基类
+
+    规则日期不是交易日时：roll_forward=False 取消该次买入；
+    roll_forward=True 顺延到 roll_period 周期内（默认同一月）的下一个交易日。
+    """
+
+    roll_forward: bool = False
+    roll_period: str = 'M'
     
     @abstractmethod
     def should_buy(self, date: datetime, available_dates: set) -> bool:
@@ -39,19 +49,57 @@ class BuyRule(ABC):
         Returns:
             list: 所有买入日期列表
         """
-        buy_dates = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            # 检查是否应该买入
-            if self.should_buy(current_date, available_dates):
-                # 如果是交易日，直接买入；否则取消
-                if current_date in available_dates:
-                    buy_dates.append(current_date)
-            
-            current_date += timedelta(days=1)
-        
-        return sorted(buy_dates)
+        # 在全部交易日上计算掩码再截取区间，月末、隔周、顺延等与周期相关的规则不受区间边界影响
+        trading_days = pd.DatetimeIndex(sorted(available_dates))
+        if len(trading_days) == 0:
+            return []
+        bought = trading_days[self.get_buy_mask(trading_days)]
+        in_range = (bought >= pd.Timestamp(start_date)) & (bought <= pd.Timestamp(end_date))
+        return list(bought[in_range].to_pydatetime())
+
+    def match_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """
+        判断一组日期是否符合规则（不考虑是否为交易日）
+
+        子类可以覆盖为向量化实现；默认逐日调用 should_buy。
+
+        Args:
+            dates: 日期索引
+
+        Returns:
+            np.ndarray: 与 dates 等长的布尔数组
+        """
+        days = dates.to_pydatetime()
+        available_dates = set(days)
+        return np.fromiter((self.should_buy(d, available_dates) for d in days),
+                           dtype=bool, count=len(days))
+
+    def get_buy_mask(self, trading_days: pd.DatetimeIndex,
+                     calendar: TradingCalendar | None = None) -> np.ndarray:
+        """
+        在交易日索引上计算买入掩码
+
+        Args:
+            trading_days: 升序排列的交易日索引
+            calendar: 交易日历（可选，默认由 trading_days 构建；顺延规则使用）
+
+        Returns:
+            np.ndarray: 与 trading_days 等长的布尔数组
+        """
+        if not self.roll_forward:
+            return self.match_dates(trading_days)
+
+        if len(trading_days) == 0:
+            return np.zeros(0, dtype=bool)
+        calendar = calendar or TradingCalendar(trading_days)
+
+        # 在覆盖数据范围的自然日上找到规则日期，再顺延到同一周期内的下一个交易日
+        first_period_start = trading_days[0].to_period(self.roll_period).start_time
+        natural_days = pd.date_range(first_period_start, trading_days[-1], freq='D')
+        rule_days = natural_days[self.match_dates(natural_days)]
+        positions = calendar.roll_forward(rule_days, within=self.roll_period)
+        rolled_days = calendar.days[positions[positions >= 0]]
+        return np.asarray(trading_days.normalize().isin(rolled_days))
 
 
 class EveryFridayRule(BuyRule):
@@ -70,6 +118,10 @@ class EveryFridayRule(BuyRule):
         """
         # 4 代表周五（Monday=0, Sunday=6）
         return date.weekday() == 4
+
+    def match_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """向量化规则判断（每周五）"""
+        return np.asarray(dates.weekday == 4)
     
     def get_rule_name(self) -> str:
         return "每周五买入"
@@ -78,14 +130,16 @@ class EveryFridayRule(BuyRule):
 class MonthlyDayRule(BuyRule):
     """每月指定日期买入规则"""
     
-    def __init__(self, day: int = 20):
+    def __init__(self, day: int = 20, roll_forward: bool = False):
         """
         初始化每月指定日期买入规则
         
         Args:
             day: 每月的第几天（默认20日）
+            roll_forward: 当日不是交易日时是否顺延到当月下一个交易日（默认不顺延，取消买入）
         """
         self.day = day
+        self.roll_forward = roll_forward
     
     def should_buy(self, date: datetime, available_dates: set) -> bool:
         """
@@ -99,8 +153,14 @@ class MonthlyDayRule(BuyRule):
             bool: 是否应该买入
         """
         return date.day == self.day
+
+    def match_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """向量化规则判断（每月指定日期）"""
+        return np.asarray(dates.day == self.day)
     
     def get_rule_name(self) -> str:
+        if self.roll_forward:
+            return f"每月{self.day}日买入(遇非交易日顺延)"
         return f"每月{self.day}日买入"
 
 
@@ -132,6 +192,10 @@ class SpecificDateRule(BuyRule):
             bool: 是否应该买入
         """
         return date.date() == self.target_date.date()
+
+    def match_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """向量化规则判断（仅指定日期）"""
+        return np.asarray(dates.normalize() == pd.Timestamp(self.target_date.date()))
     
     def get_rule_name(self) -> str:
         return f"指定日期买入 ({self.target_date.strftime('%Y-%m-%d')})"
@@ -164,6 +228,10 @@ class WeeklyRule(BuyRule):
             bool: 是否应该买入
         """
         return date.weekday() == self.weekday
+
+    def match_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """向量化规则判断（每周指定星期几）"""
+        return np.asarray(dates.weekday == self.weekday)
     
     def get_rule_name(self) -> str:
         return f"每{self.weekday_names[self.weekday]}买入"
@@ -174,20 +242,23 @@ def get_rule_by_name(rule_name: str, **kwargs) -> BuyRule:
     根据规则名称获取买入规则实例
     
     Args:
-        rule_name: 规则名称（'friday', 'monthly', 'specific', 'weekly'）
+        rule_name: 规则名称（'friday', 'monthly', 'specific', 'weekly', 'expr'）
         **kwargs: 额外参数
             - day: 每月第几天（用于 monthly）
+            - roll_forward: 非交易日是否顺延（用于 monthly）
             - target_date: 目标日期（用于 specific）
             - weekday: 星期几（用于 weekly）
+            - expression: 规则表达式（用于 expr，见 utils/rule_dsl.py）
     
     Returns:
         BuyRule: 买入规则实例
     """
     rules = {
         'friday': EveryFridayRule,
-        'monthly': lambda: MonthlyDayRule(kwargs.get('day', 20)),
+        'monthly': lambda: MonthlyDayRule(kwargs.get('day', 20), kwargs.get('roll_forward', False)),
         'specific': lambda: SpecificDateRule(kwargs.get('target_date')), # type: ignore
-        'weekly': lambda: WeeklyRule(kwargs.get('weekday', 4))
+        'weekly': lambda: WeeklyRule(kwargs.get('weekday', 4)),
+        'expr': lambda: _expr_rule(kwargs.get('expression', ''))
     }
     
     if rule_name not in rules:
@@ -195,3 +266,47 @@ def get_rule_by_name(rule_name: str, **kwargs) -> BuyRule:
     
     rule_factory = rules[rule_name]
     return rule_factory() if callable(rule_factory) and rule_name in ['friday'] else rule_factory() # type: ignore
+
+
+def _expr_rule(expression: str) -> BuyRule:
+    """创建表达式买入规则（rule_dsl 依赖本模块，在此处导入）"""
+    from .rule_dsl import ExprRule
+    return ExprRule(expression)
+
+
+def parse_rule_spec(spec: str) -> BuyRule:
+    """
+    解析命令行中的规则描述，生成买入规则实例
+
+    支持的格式：
+        friday              每周五
+        monthly:20          每月20日
+        monthly:20:roll     每月20日，遇非交易日顺延到当月下一个交易日
+        weekly:0            每周一（0=周一, 6=周日）
+        specific:2025-11-21 指定日期
+        expr:last(M)        规则表达式（如 expr:nth_weekday(2,1)、expr:every(2,fri)，见 utils/rule_dsl.py）
+
+    Args:
+        spec: 规则描述字符串
+
+    Returns:
+        BuyRule: 买入规则实例
+    """
+    name, _, arg = spec.strip().partition(':')
+    name = name.strip().lower()
+    arg = arg.strip()
+
+    if name == 'friday':
+        return get_rule_by_name('friday')
+    if name == 'monthly':
+        day, _, option = arg.partition(':')
+        return get_rule_by_name('monthly', day=int(day) if day else 20, roll_forward=option.strip().lower() == 'roll')
+    if name == 'weekly':
+        return get_rule_by_name('weekly', weekday=int(arg) if arg else 4)
+    if name == 'specific':
+        if not arg:
+            raise ValueError("specific 规则需要指定日期，如 specific:2025-11-21")
+        return get_rule_by_name('specific', target_date=arg)
+    if name == 'expr':
+        return get_rule_by_name('expr', expression=arg)
+    raise ValueError(f"无法解析的规则描述: {spec}. 示例: friday, monthly:20, weekly:0, specific:2025-11-21, expr:last(M)")
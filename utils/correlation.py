@@ -0,0 +1,51 @@
+"""相关性分析 - 多产品收益率的成对协方差/相关系数矩阵"""
+import numpy as np
+import pandas as pd
+
+
+def pairwise_cov_corr(returns: pd.DataFrame, min_periods: int = 2) -> tuple:
+    """
+    计算成对完整（pairwise-complete）的协方差和相关系数矩阵
+
+    不同成立日期的产品只在双方都有收益率的期间上计算，
+    所有统计量由几次矩阵乘法（NumPy/BLAS）一次得到。
+
+    Args:
+        returns: T × N 收益率矩阵（列为产品，缺失为NaN）
+        min_periods: 计算一对产品所需的最少共同期数
+
+    Returns:
+        tuple: (协方差DataFrame, 相关系数DataFrame, 共同期数DataFrame)
+    """
+    X = returns.to_numpy(dtype=float)
+    M = np.isfinite(X).astype(float)
+    Xz = np.where(M > 0, X, 0.0)
+
+    # n[i, j]: 共同期数；Sx[i, j]: i 在共同期内的和；Sxx[i, j]: i 在共同期内的平方和
+    n = M.T @ M
+    Sx = Xz.T @ M
+    Sxx = (Xz * Xz).T @ M
+    Sxy = Xz.T @ Xz
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = (Sxy - Sx * Sx.T / n) / (n - 1)
+        var_i = (Sxx - Sx * Sx / n) / (n - 1)
+        var_j = var_i.T
+        corr = cov / np.sqrt(var_i * var_j)
+
+    insufficient = n < max(min_periods, 2)
+    # 共同期内方差为0（如净值不变）的产品相关系数无定义（与 pandas corr() 一致为NaN）；
+    # 常数收益率按上式相减会留下舍入误差，按均方的相对大小判断
+    with np.errstate(divide='ignore', invalid='ignore'):
+        flat = ~(var_i > 1e-12 * Sxx / n)
+    cov[insufficient] = np.nan
+    corr[insufficient | flat | flat.T] = np.nan
+    corr = np.clip(corr, -1.0, 1.0)
+    np.fill_diagonal(corr, np.where(np.diag(insufficient | flat), np.nan, 1.0))
+
+    columns = returns.columns
+    return (
+        pd.DataFrame(cov, index=columns, columns=columns),
+        pd.DataFrame(corr, index=columns, columns=columns),
+        pd.DataFrame(n.astype(int), index=columns, columns=columns),
+    )
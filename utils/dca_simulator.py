@@ -0,0 +1,257 @@
+"""定投模拟器 - 按买入规则定期定额投入，计算持仓路径与XIRR"""
+from typing import BinaryIO
+import numpy as np
+import pandas as pd
+from .buy_rules import BuyRule
+from .nav_series import NavSeries
+from .trading_calendar import TradingCalendar, DAYS_PER_YEAR
+
+
+def xirr_batch(amounts: np.ndarray, years: np.ndarray, guess: float = 0.1,
+               tol: float = 1e-10, max_iter: int = 100) -> np.ndarray:
+    """
+    批量计算XIRR（向量化牛顿法，每一行是一组现金流）
+
+    Args:
+        amounts: 现金流矩阵 (S, K)，投入为负、取回为正，不存在的现金流填0
+        years: 现金流发生时间（年），形状 (S, K) 或 (K,)
+        guess: 初始猜测收益率
+        tol: 收敛阈值
+        max_iter: 最大迭代次数
+
+    Returns:
+        np.ndarray: 每一行的XIRR，无解（现金流不变号）或不收敛时为NaN
+    """
+    amounts = np.atleast_2d(np.asarray(amounts, dtype=float))
+    years = np.broadcast_to(np.asarray(years, dtype=float), amounts.shape)
+
+    # 以每行第一笔现金流为时间起点，避免远期时间导致数值溢出
+    present = amounts != 0
+    first = np.where(present, years, np.inf).min(axis=1, keepdims=True)
+    first = np.where(np.isfinite(first), first, 0.0)
+    t = np.where(present, years - first, 0.0)
+
+    rate = np.full(amounts.shape[0], guess, dtype=float)
+    converged = np.zeros(amounts.shape[0], dtype=bool)
+    # 导数为0或步长非有限时牛顿法无法继续，该行判为无解（不能把初始猜测当作结果）
+    failed = np.zeros(amounts.shape[0], dtype=bool)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(max_iter):
+            active = ~(converged | failed)
+            if not active.any():
+                break
+            base = (1.0 + rate)[:, None]
+            discount = base ** (-t)
+            npv = (amounts * discount).sum(axis=1)
+            derivative = (-t * amounts * discount / base).sum(axis=1)
+            step = npv / derivative
+            valid = (derivative != 0) & np.isfinite(step)
+            failed |= active & ~valid
+            moving = active & valid
+            rate = np.where(moving, np.maximum(rate - step, -0.9999), rate)
+            converged |= moving & (np.abs(step) < tol)
+
+    # 只有同时存在投入和取回、且现金流不全在同一天时才有解
+    has_root = (amounts < 0).any(axis=1) & (amounts > 0).any(axis=1) & (t.max(axis=1) > 0)
+    return np.where(has_root & converged & ~failed, rate, np.nan)
+
+
+def xirr(cash_flows, dates) -> float:
+    """
+    计算一组现金流的XIRR
+
+    Args:
+        cash_flows: 现金流列表（投入为负、取回为正）
+        dates: 对应的日期列表
+
+    Returns:
+        float: 年化内部收益率，无解时为NaN
+    """
+    dates = pd.DatetimeIndex(dates)
+    years = np.asarray((dates - dates.min()).days, dtype=float) / DAYS_PER_YEAR
+    return float(xirr_batch(np.asarray(cash_flows, dtype=float)[None, :], years)[0])
+
+
+class DCASimulator:
+    """定投模拟器 - 每次买入投入固定金额，跟踪份额、成本、市值与XIRR"""
+
+    def __init__(self, file_path: str | BinaryIO | NavSeries, amount: float = 1000.0):
+        """
+        初始化模拟器
+
+        Args:
+            file_path: Excel文件路径、二进制文件对象或已解析的 NavSeries
+            amount: 每次定投金额
+        """
+        self.file_path = file_path
+        self.amount: float = amount
+        series = NavSeries.load(file_path)
+        self.product_name, self.product_code = series.product_name, series.product_code
+        self.df = series.frame().dropna(subset=['单位净值'])
+        self.trading_days = pd.DatetimeIndex(self.df.index)
+        self.navs: np.ndarray = self.df['单位净值'].to_numpy(dtype=float)
+        self.calendar = TradingCalendar(self.trading_days)
+
+    def _buy_positions(self, buy_rule: BuyRule) -> np.ndarray:
+        """买入规则在交易日索引上的位置"""
+        return np.flatnonzero(buy_rule.get_buy_mask(self.trading_days, self.calendar))
+
+    def simulate(self, buy_rule: BuyRule, start_date=None, end_date=None,
+                 with_xirr_path: bool = False) -> pd.DataFrame:
+        """
+        模拟从起始日期开始按规则定投的每日持仓路径
+
+        Args:
+            buy_rule: 买入规则实例
+            start_date: 定投起始日期（默认为数据首日）
+            end_date: 估值截止日期（默认为最新日期）
+            with_xirr_path: 是否计算每个交易日作为估值日时的XIRR
+
+        Returns:
+            pd.DataFrame: 每日的累计投入、持有份额、市值、累计收益和收益率
+        """
+        start = pd.Timestamp(start_date) if start_date is not None else self.trading_days[0]
+        end = pd.Timestamp(end_date) if end_date is not None else self.trading_days[-1]
+        in_range = (self.trading_days >= start) & (self.trading_days <= end)
+
+        days = self.trading_days[in_range]
+        navs = self.navs[in_range]
+        bought = buy_rule.get_buy_mask(self.trading_days, self.calendar)[in_range]
+
+        # 按买入日程做累计和，得到每日的份额与成本
+        invested = np.where(bought, self.amount, 0.0)
+        cost = np.cumsum(invested)
+        shares = np.cumsum(invested / navs)
+        market_value = shares * navs
+        profit = market_value - cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            profit_rate = np.where(cost > 0, profit / cost, np.nan)
+
+        path = pd.DataFrame({
+            '单位净值': navs,
+            '是否买入': bought,
+            '累计投入': cost,
+            '持有份额': shares,
+            '市值': market_value,
+            '累计收益': profit,
+            '收益率': profit_rate,
+        }, index=days)
+        path.index.name = '日期'
+
+        if with_xirr_path and len(days) > 0:
+            path['XIRR'] = self._xirr_path(days, bought, market_value)
+
+        return path
+
+    def _xirr_path(self, days: pd.DatetimeIndex, bought: np.ndarray,
+                   market_value: np.ndarray) -> np.ndarray:
+        """以每个交易日为估值日计算XIRR（所有估值日一次批量求解）"""
+        buy_days = days[bought]
+        years_buy = np.asarray((buy_days - days[0]).days, dtype=float) / DAYS_PER_YEAR
+        years_val = np.asarray((days - days[0]).days, dtype=float) / DAYS_PER_YEAR
+
+        # 行：估值日；列：各次买入 + 估值日市值
+        amounts = np.where(buy_days.values[None, :] <= days.values[:, None], -self.amount, 0.0)
+        amounts = np.hstack([amounts, market_value[:, None]])
+        years = np.hstack([np.broadcast_to(years_buy, (len(days), len(buy_days))), years_val[:, None]])
+        return xirr_batch(amounts, years)
+
+    def summarize(self, path: pd.DataFrame) -> dict:
+        """
+        汇总一条定投路径
+
+        Args:
+            path: simulate 的返回结果
+
+        Returns:
+            dict: 买入次数、累计投入、期末市值、累计收益率和XIRR
+        """
+        if path.empty:
+            return {'买入次数': 0, '累计投入': 0.0, '期末市值': 0.0, '累计收益率': np.nan, 'XIRR': np.nan}
+
+        buy_days = path.index[path['是否买入'].to_numpy()]
+        final_value = float(path['市值'].iloc[-1])
+        cash_flows = [-self.amount] * len(buy_days) + [final_value]
+        flow_dates = list(buy_days) + [path.index[-1]]
+        return {
+            '买入次数': len(buy_days),
+            '累计投入': float(path['累计投入'].iloc[-1]),
+            '期末市值': final_value,
+            '累计收益率': float(path['收益率'].iloc[-1]),
+            'XIRR': xirr(cash_flows, flow_dates) if len(buy_days) else np.nan,
+        }
+
+    def sweep_start_dates(self, buy_rule: BuyRule, start_dates, end_date=None) -> pd.DataFrame:
+        """
+        批量模拟不同起始日期的定投结果（所有起始日期一次向量化求解）
+
+        Args:
+            buy_rule: 买入规则实例
+            start_dates: 起始日期列表
+            end_date: 估值截止日期（默认为最新日期）
+
+        Returns:
+            pd.DataFrame: 每个起始日期的买入次数、累计投入、期末市值、累计收益率和XIRR
+        """
+        starts = pd.DatetimeIndex(pd.to_datetime(list(start_dates)))
+        end = pd.Timestamp(end_date) if end_date is not None else self.trading_days[-1]
+        end_pos = self.trading_days.searchsorted(end, side='right') - 1
+        end_nav = self.navs[end_pos]
+
+        positions = self._buy_positions(buy_rule)
+        positions = positions[positions <= end_pos]
+        buy_days = self.trading_days[positions]
+
+        # 从第k次买入到最后一次买入的份额后缀和：起始日期对应的期末份额 O(1) 可得
+        suffix_shares = np.append(np.cumsum((self.amount / self.navs[positions])[::-1])[::-1], 0.0)
+        first_buy = buy_days.searchsorted(starts, side='left')
+        buy_count = len(buy_days) - first_buy
+        final_value = suffix_shares[first_buy] * end_nav
+        invested = buy_count * self.amount
+
+        # XIRR：行是起始日期，列是各次买入 + 期末市值
+        years_buy = np.asarray((buy_days - self.trading_days[0]).days, dtype=float) / DAYS_PER_YEAR
+        years_end = (self.trading_days[end_pos] - self.trading_days[0]).days / DAYS_PER_YEAR
+        amounts = np.where(np.arange(len(buy_days))[None, :] >= first_buy[:, None], -self.amount, 0.0)
+        amounts = np.hstack([amounts, final_value[:, None]])
+        years = np.append(years_buy, years_end)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_return = np.where(invested > 0, final_value / invested - 1, np.nan)
+
+        return pd.DataFrame({
+            '产品名称': self.product_name,
+            '产品代码': self.product_code,
+            '起始日期': starts.strftime('%Y-%m-%d'),
+            '买入规则': buy_rule.get_rule_name(),
+            '买入次数': buy_count,
+            '累计投入': invested.astype(float),
+            '期末市值': final_value,
+            '累计收益率': total_return,
+            'XIRR': xirr_batch(amounts, years),
+        })
+
+
+def simulate_products(file_paths: list, buy_rule: BuyRule, start_dates=None,
+                      amount: float = 1000.0, end_date=None) -> pd.DataFrame:
+    """
+    多产品 × 多起始日期的定投模拟
+
+    Args:
+        file_paths: 产品Excel文件路径（或 NavSeries）列表
+        buy_rule: 买入规则实例
+        start_dates: 起始日期列表（默认为各产品数据首日）
+        amount: 每次定投金额
+        end_date: 估值截止日期（默认为各产品最新日期）
+
+    Returns:
+        pd.DataFrame: 每个产品、每个起始日期一行
+    """
+    results = []
+    for file_path in file_paths:
+        simulator = DCASimulator(file_path, amount)
+        if len(simulator.trading_days) == 0:
+            continue
+        starts = start_dates if start_dates else [simulator.trading_days[0]]
+        results.append(simulator.sweep_start_dates(buy_rule, starts, end_date))
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
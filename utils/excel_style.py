@@ -0,0 +1,193 @@
+"""Excel输出格式 - 按列（而不是逐个单元格）计算列宽和设置数值格式"""
+import re
+import numpy as np
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+# 全角字符（中文等）在Excel中约占两个字符宽度
+_WIDE_CHARS = r'[^\x00-\xff]'
+_DECIMALS = re.compile(r'\.(0+)')
+
+
+def excel_engine() -> str:
+    """
+    选择写入Excel的引擎
+
+    安装了 xlsxwriter 时优先使用（写入更快，且列格式一次设置即可作用于整列），
+    否则使用 openpyxl。
+    """
+    try:
+        import xlsxwriter  # noqa: F401
+        return 'xlsxwriter'
+    except ImportError:
+        return 'openpyxl'
+
+
+def text_width(text) -> int:
+    """单个字符串的显示宽度（全角字符按2计）"""
+    text = str(text)
+    return len(text) + len(re.findall(_WIDE_CHARS, text))
+
+
+def _number_width(values: np.ndarray, number_format: str | None) -> int:
+    """按数值格式估算数值列的最大显示宽度"""
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return 0
+    is_percent = bool(number_format and number_format.endswith('%'))
+    if is_percent:
+        values = values * 100
+    match = _DECIMALS.search(number_format or '')
+    if match:
+        decimals = len(match.group(1))
+    elif number_format:
+        decimals = 0
+    else:
+        decimals = 4
+    integer_digits = len(str(int(np.abs(values).max())))
+    width = integer_digits + (decimals + 1 if decimals else 0)
+    return width + int((values < 0).any()) + int(is_percent)
+
+
+def column_widths(df: pd.DataFrame, number_formats: list | None = None,
+                  min_width: int = 8, max_width: int = 50, padding: int = 2) -> list:
+    """
+    按列类型向量化计算列宽
+
+    文本列按字符串长度（全角字符按2计）取最大值，数值列按数值格式和最大绝对值估算，
+    日期列使用固定宽度，不需要把整列转换为字符串。
+
+    Args:
+        df: 要写入的DataFrame（不含索引）
+        number_formats: 每列的数值格式（与 column_number_formats 的返回值一致）
+        min_width: 最小列宽
+        max_width: 最大列宽
+        padding: 额外缓冲宽度
+
+    Returns:
+        list: 每列的列宽
+    """
+    number_formats = number_formats or [None] * len(df.columns)
+    widths = []
+    for (col, series), number_format in zip(df.items(), number_formats):
+        header = text_width(col)
+        if pd.api.types.is_bool_dtype(series):
+            data = 5
+        elif pd.api.types.is_numeric_dtype(series):
+            data = _number_width(series.to_numpy(dtype=float), number_format)
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            has_time = bool((series.dropna() != series.dropna().dt.normalize()).any())
+            data = 19 if has_time else 10
+        else:
+            text = series.dropna().astype(str)
+            data = int((text.str.len() + text.str.count(_WIDE_CHARS)).max()) if len(text) else 0
+        widths.append(min(max(header, data, min_width) + padding, max_width))
+    return widths
+
+
+def column_number_formats(df: pd.DataFrame, default_format: str = '0.0000',
+                          percent_columns=(), overrides: dict | None = None) -> list:
+    """
+    推断每列的数值格式
+
+    整数列（如年份、次数）为 '0'，浮点列为 default_format，
+    percent_columns 中的列为 '0.00%'，文本和日期列不设置格式（None）。
+
+    Args:
+        df: 要写入的DataFrame（不含索引）
+        default_format: 浮点列的默认格式
+        percent_columns: 显示为百分比的列名
+        overrides: {列名: 格式}，优先级最高
+
+    Returns:
+        list: 每列的数值格式
+    """
+    overrides = overrides or {}
+    percent_columns = set(percent_columns)
+    formats = []
+    for col, series in df.items():
+        if col in overrides:
+            formats.append(overrides[col])
+        elif pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+            formats.append(None)
+        elif col in percent_columns:
+            formats.append('0.00%')
+        elif pd.api.types.is_integer_dtype(series):
+            formats.append('0')
+        else:
+            formats.append(default_format)
+    return formats
+
+
+def style_sheet(writer: pd.ExcelWriter, sheet_name: str, df: pd.DataFrame, index: bool = False,
+                default_format: str = '0.0000', percent_columns=(), overrides: dict | None = None,
+                min_width: int = 8, max_width: int = 50, padding: int = 2):
+    """
+    设置已写入工作表的列宽和数值格式
+
+    xlsxwriter 引擎下每列只设置一次列格式；openpyxl 引擎下每列的格式预先确定，
+    只遍历一次有格式的数据区域，不再逐个单元格判断类型。
+
+    Args:
+        writer: pd.ExcelWriter
+        sheet_name: 工作表名称
+        df: 写入该工作表的DataFrame
+        index: 写入时是否包含索引
+        default_format: 浮点列的默认格式
+        percent_columns: 显示为百分比的列名
+        overrides: {列名: 格式}
+        min_width: 最小列宽
+        max_width: 最大列宽
+        padding: 额外缓冲宽度
+    """
+    frame = df.reset_index() if index else df
+    if frame.columns.nlevels > 1 or len(frame.columns) == 0:
+        return
+    number_formats = column_number_formats(frame, default_format, percent_columns, overrides)
+    widths = column_widths(frame, number_formats, min_width, max_width, padding)
+    ws = writer.sheets[sheet_name]
+
+    if writer.engine == 'xlsxwriter':
+        cell_formats = {}
+        for i, (width, number_format) in enumerate(zip(widths, number_formats)):
+            if number_format and number_format not in cell_formats:
+                cell_formats[number_format] = writer.book.add_format({'num_format': number_format})
+            ws.set_column(i, i, width, cell_formats.get(number_format) if number_format else None)
+        return
+
+    for i, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    formatted = [i for i, number_format in enumerate(number_formats) if number_format]
+    if not formatted or frame.empty:
+        return
+    first, last = formatted[0], formatted[-1]
+    row_formats = number_formats[first:last + 1]
+    for row in ws.iter_rows(min_row=2, max_row=len(frame) + 1, min_col=first + 1, max_col=last + 1):
+        for cell, number_format in zip(row, row_formats):
+            if number_format:
+                cell.number_format = number_format
+
+
+def write_tables(output_path, tables: dict, percent_columns: dict | None = None,
+                 overrides: dict | None = None, padding: int = 2):
+    """
+    把多个结果表写入同一个工作簿（每个表一个工作表，命名索引作为首列写出）
+
+    Args:
+        output_path: 输出文件路径或可写的二进制文件对象（如 BytesIO）
+        tables: {工作表名: DataFrame}
+        percent_columns: {工作表名: 显示为百分比的列名}
+        overrides: {工作表名: {列名: 格式}}
+        padding: 额外缓冲宽度
+    """
+    percent_columns = percent_columns or {}
+    overrides = overrides or {}
+    with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
+        for sheet_name, df in tables.items():
+            index = df.index.name is not None
+            df.to_excel(writer, sheet_name=sheet_name, index=index)
+            if not df.empty:
+                style_sheet(writer, sheet_name, df, index=index, padding=padding,
+                            percent_columns=percent_columns.get(sheet_name, ()),
+                            overrides=overrides.get(sheet_name))
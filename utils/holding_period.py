@@ -0,0 +1,184 @@
+"""持有期收益分布 - 任意一天买入、持有N天的收益率分布（持有N天盈利概率）"""
+from typing import BinaryIO
+import numpy as np
+import pandas as pd
+from .nav_series import NavSeries
+from .trading_calendar import annualize_return
+from .excel_style import excel_engine, style_sheet
+
+DEFAULT_HOLDING_DAYS = (30, 90, 180, 365, 730)
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class HoldingPeriodAnalyzer:
+    """
+    持有期收益分布分析器
+
+    以每个净值日期为买入日，持有N个自然日后在不晚于到期日的最后一个净值日卖出。
+    所有持有天数的卖出位置由一次 searchsorted 求出，构成 (持有期数 × 买入日数) 的收益率矩阵，
+    统计量按行向量化计算，不逐个买入日循环。
+    """
+
+    def __init__(self, file_path: str | BinaryIO | NavSeries, holding_days=DEFAULT_HOLDING_DAYS):
+        """
+        初始化分析器
+
+        Args:
+            file_path: Excel文件路径、二进制文件对象或已解析的 NavSeries
+            holding_days: 持有天数列表（自然日）
+        """
+        holding_days = sorted({int(days) for days in holding_days})
+        if not holding_days or holding_days[0] <= 0:
+            raise ValueError("持有天数必须为正整数")
+        self.holding_days: list = holding_days
+
+        series = NavSeries.load(file_path)
+        self.product_name, self.product_code = series.product_name, series.product_code
+        df = series.frame().dropna(subset=['单位净值'])
+        self.dates = pd.DatetimeIndex(df.index)
+        self.navs: np.ndarray = df['单位净值'].to_numpy(dtype=float)
+        self._returns: np.ndarray | None = None
+        self._exit_index: np.ndarray | None = None
+
+    def get_product_info(self) -> dict:
+        """获取产品信息"""
+        return {
+            'name': self.product_name,
+            'code': self.product_code,
+            'date_range': f"{self.dates[0].date()} 至 {self.dates[-1].date()}" if len(self.dates) else '-',
+            'data_count': len(self.navs),
+        }
+
+    def holding_returns(self) -> np.ndarray:
+        """
+        全部买入日 × 持有天数的持有期收益率矩阵
+
+        Returns:
+            np.ndarray: 形状 (持有期数, 买入日数)；到期日超出最新净值日期的为 NaN
+        """
+        if self._returns is not None:
+            return self._returns
+
+        days = np.asarray(self.holding_days, dtype='timedelta64[D]')
+        targets = self.dates.values[None, :] + days[:, None]
+        # 到期日当天或之前的最后一个净值日
+        exit_index = np.searchsorted(self.dates.values, targets.ravel(), side='right').reshape(targets.shape) - 1
+        entry_index = np.arange(len(self.navs))[None, :]
+        valid = (targets <= self.dates.values[-1]) & (exit_index > entry_index) if len(self.navs) else \
+            np.zeros(targets.shape, dtype=bool)
+
+        exit_index = np.where(valid, exit_index, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = self.navs[exit_index] / self.navs[None, :] - 1
+        self._returns = np.where(valid, returns, np.nan)
+        self._exit_index = np.where(valid, exit_index, -1)
+        return self._returns
+
+    def get_distribution(self, percentiles=DEFAULT_PERCENTILES) -> pd.DataFrame:
+        """
+        各持有天数的收益率分布统计
+
+        Args:
+            percentiles: 输出的分位数（0-100）
+
+        Returns:
+            pd.DataFrame: 以持有天数为索引，每行一个持有期
+        """
+        returns = self.holding_returns()
+        samples = np.isfinite(returns).sum(axis=1)
+        has_samples = samples > 0
+        rows = returns[has_samples]
+
+        stats = np.full((len(self.holding_days), 6 + len(percentiles)), np.nan)
+        if len(rows):
+            with np.errstate(invalid='ignore'):
+                stats[has_samples, 0] = (rows > 0).sum(axis=1) / samples[has_samples]
+            stats[has_samples, 1] = np.nanmean(rows, axis=1)
+            stats[has_samples, 2] = annualize_return(
+                stats[has_samples, 1], np.asarray(self.holding_days, dtype=float)[has_samples])
+            stats[has_samples, 3] = np.nanmin(rows, axis=1)
+            stats[has_samples, 4] = np.nanmax(rows, axis=1)
+            stats[has_samples, 5] = np.nanstd(rows, axis=1, ddof=1) if rows.shape[1] > 1 else np.nan
+            stats[has_samples, 6:] = np.nanpercentile(rows, percentiles, axis=1).T
+
+        columns = ['盈利概率', '平均收益率', '平均收益率年化', '最差收益率', '最好收益率', '收益率标准差'] + \
+            [f'{p:g}%分位数' for p in percentiles]
+        result = pd.DataFrame(stats, columns=columns, index=pd.Index(self.holding_days, name='持有天数'))
+        result.insert(0, '样本数', samples)
+        return result
+
+    def get_worst_cases(self) -> pd.DataFrame:
+        """各持有天数收益率最低的买入日和卖出日"""
+        returns = self.holding_returns()
+        records = []
+        for row, days in enumerate(self.holding_days):
+            if not np.isfinite(returns[row]).any():
+                continue
+            entry = int(np.nanargmin(returns[row]))
+            exit_ = int(self._exit_index[row, entry])  # type: ignore
+            records.append({
+                '持有天数': days,
+                '买入日期': self.dates[entry].strftime('%Y-%m-%d'),
+                '买入净值': self.navs[entry],
+                '卖出日期': self.dates[exit_].strftime('%Y-%m-%d'),
+                '卖出净值': self.navs[exit_],
+                '持有期收益率': returns[row, entry],
+            })
+        return pd.DataFrame(records)
+
+    def get_detail(self) -> pd.DataFrame:
+        """每个买入日在各持有天数下的收益率（宽表，未满持有期的为空）"""
+        returns = self.holding_returns()
+        detail = pd.DataFrame(returns.T, index=pd.Index(self.dates.strftime('%Y-%m-%d'), name='买入日期'),
+                              columns=[f'持有{days}天' for days in self.holding_days])
+        detail.insert(0, '买入净值', self.navs)
+        return detail
+
+    def print_summary(self, distribution: pd.DataFrame | None = None):
+        """打印分布摘要"""
+        if distribution is None:
+            distribution = self.get_distribution()
+        # 中位数单独计算，不依赖 distribution 中是否包含 50% 分位数
+        returns = self.holding_returns()
+        has_samples = np.isfinite(returns).any(axis=1)
+        medians = np.full(len(self.holding_days), np.nan)
+        if has_samples.any():
+            medians[has_samples] = np.nanmedian(returns[has_samples], axis=1)
+        medians = dict(zip(self.holding_days, medians))
+        print(f"\n{'持有天数':>8} {'样本数':>8} {'盈利概率':>10} {'平均收益':>10} {'中位数':>10} {'最差':>10}")
+        for days, row in distribution.iterrows():
+            if row['样本数'] == 0:
+                print(f"{days:>8} {0:>8} {'-':>10} {'-':>10} {'-':>10} {'-':>10}")
+                continue
+            median = medians[days]
+            print(f"{days:>8} {int(row['样本数']):>8} {row['盈利概率']:>10.2%} {row['平均收益率']:>10.2%} "
+                  f"{median:>10.2%} {row['最差收益率']:>10.2%}")
+
+    def save_to_excel(self, output_path: str | BinaryIO, include_detail: bool = False,
+                      percentiles=DEFAULT_PERCENTILES):
+        """
+        保存结果到Excel文件
+
+        Args:
+            output_path: 输出文件路径或二进制文件对象
+            include_detail: 是否同时输出每个买入日的收益率明细
+            percentiles: 输出的分位数（0-100）
+        """
+        distribution = self.get_distribution(percentiles)
+        percent_columns = [c for c in distribution.columns if c != '样本数']
+        sheets = {
+            '持有期收益分布': (distribution, percent_columns),
+            '最差情况': (self.get_worst_cases(), ['持有期收益率']),
+        }
+        if include_detail:
+            detail = self.get_detail()
+            sheets['买入日明细'] = (detail, [c for c in detail.columns if c != '买入净值'])
+
+        with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
+            for sheet_name, (df, percent) in sheets.items():
+                index = df.index.name is not None
+                df.to_excel(writer, sheet_name=sheet_name, index=index)
+                style_sheet(writer, sheet_name, df, index=index, percent_columns=percent)
+
+        if isinstance(output_path, str):
+            print(f"✓ 结果已保存到: {output_path}")
@@ -0,0 +1,167 @@
+"""区间指标索引 - 任意起止日期的收益、波动率、最高/最低净值和最大回撤的批量查询"""
+from typing import BinaryIO
+import numpy as np
+import pandas as pd
+from .nav_series import NavSeries
+from .trading_calendar import TradingCalendar, PERIODS_PER_YEAR, annualize_return
+
+
+class IntervalQueryIndex:
+    """
+    区间指标索引
+
+    预先计算（每个产品一次）：
+    - 对数收益率及其平方的前缀和：区间收益率、波动率 O(1)
+    - 稀疏表（每层块长 2^k 的最高/最低净值和块内最大回撤）：
+      最高/最低净值 O(1)；最大回撤把区间拆成 O(log n) 个不重叠的块从左到右合并
+
+    所有查询对整批区间向量化计算，一次调用可回答上千个区间。
+    """
+
+    def __init__(self, dates, navs, periods_per_year: int | None = None):
+        """
+        初始化索引
+
+        Args:
+            dates: 净值日期（升序）
+            navs: 单位净值（与日期一一对应）
+            periods_per_year: 波动率年化因子（默认按净值日期间隔推断：日度252，周度52）
+        """
+        self.dates = pd.DatetimeIndex(dates)
+        self.navs: np.ndarray = np.asarray(navs, dtype=float)
+        self.calendar = TradingCalendar(self.dates)
+        n = len(self.navs)
+
+        if periods_per_year is None:
+            gaps = np.diff(self.dates.values).astype('timedelta64[D]').astype(float)
+            periods_per_year = PERIODS_PER_YEAR['W'] if len(gaps) and np.median(gaps) >= 5 else PERIODS_PER_YEAR['D']
+        self.periods_per_year: int = periods_per_year
+
+        # 对数收益率前缀和：prefix[k] = sum(log_returns[:k])，区间 (i, j] 的和为 prefix[j] - prefix[i]
+        log_returns = np.diff(np.log(self.navs)) if n > 1 else np.zeros(0)
+        self._prefix = np.concatenate([[0.0], np.cumsum(log_returns)])
+        self._prefix_sq = np.concatenate([[0.0], np.cumsum(log_returns ** 2)])
+
+        # 稀疏表：第 k 层第 i 个元素覆盖 [i, i + 2^k)
+        self._max = [self.navs]
+        self._min = [self.navs]
+        self._mdd = [np.zeros(n)]
+        k = 1
+        while (1 << k) <= n:
+            half = 1 << (k - 1)
+            prev_max, prev_min, prev_mdd = self._max[-1], self._min[-1], self._mdd[-1]
+            left, right = slice(0, len(prev_max) - half), slice(half, len(prev_max))
+            self._max.append(np.maximum(prev_max[left], prev_max[right]))
+            self._min.append(np.minimum(prev_min[left], prev_min[right]))
+            # 左右两块合并：各自的最大回撤，或右块最低点相对左块最高点的回撤
+            self._mdd.append(np.minimum(np.minimum(prev_mdd[left], prev_mdd[right]),
+                                        prev_min[right] / prev_max[left] - 1))
+            k += 1
+
+    @classmethod
+    def from_file(cls, file_path: str | BinaryIO | NavSeries,
+                  periods_per_year: int | None = None) -> 'IntervalQueryIndex':
+        """
+        由标准格式的净值文件构建索引
+
+        Args:
+            file_path: Excel文件路径、二进制文件对象或已解析的 NavSeries
+            periods_per_year: 波动率年化因子（可选）
+
+        Returns:
+            IntervalQueryIndex: 区间指标索引（附带 product_name、product_code）
+        """
+        series = NavSeries.load(file_path)
+        product_name, product_code = series.product_name, series.product_code
+        df = series.frame().dropna(subset=['单位净值'])
+        index = cls(df.index, df['单位净值'], periods_per_year)
+        index.product_name, index.product_code = product_name, product_code
+        return index
+
+    def _range_extremes(self, start: np.ndarray, end: np.ndarray) -> tuple:
+        """区间 [start, end] 的最高/最低净值（两个重叠块，O(1)）"""
+        length = end - start + 1
+        level = np.floor(np.log2(np.maximum(length, 1))).astype(int)
+        highs = np.full(len(start), np.nan)
+        lows = np.full(len(start), np.nan)
+        for k in np.unique(level):
+            rows = level == k
+            right = end[rows] - (1 << k) + 1
+            highs[rows] = np.maximum(self._max[k][start[rows]], self._max[k][right])
+            lows[rows] = np.minimum(self._min[k][start[rows]], self._min[k][right])
+        return highs, lows
+
+    def _range_max_drawdown(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """区间 [start, end] 的最大回撤（拆成不重叠的 2^k 块，从左到右合并）"""
+        length = end - start + 1
+        position = start.copy()
+        running_max = np.full(len(start), -np.inf)
+        drawdown = np.zeros(len(start))
+        for k in range(len(self._max) - 1, -1, -1):
+            rows = (length >> k) & 1 == 1
+            if not rows.any():
+                continue
+            pos = position[rows]
+            block_max, block_min, block_mdd = self._max[k][pos], self._min[k][pos], self._mdd[k][pos]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                cross = np.where(np.isfinite(running_max[rows]), block_min / running_max[rows] - 1, 0.0)
+            drawdown[rows] = np.minimum(drawdown[rows], np.minimum(block_mdd, cross))
+            running_max[rows] = np.maximum(running_max[rows], block_max)
+            position[rows] = pos + (1 << k)
+        return drawdown
+
+    def query(self, start_dates, end_dates) -> pd.DataFrame:
+        """
+        批量查询区间指标
+
+        起始日期向后对齐到第一个交易日，结束日期向前对齐到最后一个交易日。
+        对齐后区间内不足两个净值的查询结果为 NaN。
+
+        Args:
+            start_dates: 起始日期列表
+            end_dates: 结束日期列表（与起始日期一一对应）
+
+        Returns:
+            pd.DataFrame: 每个区间一行
+        """
+        starts = pd.DatetimeIndex(pd.to_datetime(list(start_dates)))
+        ends = pd.DatetimeIndex(pd.to_datetime(list(end_dates)))
+        if len(starts) != len(ends):
+            raise ValueError("起始日期和结束日期的数量必须一致")
+
+        n = len(self.navs)
+        start_pos = self.calendar.next_index(starts) if len(starts) else np.zeros(0, dtype=int)
+        end_pos = self.calendar.prev_index(ends) if len(ends) else np.zeros(0, dtype=int)
+        valid = (start_pos < n) & (end_pos >= 0) & (end_pos > start_pos)
+        i = np.where(valid, start_pos, 0)
+        j = np.where(valid, end_pos, 0)
+
+        periods = (j - i).astype(float)
+        log_sum = self._prefix[j] - self._prefix[i]
+        log_sq = self._prefix_sq[j] - self._prefix_sq[i]
+        total_return = np.expm1(log_sum)
+        days = np.asarray((self.dates[j] - self.dates[i]).days, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (log_sq - log_sum ** 2 / periods) / (periods - 1)
+            volatility = np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(self.periods_per_year)
+        volatility = np.where(periods >= 2, volatility, np.nan)
+
+        highs, lows = self._range_extremes(i, j)
+        drawdown = self._range_max_drawdown(i, j)
+
+        def masked(values):
+            return np.where(valid, values, np.nan)
+
+        return pd.DataFrame({
+            '开始日期': starts.strftime('%Y-%m-%d'),
+            '结束日期': ends.strftime('%Y-%m-%d'),
+            '实际开始日期': np.where(valid, self.dates[i].strftime('%Y-%m-%d'), None),
+            '实际结束日期': np.where(valid, self.dates[j].strftime('%Y-%m-%d'), None),
+            '净值个数': np.where(valid, j - i + 1, 0),
+            '区间收益率': masked(total_return),
+            '区间年化收益率': masked(annualize_return(total_return, days)),
+            '年化波动率': masked(volatility),
+            '最高净值': masked(highs),
+            '最低净值': masked(lows),
+            '最大回撤': masked(drawdown),
+        })
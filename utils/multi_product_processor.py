@@ -3,16 +3,21 @@ import os
 import pandas as pd
 import glob
 from openpyxl import Workbook
-from openpyxl.utils import get_column_letter
 from datetime import datetime
-from .periodic_buy_calculator import PeriodicBuyCalculator
+from .periodic_buy_calculator import PeriodicBuyCalculator, PERIODIC_PERCENT_COLUMNS
+from .nav_loader import parse_nav_dates
 from .buy_rules import BuyRule
+from .run_manifest import RunManifest, file_sha256
+from .correlation import pairwise_cov_corr
+from .returns import resample_nav, check_frequency, FREQUENCY_NAMES
+from .excel_style import excel_engine, style_sheet
 
 
 class MultiProductExcelProcessor:
     """多产品Excel处理器"""
 
-    def __init__(self, products_pattern: str, start_date: str = None, buy_rule: BuyRule = None): # type: ignore
+    def __init__(self, products_pattern: str, start_date: str = None, buy_rule: BuyRule = None, # type: ignore
+                 manifest: RunManifest = None, force: bool = False): # type: ignore
         """
         初始化处理器
 
@@ -20,12 +25,21 @@ class MultiProductExcelProcessor:
             products_pattern: 产品文件的模式（如 "买入平均收益_净值列表/日度净值_产品*.xlsx"）
             start_date: 统一的买入起点日期，格式：YYYYMMDD（可选）
             buy_rule: 买入规则实例（可选，如果提供则进行收益计算）
+            manifest: 运行清单（可选，提供时跳过未变化的产品）
+            force: 是否忽略运行清单强制重新处理
         """
         self.products_pattern = products_pattern
         self.start_date = start_date
         self.buy_rule = buy_rule
+        self.manifest = manifest
+        self.force = force
         self.products_data = {}
         self.calculation_results = {}
+        self.file_hashes = {}
+        self.run_params = {}
+        self.returns_output_file = None
+        self.correlation_frequency = None
+        self.correlation_output = None
 
     def load_products(self):
         """
@@ -71,8 +85,8 @@ class MultiProductExcelProcessor:
         # 清理空行
         data_df = data_df.dropna(subset=['日期'])
 
-        # 转换日期格式
-        data_df['日期'] = pd.to_datetime(data_df['日期'])
+        # 转换日期格式（YYYYMMDD整数或Excel日期单元格）
+        data_df['日期'] = parse_nav_dates(data_df['日期'])
 
         # 按日期降序排列（保持原始顺序）
         data_df = data_df.sort_values('日期', ascending=False).reset_index(drop=True)
@@ -88,7 +102,11 @@ class MultiProductExcelProcessor:
         }
 
     def filter_by_start_date(self):
-        """根据起点日期过滤数据"""
+        """
+        根据起点日期过滤数据
+
+        过滤结果放入新的产品字典，原来的产品字典和数据不做修改（已交给其他计算或线程使用的数据不受影响）
+        """
         if not self.start_date:
             print("未指定起点日期，保留所有数据\n")
             return
@@ -97,19 +115,21 @@ class MultiProductExcelProcessor:
             start_dt = pd.to_datetime(self.start_date, format='%Y%m%d')
             print(f"正在过滤数据，起点日期: {start_dt.strftime('%Y-%m-%d')}")
 
+            filtered_products = {}
             for product_name, product_info in self.products_data.items():
                 data_df = product_info['data']
 
                 # 过滤数据（保留start_date及之后的数据）
-                filtered_df = data_df[data_df['日期'] >= start_dt].copy()
+                filtered_df = data_df[data_df['日期'] >= start_dt]
 
                 original_count = len(data_df)
                 filtered_count = len(filtered_df)
 
                 print(f"  - {product_name}: {original_count} -> {filtered_count} 条数据")
 
-                # 更新数据
-                product_info['data'] = filtered_df
+                filtered_products[product_name] = {**product_info, 'data': filtered_df}
+
+            self.products_data = filtered_products
 
             print()
         except Exception as e:
@@ -188,33 +208,25 @@ class MultiProductExcelProcessor:
             output_file = os.path.join(output_dir, f"买入收益_{self.buy_rule.get_rule_name()}.xlsx")
 
         # 创建Excel工作簿
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        with pd.ExcelWriter(output_file, engine=excel_engine()) as writer:
             for product_name, product_info in self.products_data.items():
                 try:
-                    # 创建临时Excel文件用于计算
-                    temp_file = f"_temp_{product_name}.xlsx"
-                    self._save_product_temp_file(product_name, product_info, temp_file)
-
-                    # 使用PeriodicBuyCalculator计算
-                    calculator = PeriodicBuyCalculator(temp_file, self.buy_rule)
-                    results_df = calculator.calculate_buy_returns()
+                    cached_df = self._get_cached_results(product_info['file_path'])
+                    if cached_df is not None:
+                        # 文件和参数都未变化，复用运行清单中的结果
+                        calculator = None
+                        results_df = cached_df
+                    else:
+                        # 已加载的数据按标准格式组成内存中的sheet交给PeriodicBuyCalculator，不再写临时文件
+                        calculator = PeriodicBuyCalculator(self._product_sheet(product_info), self.buy_rule)
+                        results_df = calculator.calculate_buy_returns()
 
                     if not results_df.empty:
-                        # 格式化百分比列
-                        results_df_output = results_df.copy()
-                        results_df_output['每日涨跌幅'] = results_df_output['每日涨跌幅'].apply(lambda x: f"{x:.2%}")
-                        results_df_output['区间收益率'] = results_df_output['区间收益率'].apply(lambda x: f"{x:.2%}")
-                        results_df_output['区间年化收益率'] = results_df_output['区间年化收益率'].apply(lambda x: f"{x:.2%}")
-
-                        # 保存到sheet（产品简称作为sheet名）
+                        # 保存到sheet（产品简称作为sheet名），收益率列按列设置百分比格式
                         sheet_name = product_name[:31] if len(product_name) > 31 else product_name
-                        results_df_output.to_excel(writer, sheet_name=sheet_name, index=False)
-
-                        # 调整列宽
-                        ws = writer.sheets[sheet_name]
-                        for i, col in enumerate(results_df_output.columns, 1):
-                            max_len = max(len(str(col)), 15)
-                            ws.column_dimensions[get_column_letter(i)].width = max_len + 2
+                        results_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                        style_sheet(writer, sheet_name, results_df, min_width=15,
+                                    percent_columns=PERIODIC_PERCENT_COLUMNS)
 
                         print(f"  ✓ {product_name}: {len(results_df)} 个买入日期")
 
@@ -223,52 +235,108 @@ class MultiProductExcelProcessor:
                             'calculator': calculator,
                             'results': results_df
                         }
+
+                        # 逐个产品写入运行清单，中途失败时已完成的产品下次可直接复用
+                        if calculator is not None and self.manifest is not None and self.run_params:
+                            file_path = product_info['file_path']
+                            self.manifest.mark_completed(
+                                file_path, self.file_hashes.get(file_path) or file_sha256(file_path),
+                                self.run_params, output_path=None, payload=results_df.to_dict('records')
+                            )
                     else:
                         print(f"  ⚠️  {product_name}: 无符合条件的买入日期")
 
-                    # 删除临时文件
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-
                 except Exception as e:
                     print(f"  ❌ {product_name}: 计算失败 - {str(e)}")
 
+        self.returns_output_file = output_file
         print(f"\n✅ 收益计算结果保存: {output_file}")
 
-    def _save_product_temp_file(self, product_name: str, product_info: dict, temp_file: str):
+    def build_return_matrix(self, frequency: str = 'W') -> pd.DataFrame:
         """
-        保存单个产品的临时Excel文件供计算使用
+        构建所有产品对齐后的收益率矩阵
 
         Args:
-            product_name: 产品名称
-            product_info: 产品数据字典
-            temp_file: 临时文件路径
+            frequency: 收益率频率（'D' 日度, 'W' 周度, 'M' 月度）
+
+        Returns:
+            pd.DataFrame: 行为周期末日期、列为产品的收益率矩阵（产品未成立的期间为NaN）
         """
-        wb = Workbook()
-        ws = wb.active
+        check_frequency(frequency)
+        navs = {
+            product_name: resample_nav(product_info['data'].set_index('日期')['单位净值'], frequency)
+            for product_name, product_info in self.products_data.items()
+        }
+        nav_matrix = pd.concat(navs, axis=1).sort_index()
+        return nav_matrix.pct_change(fill_method=None).iloc[1:]
 
-        # 写入产品信息
-        ws['A1'] = product_info['product_name'] # type: ignore
-        ws['B1'] = product_info['product_code'] # type: ignore
+    def calculate_correlation_matrix(self, frequency: str = 'W', output_file: str = None, # type: ignore
+                                     min_periods: int = 12) -> dict:
+        """
+        计算所有产品收益率的相关系数/协方差矩阵并保存
 
-        # 写入列标题
-        ws['A2'] = '日期' # type: ignore
-        ws['B2'] = '单位净值' # type: ignore
-        ws['C2'] = '累计净值' # type: ignore
+        Args:
+            frequency: 收益率频率（'D' 日度, 'W' 周度, 'M' 月度）
+            output_file: 输出文件路径（.xlsx 或 .parquet，默认：相关性矩阵.xlsx）
+            min_periods: 计算一对产品所需的最少共同期数
 
-        # 获取数据并按日期升序排列
-        data_df = product_info['data'].sort_values('日期', ascending=True)
+        Returns:
+            dict: {'相关系数': DataFrame, '协方差': DataFrame, '共同期数': DataFrame}
+        """
+        print("=" * 70)
+        print("计算相关性矩阵")
+        print("=" * 70)
+
+        if not output_file:
+            output_file = os.path.join(os.path.dirname(self.products_pattern), "相关性矩阵.xlsx")
+
+        returns = self.build_return_matrix(frequency)
+        cov, corr, counts = pairwise_cov_corr(returns, min_periods=min_periods)
+        matrices = {'相关系数': corr, '协方差': cov, '共同期数': counts}
+        print(f"  ✓ {returns.shape[1]} 个产品，{returns.shape[0]} 期{FREQUENCY_NAMES[frequency]}度收益率")
 
-        # 写入数据
-        for idx, row in enumerate(data_df.itertuples(index=False), start=3):
-            date_int = int(row.日期.strftime('%Y%m%d'))
-            ws[f'A{idx}'] = date_int # type: ignore
-            ws[f'B{idx}'] = row.单位净值 # type: ignore
-            ws[f'C{idx}'] = row.累计净值 # type: ignore
+        if output_file.lower().endswith('.parquet'):
+            base = os.path.splitext(output_file)[0]
+            try:
+                for name, matrix in matrices.items():
+                    matrix.to_parquet(f"{base}_{name}.parquet")
+            except ImportError as e:
+                print(f"  ❌ 保存Parquet需要安装 pyarrow: {e}")
+                return matrices
+            print(f"\n✅ 相关性矩阵保存: {base}_*.parquet\n")
+        else:
+            with pd.ExcelWriter(output_file, engine=excel_engine()) as writer:
+                for name, matrix in matrices.items():
+                    matrix.to_excel(writer, sheet_name=name)
+                    style_sheet(writer, name, matrix, index=True, min_width=12,
+                                default_format='0.0000' if name == '相关系数' else '0.000000')
+            print(f"\n✅ 相关性矩阵保存: {output_file}\n")
+
+        self.correlation_output = output_file
+        return matrices
+
+    def _product_sheet(self, product_info: dict) -> pd.DataFrame:
+        """
+        把单个产品的数据组成标准格式的原始sheet（与 read_nav_sheets 读入的结构相同）
 
-        wb.save(temp_file)
+        Args:
+            product_info: 产品数据字典
 
-    def process(self, output_file: str = None, calculate_returns: bool = False, returns_output_file: str = None): # type: ignore
+        Returns:
+            pd.DataFrame: A1产品名称、B1产品代码、第2行列标题、第3行起按日期升序的数据
+        """
+        data_df = product_info['data'].sort_values('日期', ascending=True)
+        header = pd.DataFrame([[product_info['product_name'], product_info['product_code'], None],
+                               ['日期', '单位净值', '累计净值']])
+        body = pd.DataFrame({
+            0: data_df['日期'].dt.strftime('%Y%m%d').astype(int).to_numpy(),
+            1: data_df['单位净值'].to_numpy(),
+            2: data_df['累计净值'].to_numpy(),
+        })
+        return pd.concat([header, body], ignore_index=True)
+
+    def process(self, output_file: str = None, calculate_returns: bool = False, returns_output_file: str = None, # type: ignore
+                correlation_frequency: str = None, correlation_output: str = None): # type: ignore
         """
         执行完整的处理流程
 
@@ -276,7 +344,21 @@ class MultiProductExcelProcessor:
             output_file: 输出文件路径（可选）
             calculate_returns: 是否计算周期性买入收益
             returns_output_file: 收益计算结果文件路径（可选）
+            correlation_frequency: 相关性矩阵的收益率频率（'D'/'W'/'M'，不指定则不计算）
+            correlation_output: 相关性矩阵输出文件路径（可选，.xlsx 或 .parquet）
         """
+        self.correlation_frequency = correlation_frequency
+        if correlation_frequency and not correlation_output:
+            correlation_output = os.path.join(os.path.dirname(self.products_pattern), "相关性矩阵.xlsx")
+        self.correlation_output = correlation_output
+
+        # 0. 运行清单：所有产品文件和参数均未变化时直接跳过
+        if self._check_manifest(output_file, calculate_returns, returns_output_file):
+            print("=" * 70)
+            print("所有产品文件和参数均未变化，跳过处理（使用 --force 强制重新处理）")
+            print("=" * 70)
+            return
+
         # 1. 加载数据
         print("=" * 70)
         print("加载产品数据")
@@ -305,6 +387,131 @@ class MultiProductExcelProcessor:
         if calculate_returns and self.buy_rule:
             self.calculate_periodic_returns(returns_output_file)
 
+        # 6. 计算相关性矩阵（如果指定了频率）
+        if correlation_frequency:
+            self.calculate_correlation_matrix(correlation_frequency, correlation_output)
+
+        # 7. 更新运行清单
+        self._update_manifest(output_file, calculate_returns)
+
         print("=" * 70)
         print("处理完成！")
         print("=" * 70)
+
+    def _default_output_file(self) -> str:
+        """默认的合并文件路径"""
+        return os.path.join(os.path.dirname(self.products_pattern), "日度净值_合并.xlsx")
+
+    def _default_returns_file(self) -> str:
+        """默认的收益计算结果文件路径"""
+        return os.path.join(os.path.dirname(self.products_pattern),
+                            f"买入收益_{self.buy_rule.get_rule_name()}.xlsx")
+
+    def _check_manifest(self, output_file: str, calculate_returns: bool, returns_output_file: str) -> bool:
+        """
+        计算所有输入文件的哈希，并判断本次运行是否可以整体跳过
+
+        Args:
+            output_file: 合并文件路径
+            calculate_returns: 是否计算周期性买入收益
+            returns_output_file: 收益计算结果文件路径
+
+        Returns:
+            bool: 所有产品文件已按相同参数处理完成且输出文件仍存在时返回True
+        """
+        if self.manifest is None:
+            return False
+
+        output_file = output_file or self._default_output_file()
+        with_returns = bool(calculate_returns and self.buy_rule)
+        if with_returns and not returns_output_file:
+            returns_output_file = self._default_returns_file()
+
+        self.run_params = {
+            'start_date': self.start_date,
+            'buy_rule': self.buy_rule.get_rule_name() if with_returns else None,
+            'output_file': os.path.abspath(output_file),
+            'returns_output_file': os.path.abspath(returns_output_file) if with_returns else None,
+            'correlation_frequency': self.correlation_frequency,
+            'correlation_output': os.path.abspath(self.correlation_output) if self.correlation_frequency else None,
+        }
+        self.file_hashes = {path: file_sha256(path) for path in sorted(glob.glob(self.products_pattern))}
+
+        if self.force or not self.file_hashes:
+            return False
+        if not os.path.exists(output_file):
+            return False
+        if with_returns and not os.path.exists(returns_output_file):
+            return False
+        if self.correlation_frequency and not self.correlation_output.lower().endswith('.parquet') \
+                and not os.path.exists(self.correlation_output):
+            return False
+
+        # 上次运行包含的产品集合必须与本次一致（删除产品后需要重新生成合并文件）
+        completed = {
+            key for key, entry in self.manifest.entries.items()
+            if entry.get('params') == self.run_params
+            and entry.get('status') == RunManifest.STATUS_COMPLETED
+            and entry.get('output_path')
+        }
+        current = {RunManifest.entry_key(path) for path in self.file_hashes}
+        if completed != current:
+            return False
+
+        return all(
+            self.manifest.is_completed(path, file_hash, self.run_params)
+            for path, file_hash in self.file_hashes.items()
+        )
+
+    def _get_cached_results(self, file_path: str) -> pd.DataFrame | None:
+        """
+        从运行清单中取出未变化产品的买入收益结果
+
+        Args:
+            file_path: 产品文件路径
+
+        Returns:
+            DataFrame: 缓存的买入收益明细；不可复用时返回None
+        """
+        if self.manifest is None or self.force or not self.run_params.get('buy_rule'):
+            return None
+        file_hash = self.file_hashes.get(file_path)
+        if file_hash is None or not self.manifest.is_completed(file_path, file_hash, self.run_params):
+            return None
+        payload = self.manifest.get_entry(file_path).get('payload')  # type: ignore
+        if payload is None:
+            return None
+        return pd.DataFrame(payload)
+
+    def _update_manifest(self, output_file: str, calculate_returns: bool):
+        """
+        将本次处理成功的产品写入运行清单
+
+        Args:
+            output_file: 合并文件路径
+            calculate_returns: 是否计算了周期性买入收益
+        """
+        if self.manifest is None or not self.run_params:
+            return
+
+        with_returns = bool(calculate_returns and self.buy_rule)
+        output_path = self.returns_output_file if with_returns else (output_file or self._default_output_file())
+
+        # 上次运行中已不存在的产品文件从清单中移除
+        current = {RunManifest.entry_key(path) for path in self.file_hashes}
+        for key in [k for k, e in self.manifest.entries.items() if e.get('params') == self.run_params]:
+            if key not in current:
+                del self.manifest.entries[key]
+
+        for product_name, product_info in self.products_data.items():
+            file_path = product_info['file_path']
+            file_hash = self.file_hashes.get(file_path) or file_sha256(file_path)
+            payload = None
+            if with_returns:
+                result = self.calculation_results.get(product_name)
+                if result is None:
+                    continue
+                payload = result['results'].to_dict('records')
+            self.manifest.mark_completed(file_path, file_hash, self.run_params,
+                                         output_path=output_path, payload=payload, save=False)
+        self.manifest.save()
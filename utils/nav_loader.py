@@ -0,0 +1,218 @@
+"""净值文件读取 - 各计算器共用的标准格式解析"""
+from typing import BinaryIO
+import pandas as pd
+
+
+def parse_nav_dates(dates: pd.Series) -> pd.Series:
+    """
+    解析日期列
+
+    标准格式为YYYYMMDD整数；合并工具等生成的文件可能是Excel日期单元格，两种都支持。
+
+    Args:
+        dates: 原始日期列
+
+    Returns:
+        pd.Series: datetime64类型的日期列
+    """
+    try:
+        return pd.to_datetime(dates, format='%Y%m%d')
+    except (ValueError, TypeError):
+        return pd.to_datetime(dates)
+
+
+def parse_nav_sheet(raw_df: pd.DataFrame) -> tuple:
+    """
+    解析一个标准格式的净值sheet
+
+    Excel格式：
+    - A1: 产品名称
+    - B1: 产品代码
+    - A2-C2: 列标题（日期、单位净值、累计净值）
+    - A3起: 数据
+
+    Args:
+        raw_df: 不带header读取的原始数据
+
+    Returns:
+        tuple: (产品名称, 产品代码, 按日期升序排列、以日期为索引的DataFrame)
+    """
+    product_name = str(raw_df.iloc[0, 0]).strip()  # A1
+    product_code = str(raw_df.iloc[0, 1]).strip()  # B1
+
+    data_df = raw_df.iloc[2:, :3].copy()
+    data_df.columns = ['日期', '单位净值', '累计净值']
+
+    # 清理空行
+    data_df = data_df.dropna(subset=['日期'])
+
+    data_df['日期'] = parse_nav_dates(data_df['日期'])
+    data_df['单位净值'] = pd.to_numeric(data_df['单位净值'])
+    data_df['累计净值'] = pd.to_numeric(data_df['累计净值'], errors='coerce')
+
+    data_df = data_df.sort_values('日期')
+    data_df.set_index('日期', inplace=True)
+    return product_name, product_code, data_df
+
+
+def load_nav_file(file_path: str | BinaryIO) -> tuple:
+    """
+    读取标准格式的净值文件
+
+    Args:
+        file_path: Excel文件路径或二进制文件对象（如上传文件的 BytesIO）
+
+    Returns:
+        tuple: (产品名称, 产品代码, 按日期升序排列、以日期为索引的DataFrame)
+    """
+    raw_df = pd.read_excel(file_path, header=None)
+    return parse_nav_sheet(raw_df)
+
+
+def read_nav_raw(source) -> pd.DataFrame:
+    """
+    取得不带header的原始净值sheet
+
+    Args:
+        source: Excel文件路径、二进制文件对象，或已读入的原始sheet（DataFrame，原样返回）
+
+    Returns:
+        pd.DataFrame: 原始数据
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    return pd.read_excel(source, header=None)
+
+
+def read_nav_sheets(file_path: str | BinaryIO) -> dict:
+    """
+    一次打开工作簿，读取全部标准格式的净值sheet
+
+    合并工具生成的工作簿每个产品一个sheet，各计算器可以直接使用这里返回的原始sheet，
+    不必按产品重复打开文件。不足3行（没有数据）的sheet会被跳过。
+
+    Args:
+        file_path: Excel文件路径或二进制文件对象
+
+    Returns:
+        dict: {sheet名: 不带header的原始数据}，保持工作簿中的顺序
+    """
+    sheets = pd.read_excel(file_path, sheet_name=None, header=None)
+    return {name: raw_df for name, raw_df in sheets.items()
+            if raw_df.shape[0] >= 3 and raw_df.shape[1] >= 3}
+
+
+def load_nav_workbook(file_path: str | BinaryIO) -> list:
+    """
+    读取多产品工作簿（每个sheet一个产品）
+
+    Args:
+        file_path: Excel文件路径或二进制文件对象
+
+    Returns:
+        list: [(sheet名, 产品名称, 产品代码, 以日期为索引的DataFrame), ...]
+    """
+    return [(sheet_name, *parse_nav_sheet(raw_df))
+            for sheet_name, raw_df in read_nav_sheets(file_path).items()]
+
+
+def _cell_date(value) -> pd.Timestamp:
+    """单元格中的日期（YYYYMMDD整数/字符串或Excel日期）"""
+    if isinstance(value, (int, float)):
+        return pd.to_datetime(str(int(value)), format='%Y%m%d')
+    text = str(value).strip()
+    if text.isdigit():
+        return pd.to_datetime(text, format='%Y%m%d')
+    return pd.Timestamp(text)
+
+
+def read_nav_head(file_path: str | BinaryIO, max_rows: int | None = None,
+                  stop_date=None) -> tuple:
+    """
+    只读取倒序（最新在前）净值文件顶部的若干行
+
+    用 openpyxl 只读模式逐行读取第一个sheet，读够 max_rows 行或遇到不晚于 stop_date 的日期即停止，
+    不解析其余历史数据。日常增量更新时 stop_date 取已保存的最新日期，读取量只与新增行数有关
+    （stop_date 当天的净值视为已保存，不再读取）。
+    文件为升序排列或不是 xlsx 格式（openpyxl 无法只读打开）时退回完整读取后截取，结果相同。
+
+    Args:
+        file_path: Excel文件路径或二进制文件对象
+        max_rows: 最多读取的数据行数（可选）
+        stop_date: 读到该日期（含）即停止（可选）
+
+    Returns:
+        tuple: (产品名称, 产品代码, 按日期升序排列、以日期为索引的DataFrame)
+    """
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+    stop = pd.Timestamp(stop_date) if stop_date is not None else None
+
+    try:
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+    except (InvalidFileException, KeyError, OSError):
+        workbook = None
+
+    rows, data, previous = [], [], None
+    ascending = False
+    if workbook is not None:
+        try:
+            for row in workbook.worksheets[0].iter_rows(max_col=3, values_only=True):
+                if len(rows) < 2:
+                    rows.append(row)  # A1产品名称/B1产品代码、A2-C2列标题
+                    continue
+                if row[0] is None or str(row[0]).strip() == '':
+                    continue
+                date = _cell_date(row[0])
+                if previous is not None and date > previous:
+                    ascending = True
+                    break
+                previous = date
+                data.append((date, row))
+                # 读到第二行才能确定是倒序文件，之前不能按 stop_date / max_rows 提前停止
+                if len(data) < 2:
+                    continue
+                if stop is not None and date <= stop:
+                    break
+                if max_rows is not None and len(data) > max_rows:
+                    break
+        finally:
+            workbook.close()
+
+    if workbook is None or ascending:
+        if hasattr(file_path, 'seek'):
+            file_path.seek(0)  # type: ignore
+        product_name, product_code, data_df = load_nav_file(file_path)
+        if stop is not None:
+            data_df = data_df[data_df.index > stop]
+        if max_rows is not None:
+            data_df = data_df.iloc[len(data_df) - min(max_rows, len(data_df)):]
+        return product_name, product_code, data_df
+
+    while len(rows) < 2:
+        rows.append((None, None, None))
+    kept = [row for date, row in data if stop is None or date > stop]
+    rows.extend(kept[:max_rows] if max_rows is not None else kept)
+    raw_df = pd.DataFrame([tuple(row) + (None,) * (3 - len(row)) for row in rows])
+    return parse_nav_sheet(raw_df)
+
+
+def read_latest_nav(file_path: str | BinaryIO) -> dict:
+    """
+    读取净值文件的产品信息和最新一条净值（倒序文件只读取前3行）
+
+    Args:
+        file_path: Excel文件路径或二进制文件对象
+
+    Returns:
+        dict: {'name', 'code', 'date', 'unit_nav', 'cum_nav'}；没有数据时日期和净值为None
+    """
+    product_name, product_code, data_df = read_nav_head(file_path, max_rows=1)
+    latest = data_df.iloc[-1] if len(data_df) else None
+    return {
+        'name': product_name,
+        'code': product_code,
+        'date': data_df.index[-1] if latest is not None else None,
+        'unit_nav': float(latest['单位净值']) if latest is not None else None,
+        'cum_nav': float(latest['累计净值']) if latest is not None and pd.notna(latest['累计净值']) else None,
+    }
@@ -0,0 +1,107 @@
+"""不可变净值序列 - 解析一次后可在多个线程、多个计算器之间共享"""
+from dataclasses import dataclass
+from typing import BinaryIO
+import numpy as np
+import pandas as pd
+from .nav_loader import read_nav_raw, parse_nav_sheet
+
+
+def _readonly(values) -> np.ndarray:
+    """转为只读的 float 数组"""
+    array = np.array(values, dtype=float)
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True, eq=False)
+class NavSeries:
+    """
+    不可变净值序列
+
+    日期按升序保存，净值数组设为只读，实例创建后不能修改。计算器从同一个实例取数据时
+    只生成新的 DataFrame 外壳（共享底层数组），不复制数据、不需要加锁；
+    计算器内部的新增列、排序等操作都作用在自己的外壳上，不会影响其他使用者。
+    """
+
+    product_name: str
+    product_code: str
+    dates: pd.DatetimeIndex
+    unit_nav: np.ndarray
+    cum_nav: np.ndarray
+
+    @classmethod
+    def from_frame(cls, product_name: str, product_code: str, data_df: pd.DataFrame) -> 'NavSeries':
+        """
+        由以日期为索引的净值DataFrame创建（顺序不限）
+
+        Args:
+            product_name: 产品名称
+            product_code: 产品代码
+            data_df: 列包含 单位净值、累计净值
+
+        Returns:
+            NavSeries: 按日期升序的不可变序列
+        """
+        data_df = data_df.sort_index(kind='stable')
+        cum_nav = data_df['累计净值'] if '累计净值' in data_df.columns else np.full(len(data_df), np.nan)
+        return cls(
+            product_name=product_name,
+            product_code=product_code,
+            dates=pd.DatetimeIndex(data_df.index, name='日期'),
+            unit_nav=_readonly(pd.to_numeric(data_df['单位净值'], errors='coerce')),
+            cum_nav=_readonly(pd.to_numeric(pd.Series(cum_nav), errors='coerce')),
+        )
+
+    @classmethod
+    def from_file(cls, file_path: str | BinaryIO | pd.DataFrame) -> 'NavSeries':
+        """
+        读取标准格式的净值文件
+
+        Args:
+            file_path: Excel文件路径、二进制文件对象，或 read_nav_sheets 读入的原始sheet
+
+        Returns:
+            NavSeries: 按日期升序的不可变序列
+        """
+        product_name, product_code, data_df = parse_nav_sheet(read_nav_raw(file_path))
+        return cls.from_frame(product_name, product_code, data_df)
+
+    @classmethod
+    def load(cls, source) -> 'NavSeries':
+        """
+        取得净值序列：已是 NavSeries 时直接返回（共享，不复制），否则按 from_file 读取
+
+        Args:
+            source: NavSeries、Excel文件路径、二进制文件对象或原始sheet
+
+        Returns:
+            NavSeries: 不可变序列
+        """
+        return source if isinstance(source, cls) else cls.from_file(source)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def latest_date(self) -> pd.Timestamp | None:
+        """最新净值日期"""
+        return self.dates[-1] if len(self.dates) else None
+
+    @property
+    def latest_nav(self) -> float | None:
+        """最新单位净值"""
+        return float(self.unit_nav[-1]) if len(self.unit_nav) else None
+
+    def frame(self, ascending: bool = True) -> pd.DataFrame:
+        """
+        以日期为索引的净值DataFrame（每次返回新的外壳，与序列共享只读数组）
+
+        Args:
+            ascending: True 为升序；False 为系统导出的倒序（最新在前）
+
+        Returns:
+            pd.DataFrame: 列为 单位净值、累计净值
+        """
+        step = 1 if ascending else -1
+        return pd.DataFrame({'单位净值': self.unit_nav[::step], '累计净值': self.cum_nav[::step]},
+                            index=self.dates[::step], copy=False)
@@ -0,0 +1,216 @@
+"""净值目录监控 - 常驻内存，轮询目录只重新计算变化的净值文件"""
+import os
+import glob
+import time
+from .tools import run_single_file, generate_summary_file
+from .run_manifest import RunManifest, file_sha256
+
+EXCEL_PATTERNS = ('*.xlsx', '*.xls', '*.xlsm')
+
+
+class NavDirectoryWatcher:
+    """
+    净值目录监控器
+
+    每个文件的 (修改时间, 大小, 内容哈希)、计算器和业绩指标常驻内存。
+    每次轮询只对修改时间或大小变化的文件计算哈希，哈希也变化时才重新计算，
+    有变化时用内存中的全部指标重新生成业绩汇总。
+    多产品工作簿（每个sheet一个产品）与 calculate.py 相同：逐个sheet计算，
+    运行清单按 "文件路径::sheet名" 分别记录。
+    """
+
+    def __init__(self, directory: str, output_dir: str | None = None, summary_path: str | None = None,
+                 risk_free_rate: float = 0.02, return_frequency: str = 'W',
+                 manifest: RunManifest | None = None, params: dict | None = None, store=None):
+        """
+        初始化监控器
+
+        Args:
+            directory: 净值文件目录
+            output_dir: 单个产品结果的输出目录（可选）
+            summary_path: 业绩汇总文件路径（可选，不指定则不生成汇总）
+            risk_free_rate: 无风险利率
+            return_frequency: 波动率、夏普、风险指标使用的收益率频率（'D'/'W'/'M'）
+            manifest: 运行清单（可选），首次扫描时复用未变化文件的结果，重新计算后更新
+            params: 写入运行清单的计算参数
+            store: 结果库（可选），重新计算的产品同时写入
+        """
+        self.directory: str = directory
+        self.output_dir: str | None = output_dir
+        self.summary_path: str | None = summary_path
+        self.risk_free_rate: float = risk_free_rate
+        self.return_frequency: str = return_frequency
+        self.manifest: RunManifest | None = manifest
+        self.params: dict = params or {}
+        self.store = store
+        # 文件路径 -> {'mtime', 'size', 'hash', 'calculators', 'metrics'}（每个产品sheet一个计算器和指标）
+        self.entries: dict = {}
+
+    def _is_output(self, file_path: str) -> bool:
+        """是否为本监控器自己生成的结果文件（输出目录与监控目录相同时避免被当作输入）"""
+        path = os.path.normcase(os.path.abspath(file_path))
+        if self.summary_path and path == os.path.normcase(os.path.abspath(self.summary_path)):
+            return True
+        return bool(self.output_dir) and file_path.endswith('_结果.xlsx') and \
+            os.path.dirname(path) == os.path.normcase(os.path.abspath(self.output_dir))  # type: ignore
+
+    def list_files(self) -> list:
+        """目录中的净值文件（忽略Excel打开时产生的 ~$ 锁文件和结果文件）"""
+        files = []
+        for pattern in EXCEL_PATTERNS:
+            files.extend(glob.glob(os.path.join(self.directory, pattern)))
+        return sorted(f for f in files if not os.path.basename(f).startswith('~$') and not self._is_output(f))
+
+    def _output_path(self, name: str) -> str | None:
+        """单个产品结果文件路径"""
+        if not self.output_dir:
+            return None
+        return os.path.join(self.output_dir, f"{name}_结果.xlsx")
+
+    def _from_manifest(self, file_path: str, file_hash: str):
+        """运行清单中未变化文件各产品的业绩指标列表（没有或不完整时返回None）"""
+        if self.manifest is None or not self.manifest.is_completed(file_path, file_hash, self.params):
+            return None
+        if self.store is not None and not self.store.has_file(file_hash):
+            return None
+        import pandas as pd
+        payload = self.manifest.get_entry(file_path)['payload']  # type: ignore
+        if not isinstance(payload, dict):
+            return [pd.DataFrame(payload)]
+        # 多产品工作簿：文件级记录保存全部sheet名，各sheet均已完成时才复用
+        entry_paths = [f"{file_path}::{name}" for name in payload.get('sheets', [])]
+        if not entry_paths or not all(self.manifest.is_completed(path, file_hash, self.params)
+                                      for path in entry_paths):
+            return None
+        return [pd.DataFrame(self.manifest.get_entry(path)['payload']) for path in entry_paths]  # type: ignore
+
+    def _compute(self, file_path: str, file_hash: str) -> dict:
+        """计算单个文件（多产品工作簿逐个sheet计算）并更新运行清单"""
+        from .nav_loader import read_nav_sheets
+
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        try:
+            sheets = read_nav_sheets(file_path)
+        except Exception as e:
+            if self.manifest is not None:
+                self.manifest.mark_failed(file_path, file_hash, self.params, str(e))
+            raise
+        if not sheets:
+            raise ValueError("文件中没有符合格式的净值sheet")
+
+        # 单sheet文件按文件记录；多产品工作簿按 "文件路径::sheet名" 记录，输出 <文件名>_<sheet名>_结果.xlsx
+        multi = len(sheets) > 1
+        calculators, all_metrics = [], []
+        for sheet_name, raw_df in sheets.items():
+            name = f"{base_name}_{sheet_name}" if multi else base_name
+            entry_path = f"{file_path}::{sheet_name}" if multi else file_path
+            try:
+                calculator = run_single_file(raw_df, self.output_dir, self.risk_free_rate, self.return_frequency,
+                                             name=name)
+            except Exception as e:
+                if self.manifest is not None:
+                    self.manifest.mark_failed(entry_path, file_hash, self.params, str(e))
+                raise
+            metrics = calculator.build_metrics_df()
+            if self.store is not None:
+                self.store.save_calculator(calculator, source_file=file_path, file_hash=file_hash)
+            if self.manifest is not None:
+                self.manifest.mark_completed(entry_path, file_hash, self.params,
+                                             output_path=self._output_path(name),
+                                             payload=metrics.to_dict('records'), save=False)
+            calculators.append(calculator)
+            all_metrics.append(metrics)
+
+        if multi and self.manifest is not None:
+            self.manifest.mark_completed(file_path, file_hash, self.params,
+                                         payload={'sheets': list(sheets)}, save=False)
+        return {'calculators': calculators, 'metrics': all_metrics}
+
+    def poll(self) -> dict:
+        """
+        扫描一次目录，只重新计算新增或内容变化的文件
+
+        Returns:
+            dict: {'updated': 重新计算的文件, 'removed': 已删除的文件, 'failed': 计算失败的文件}
+        """
+        updated, failed = [], []
+        current = self.list_files()
+
+        for file_path in current:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entry = self.entries.get(file_path)
+            if entry and entry['mtime'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                continue
+
+            try:
+                file_hash = file_sha256(file_path)
+            except OSError:
+                continue
+            if entry and entry['hash'] == file_hash:
+                # 只是修改时间变化（如被重新保存），内容未变，无需重新计算
+                entry['mtime'], entry['size'] = stat.st_mtime_ns, stat.st_size
+                continue
+
+            try:
+                metrics = None if entry else self._from_manifest(file_path, file_hash)
+                if metrics is not None:
+                    result = {'calculators': [], 'metrics': metrics}
+                else:
+                    result = self._compute(file_path, file_hash)
+                    updated.append(file_path)
+            except Exception as e:
+                # 文件可能仍在写入中：保留上一次的结果，下次轮询时重试
+                print(f"  ⚠️  处理失败 {os.path.basename(file_path)}: {e}")
+                failed.append(file_path)
+                continue
+
+            self.entries[file_path] = {
+                'mtime': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'hash': file_hash,
+                **result,
+            }
+
+        current_set = set(current)
+        removed = [f for f in self.entries if f not in current_set]
+        for file_path in removed:
+            del self.entries[file_path]
+
+        if self.manifest is not None and updated:
+            self.manifest.save()
+        return {'updated': updated, 'removed': removed, 'failed': failed}
+
+    def write_summary(self):
+        """用内存中的全部业绩指标重新生成业绩汇总"""
+        if not self.summary_path:
+            return
+        all_metrics = [metrics for entry in self.entries.values() for metrics in entry['metrics']]
+        if all_metrics:
+            generate_summary_file(all_metrics, self.summary_path)
+
+    def run(self, interval: float = 5.0, max_cycles: int | None = None):
+        """
+        持续监控目录（Ctrl+C 退出）
+
+        Args:
+            interval: 轮询间隔（秒）
+            max_cycles: 最多轮询次数（可选，默认一直运行）
+        """
+        print(f"开始监控目录: {self.directory}（每 {interval:g} 秒检查一次，Ctrl+C 退出）")
+        cycle = 0
+        try:
+            while max_cycles is None or cycle < max_cycles:
+                changes = self.poll()
+                if cycle == 0 or changes['updated'] or changes['removed']:
+                    self.write_summary()
+                    print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] 已更新 {len(changes['updated'])} 个，"
+                          f"删除 {len(changes['removed'])} 个，当前共 "
+                          f"{sum(len(entry['metrics']) for entry in self.entries.values())} 个产品")
+                cycle += 1
+                if max_cycles is None or cycle < max_cycles:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            print("\n已停止监控")
@@ -1,28 +1,45 @@
 """周期性买入收益计算器"""
+import os
+from typing import BinaryIO
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from .buy_rules import BuyRule
+from .trading_calendar import TradingCalendar, annualize_return
+from .nav_loader import read_nav_sheets
+from .nav_series import NavSeries
+from .excel_style import excel_engine, style_sheet
+
+# 买入收益明细中以百分比展示的列
+PERIODIC_PERCENT_COLUMNS = ('每日涨跌幅', '区间收益率', '区间年化收益率')
 
 
 class PeriodicBuyCalculator:
     """周期性买入收益计算器 - 根据指定规则计算持有收益"""
 
-    def __init__(self, file_path: str, buy_rule: BuyRule):
+    def __init__(self, file_path: str | BinaryIO | pd.DataFrame | NavSeries, buy_rule: BuyRule,
+                 calendar: TradingCalendar | None = None):
         """
         初始化计算器
 
         Args:
-            file_path: Excel文件路径
+            file_path: Excel文件路径、二进制文件对象（如上传文件的 BytesIO），或 read_nav_sheets 读入的原始sheet，
+                或已解析的 NavSeries（多个计算器共享同一份数据，不重复解析、不复制）
             buy_rule: 买入规则实例
+            calendar: 交易日历（可选，默认由净值日期构建；可传入由节假日文件生成的日历）
         """
-        self.file_path: str = file_path
+        self.file_path: str | BinaryIO | pd.DataFrame | NavSeries = file_path
         self.buy_rule: BuyRule = buy_rule
         self.df: pd.DataFrame = pd.DataFrame()
         self.product_name: str = ""
         self.product_code: str = ""
         self.buy_dates: list = []
         self.results_df: pd.DataFrame = pd.DataFrame()
+        self.calendar: TradingCalendar = TradingCalendar([])
+        self.series: NavSeries | None = None
         self._load_data()
+        if calendar is not None:
+            self.calendar = calendar
 
     def _load_data(self):
         """
@@ -34,94 +51,98 @@ class PeriodicBuyCalculator:
         - A2-C2: 列标题（日期、单位净值、累计净值）
         - A3起: 数据
         """
-        # 读取原始数据，不使用header
-        raw_df = pd.read_excel(self.file_path, header=None)
-
-        # 获取产品信息（A1产品名称，B1产品代码）
-        self.product_name = str(raw_df.iloc[0, 0]).strip()  # A1
-        self.product_code = str(raw_df.iloc[0, 1]).strip()  # B1
+        # 已解析的不可变序列直接共享，不重新读取
+        series = NavSeries.load(self.file_path)
+        self.series = series
+        self.product_name = series.product_name
+        self.product_code = series.product_code
 
-        # 获取数据部分（A2行是标题，A3行开始是数据）
-        data_df = raw_df.iloc[2:].copy()
-        data_df.columns = ['日期', '单位净值', '累计净值']
+        # 按日期升序
+        self.df = series.frame(ascending=True)
+        self.calendar = TradingCalendar(series.dates)
 
-        # 清理空行
-        data_df = data_df.dropna(subset=['日期'])
-
-        # 转换日期
-        data_df['日期'] = pd.to_datetime(data_df['日期'], format='%Y%m%d')
-        
-        # 按日期排序（升序）
-        data_df = data_df.sort_values('日期')
-        data_df.set_index("日期", inplace=True)
-
-        self.df = data_df
-
-    def calculate_buy_returns(self):
+    def calculate_buy_returns(self, results_df: pd.DataFrame | None = None):
         """
         根据买入规则计算每次买入的持有收益
         
+        Args:
+            results_df: 已计算的结果（可选，如从磁盘缓存读取的），传入时不重新计算
+        
         Returns:
             pd.DataFrame: 包含每次买入的详细信息
         """
-        # 获取所有可用的交易日
-        available_dates = set(self.df.index.to_pydatetime()) # type: ignore
-        
-        # 获取日期范围
-        start_date = self.df.index.min().to_pydatetime()
-        end_date = self.df.index.max().to_pydatetime()
-        
-        # 根据规则获取所有买入日期
-        self.buy_dates = self.buy_rule.get_buy_dates(start_date, end_date, available_dates)
-        
-        if not self.buy_dates:
+        self.results_df = self.evaluate_rule(self.buy_rule) if results_df is None else results_df
+        self.buy_dates = [] if self.results_df.empty else \
+            list(pd.to_datetime(self.results_df['买入日期']).dt.to_pydatetime())
+
+        if self.results_df.empty:
             print(f"警告: 在数据范围内没有找到符合规则的买入日期")
-            return pd.DataFrame()
-        
-        # 获取最新日期和净值
-        latest_date = self.df.index.max()
-        latest_nav = self.df.loc[latest_date, '单位净值']
-        
-        # 计算每个买入日的收益
-        results = []
-        for buy_date in self.buy_dates:
-            buy_date_pd = pd.Timestamp(buy_date)
-            buy_nav = self.df.loc[buy_date_pd, '单位净值']
-            
-            # 计算每日涨跌幅（买入当日）
-            # 查找前一个交易日
-            prev_dates = self.df.index[self.df.index < buy_date_pd]
-            if len(prev_dates) > 0:
-                prev_date = prev_dates[-1]
-                prev_nav = self.df.loc[prev_date, '单位净值']
-                daily_change = (buy_nav / prev_nav - 1) # type: ignore
-            else:
-                daily_change = 0.0
-            
-            # 持有天数
-            holding_days = (latest_date - buy_date_pd).days
-            
-            # 区间收益率
-            period_return = (latest_nav / buy_nav - 1) # type: ignore
-            
-            # 区间年化收益率
-            if holding_days > 0:
-                annualized_return = (1 + period_return) ** (365 / holding_days) - 1
-            else:
-                annualized_return = 0.0
-            
-            results.append({
-                '买入日期': buy_date_pd.strftime('%Y-%m-%d'),
-                '买入基金净值': buy_nav,
-                '每日涨跌幅': daily_change,
-                '持有天数': holding_days,
-                '区间收益率': period_return,
-                '区间年化收益率': annualized_return
-            })
-        
-        self.results_df = pd.DataFrame(results)
         return self.results_df
 
+    def compute(self) -> pd.DataFrame:
+        """
+        按当前买入规则计算买入收益明细并返回（不修改实例状态，同一个计算器可在多个线程中同时调用）
+
+        Returns:
+            pd.DataFrame: 每次买入的详细信息（无买入日期时为空）
+        """
+        return self.evaluate_rule(self.buy_rule)
+
+    def evaluate_rule(self, buy_rule: BuyRule) -> pd.DataFrame:
+        """
+        在已加载的净值序列上向量化计算某个买入规则的持有收益（不修改实例状态）
+
+        Args:
+            buy_rule: 买入规则实例
+
+        Returns:
+            pd.DataFrame: 每次买入的详细信息（无买入日期时为空）
+        """
+        # 在交易日索引上一次性得到所有买入位置
+        trading_days = pd.DatetimeIndex(self.df.index)
+        positions = np.flatnonzero(buy_rule.get_buy_mask(trading_days, self.calendar))
+        if positions.size == 0:
+            return pd.DataFrame()
+
+        navs = self.df['单位净值'].to_numpy(dtype=float)
+        latest_date = trading_days.max()
+        latest_nav = navs[-1]
+
+        buy_navs = navs[positions]
+
+        # 每日涨跌幅（买入当日相对前一个交易日），第一个交易日记为0
+        prev_navs = navs[np.maximum(positions - 1, 0)]
+        daily_change = np.where(positions > 0, buy_navs / prev_navs - 1, 0.0)
+
+        # 持有天数
+        buy_days = trading_days[positions]
+        holding_days = np.asarray((latest_date - buy_days).days)
+
+        # 区间收益率与区间年化收益率
+        period_return = latest_nav / buy_navs - 1
+        annualized_return = annualize_return(period_return, holding_days)
+
+        return pd.DataFrame({
+            '买入日期': buy_days.strftime('%Y-%m-%d'),
+            '买入基金净值': buy_navs,
+            '每日涨跌幅': daily_change,
+            '持有天数': holding_days,
+            '区间收益率': period_return,
+            '区间年化收益率': annualized_return
+        })
+
+    def evaluate_rules(self, buy_rules: list) -> dict:
+        """
+        在同一份净值序列上计算多个买入规则（数据只加载一次）
+
+        Args:
+            buy_rules: 买入规则实例列表
+
+        Returns:
+            dict: {规则名称: 买入收益明细DataFrame}
+        """
+        return {rule.get_rule_name(): self.evaluate_rule(rule) for rule in buy_rules}
+
     def get_specific_date_return(self, target_date: str) -> dict:
         """
         获取特定日期买入的收益情况
@@ -151,20 +172,24 @@ class PeriodicBuyCalculator:
         
         return matching_rows.iloc[0].to_dict()
 
-    def format_output_text(self, preview_count: int = 10) -> str:
+    def format_output_text(self, preview_count: int = 10, results_df: pd.DataFrame = None) -> str: # type: ignore
         """
         生成格式化的输出文本（只显示部分数据作为预览）
         
         Args:
             preview_count: 预览行数（默认10行）
+            results_df: 要展示的买入收益明细（可选，如按起始日期筛选后的结果；
+                        提供时不会触发重新计算）
             
         Returns:
             str: 格式化后的文本
         """
-        if self.results_df.empty:
-            self.calculate_buy_returns()
+        if results_df is None:
+            if self.results_df.empty:
+                self.calculate_buy_returns()
+            results_df = self.results_df
         
-        if self.results_df.empty:
+        if results_df.empty:
             return "没有符合规则的买入日期"
         
         lines = []
@@ -180,7 +205,7 @@ class PeriodicBuyCalculator:
         lines.append("-" * 80)
         
         # 数据行 - 只显示最后 preview_count 行
-        display_df = self.results_df.tail(preview_count)
+        display_df = results_df.tail(preview_count)
         for _, row in display_df.iterrows():
             line = (
                 f"{row['买入日期']:<15} "
@@ -195,11 +220,11 @@ class PeriodicBuyCalculator:
         lines.append("-" * 80)
         
         # 统计信息
-        avg_return = self.results_df['区间收益率'].mean()
-        avg_annualized = self.results_df['区间年化收益率'].mean()
+        avg_return = results_df['区间收益率'].mean()
+        avg_annualized = results_df['区间年化收益率'].mean()
         lines.append(f"平均{'':>42} {avg_return:>11.2%} {avg_annualized:>14.2%}")
         lines.append("")
-        lines.append(f"共计 {len(self.results_df)} 个买入日期，上方为最近 {min(preview_count, len(self.results_df))} 条记录")
+        lines.append(f"共计 {len(results_df)} 个买入日期，上方为最近 {min(preview_count, len(results_df))} 条记录")
         lines.append("完整数据请查看输出文件")
         
         return "\n".join(lines)
@@ -216,34 +241,21 @@ class PeriodicBuyCalculator:
             f.write(output_text)
         return output_path
 
-    def save_to_excel(self, output_path: str):
+    def save_to_excel(self, output_path: str | BinaryIO):
         """
         保存结果到Excel文件
         
         Args:
-            output_path: 输出文件路径
+            output_path: 输出文件路径或可写的二进制文件对象（如 BytesIO）
         """
         if self.results_df.empty:
             self.calculate_buy_returns()
         
-        # 创建格式化的DataFrame
-        df_output = self.results_df.copy()
-        
-        # 格式化百分比列
-        df_output['每日涨跌幅'] = df_output['每日涨跌幅'].apply(lambda x: f"{x:.2%}")
-        df_output['区间收益率'] = df_output['区间收益率'].apply(lambda x: f"{x:.2%}")
-        df_output['区间年化收益率'] = df_output['区间年化收益率'].apply(lambda x: f"{x:.2%}")
-        
-        # 保存到Excel
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            df_output.to_excel(writer, sheet_name='买入收益明细', index=False)
-            
-            # 调整列宽
-            from openpyxl.utils import get_column_letter
-            ws = writer.sheets['买入收益明细']
-            for i, col in enumerate(df_output.columns, 1):
-                max_len = max(len(str(col)), 15)
-                ws.column_dimensions[get_column_letter(i)].width = max_len + 2
+        # 保存到Excel（收益率列按列设置百分比格式）
+        with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
+            self.results_df.to_excel(writer, sheet_name='买入收益明细', index=False)
+            style_sheet(writer, '买入收益明细', self.results_df, min_width=15,
+                        percent_columns=PERIODIC_PERCENT_COLUMNS)
         
         return output_path
 
@@ -257,3 +269,180 @@ class PeriodicBuyCalculator:
             'buy_count': len(self.buy_dates),
             'rule_name': self.buy_rule.get_rule_name()
         }
+
+
+class PeriodicBuyPrefixIndex:
+    """
+    周期性买入结果的前缀聚合索引
+
+    买入明细按日期升序预先计算一次，并保存区间收益率的累计和；
+    任意起始日期的买入次数和平均收益通过二分查找 O(log n) 得到，无需重新计算。
+    """
+
+    def __init__(self, results_df: pd.DataFrame):
+        """
+        初始化索引
+
+        Args:
+            results_df: calculate_buy_returns 的结果（按买入日期升序）
+        """
+        self.results_df: pd.DataFrame = results_df.reset_index(drop=True)
+        if results_df.empty:
+            self.buy_dates = np.array([], dtype='datetime64[ns]')
+            self.cum_return = np.zeros(1)
+            self.cum_annualized = np.zeros(1)
+            return
+
+        self.buy_dates = pd.to_datetime(self.results_df['买入日期']).to_numpy()
+        # 前面补0，使 cum[i] 为前 i 条记录之和
+        self.cum_return = np.concatenate([[0.0], np.cumsum(self.results_df['区间收益率'].to_numpy(dtype=float))])
+        self.cum_annualized = np.concatenate([[0.0], np.cumsum(self.results_df['区间年化收益率'].to_numpy(dtype=float))])
+
+    def _positions(self, start_dates) -> np.ndarray:
+        """起始日期对应的第一条买入记录位置"""
+        starts = pd.to_datetime(pd.Index(start_dates)).to_numpy()
+        return np.searchsorted(self.buy_dates, starts, side='left')
+
+    def slice(self, start_date=None) -> pd.DataFrame:
+        """
+        获取起始日期（含）之后的买入明细
+
+        Args:
+            start_date: 起始日期（None 表示全部）
+
+        Returns:
+            pd.DataFrame: 筛选后的买入明细
+        """
+        if start_date is None or self.results_df.empty:
+            return self.results_df
+        return self.results_df.iloc[int(self._positions([start_date])[0]):]
+
+    def query(self, start_dates) -> pd.DataFrame:
+        """
+        批量查询多个起始日期的买入次数和平均收益
+
+        Args:
+            start_dates: 起始日期列表
+
+        Returns:
+            pd.DataFrame: 起始日期、买入次数、平均区间收益率、平均区间年化收益率
+        """
+        starts = pd.to_datetime(pd.Index(start_dates))
+        positions = self._positions(starts)
+        total = len(self.buy_dates)
+        count = total - positions
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_return = np.where(count > 0, (self.cum_return[total] - self.cum_return[positions]) / count, np.nan)
+            avg_annualized = np.where(count > 0, (self.cum_annualized[total] - self.cum_annualized[positions]) / count, np.nan)
+
+        return pd.DataFrame({
+            '起始日期': starts.strftime('%Y-%m-%d'),
+            '买入次数': count,
+            '平均区间收益率': avg_return,
+            '平均区间年化收益率': avg_annualized,
+        })
+
+
+def build_rule_matrix(file_paths: list, buy_rules: list, include_detail: bool = False) -> dict:
+    """
+    多产品 × 多规则的周期性买入收益矩阵（每个文件只读取一次）
+
+    多产品工作簿（每个sheet一个产品）打开一次后读入全部sheet，每个sheet作为一个产品。
+    结果按 (产品名称, 产品代码) 区分，简称相同的不同份额不会互相覆盖；
+    名称和代码都相同的重复产品在名称后标注来源文件。
+
+    Args:
+        file_paths: 产品Excel文件路径列表（单产品文件或多产品工作簿）
+        buy_rules: 买入规则实例列表
+        include_detail: 是否同时返回每次买入的明细
+
+    Returns:
+        dict: {
+            '平均区间收益率': 产品 × 规则 DataFrame（索引为 产品名称、产品代码）,
+            '平均区间年化收益率': 产品 × 规则 DataFrame,
+            '买入次数': 产品 × 规则 DataFrame,
+            '买入收益明细': 明细DataFrame（仅 include_detail=True 时）
+        }
+    """
+    if not buy_rules:
+        raise ValueError("至少需要一个买入规则")
+
+    rule_names = [rule.get_rule_name() for rule in buy_rules]
+    avg_return, avg_annualized, buy_count = {}, {}, {}
+    details = []
+
+    sheets = []
+    for file_path in file_paths:
+        file_sheets = read_nav_sheets(file_path)
+        source = os.path.basename(file_path) if isinstance(file_path, str) else '上传文件'
+        sheets.extend((f"{source}::{name}" if len(file_sheets) > 1 else source, raw_df)
+                      for name, raw_df in file_sheets.items())
+
+    for source, raw_df in sheets:
+        calculator = PeriodicBuyCalculator(raw_df, buy_rules[0])
+        product = (calculator.product_name, calculator.product_code)
+        if product in avg_return:
+            product = (f"{calculator.product_name}（{source}）", calculator.product_code)
+            print(f"  ⚠️ 产品名称和代码重复，按来源区分: {product[0]}")
+        avg_return[product], avg_annualized[product], buy_count[product] = {}, {}, {}
+
+        for rule_name, results_df in calculator.evaluate_rules(buy_rules).items():
+            if results_df.empty:
+                avg_return[product][rule_name] = np.nan
+                avg_annualized[product][rule_name] = np.nan
+                buy_count[product][rule_name] = 0
+                continue
+            avg_return[product][rule_name] = results_df['区间收益率'].mean()
+            avg_annualized[product][rule_name] = results_df['区间年化收益率'].mean()
+            buy_count[product][rule_name] = len(results_df)
+
+            if include_detail:
+                detail = results_df.copy()
+                detail.insert(0, '买入规则', rule_name)
+                detail.insert(0, '产品代码', product[1])
+                detail.insert(0, '产品名称', product[0])
+                details.append(detail)
+
+        print(f"  ✓ {product[0]} ({product[1]}): {len(buy_rules)} 个规则")
+
+    def to_grid(values: dict) -> pd.DataFrame:
+        grid = pd.DataFrame.from_dict(values, orient='index').reindex(columns=rule_names)
+        grid.index = pd.MultiIndex.from_tuples(list(values), names=['产品名称', '产品代码']) if values else \
+            pd.MultiIndex.from_arrays([[], []], names=['产品名称', '产品代码'])
+        return grid
+
+    matrix = {
+        '平均区间收益率': to_grid(avg_return),
+        '平均区间年化收益率': to_grid(avg_annualized),
+        '买入次数': to_grid(buy_count),
+    }
+    if include_detail:
+        matrix['买入收益明细'] = pd.concat(details, ignore_index=True) if details else pd.DataFrame()
+    return matrix
+
+
+def save_rule_matrix(matrix: dict, output_path: str):
+    """
+    保存多产品 × 多规则收益矩阵到Excel文件
+
+    Args:
+        matrix: build_rule_matrix 的返回结果
+        output_path: 输出文件路径
+    """
+    with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
+        for sheet_name, df in matrix.items():
+            is_detail = sheet_name == '买入收益明细'
+            df.to_excel(writer, sheet_name=sheet_name, index=not is_detail)
+
+            # 收益率显示为百分比，买入次数保持整数
+            if is_detail:
+                percent_columns = PERIODIC_PERCENT_COLUMNS
+            elif sheet_name == '买入次数':
+                percent_columns = ()
+            else:
+                percent_columns = df.columns
+            style_sheet(writer, sheet_name, df, index=not is_detail, min_width=12,
+                        percent_columns=percent_columns, overrides={'买入次数': '0'})
+
+    return output_path
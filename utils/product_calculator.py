@@ -1,24 +1,41 @@
 """产品净值计算器类"""
+from typing import BinaryIO
+import numpy as np
 import pandas as pd
-from openpyxl.utils import get_column_letter
+from .trading_calendar import TradingCalendar, PERIODS_PER_YEAR, annualize_return
+from .risk_metrics import compute_risk_metrics, RISK_METRIC_COLUMNS
+from .returns import ReturnSeries, FREQUENCY_NAMES, check_frequency
+from .nav_series import NavSeries
+from .excel_style import write_tables
+
+# 业绩指标口径版本：指标列或计算口径变化时递增，使运行清单中的旧结果失效
+METRICS_VERSION = 3
 
 
 class ProductNetValueCalculator:
     """产品净值数据计算器（支持多产品格式）"""
 
-    def __init__(self, file_path: str, risk_free_rate: float = 0.02):
+    def __init__(self, file_path: str | BinaryIO | pd.DataFrame | NavSeries, risk_free_rate: float = 0.02,
+                 return_frequency: str = 'W'):
         """
         初始化计算器
 
         Args:
-            file_path: Excel文件路径
+            file_path: Excel文件路径、二进制文件对象（如上传文件的 BytesIO），或 read_nav_sheets 读入的原始sheet，
+                或已解析的 NavSeries（多个计算器共享同一份数据，不重复解析、不复制）
             risk_free_rate: 无风险利率，用于计算夏普比率
+            return_frequency: 波动率、夏普、风险指标使用的收益率频率（'D' 日度, 'W' 周度, 'M' 月度）
         """
-        self.file_path: str = file_path
+        check_frequency(return_frequency)
+        self.file_path: str | BinaryIO | pd.DataFrame | NavSeries = file_path
         self.risk_free_rate: float = risk_free_rate
+        self.return_frequency: str = return_frequency
         self.df: pd.DataFrame = pd.DataFrame()
         self.metrics: dict = {}
         self.products: dict = {}
+        self.series: NavSeries | None = None
+        self.calendar: TradingCalendar = TradingCalendar([])
+        self.returns: ReturnSeries = ReturnSeries(pd.Series(dtype=float))
         self._load_data()
 
     def _load_data(self):
@@ -30,91 +47,87 @@ class ProductNetValueCalculator:
         - A2-C2: 列标题（日期、单位净值、累计净值）
         - A3起: 数据
         """
-        # 读取原始数据，不使用header
-        raw_df = pd.read_excel(self.file_path, header=None)
-
-        # 获取产品信息（A1产品名称，B1产品代码）
-        product_name = raw_df.iloc[0, 0]  # A1
-        product_code = raw_df.iloc[0, 1]  # B1
-
-        # 获取数据部分（A2行是标题，A3行开始是数据）
-        data_df = raw_df.iloc[2:].copy()
-        data_df.columns = ['日期', '单位净值', '累计净值']
-
-        # 清理空行
-        data_df = data_df.dropna(subset=['日期'])
+        # 已解析的不可变序列直接共享，不重新读取
+        series = NavSeries.load(self.file_path)
+        self.series = series
 
-        # 转换日期
-        data_df['日期'] = pd.to_datetime(data_df['日期'], format='%Y%m%d')
-        data_df.set_index("日期", inplace=True)
-
-        self.df = data_df
+        # 各指标按系统导出的倒序（最新在前）计算；合并工作簿为升序，统一转为倒序
+        self.df = series.frame(ascending=False)
+        self.calendar = TradingCalendar(series.dates)
+        self.returns = ReturnSeries(pd.Series(series.unit_nav, index=series.dates, copy=False))
 
         # 存储产品信息
-        if pd.notna(product_name) and pd.notna(product_code):
-            self.products[str(product_code).strip()] = {
-                'name': str(product_name).strip(),
-                'code': str(product_code).strip()
+        if series.product_name not in ('', 'nan') and series.product_code not in ('', 'nan'):
+            self.products[series.product_code] = {
+                'name': series.product_name,
+                'code': series.product_code
             }
 
     def calculate_weekly_return(self):
-        """计算周收益率（倒序数据：最新日期在前）"""
-        # 倒序数据：iloc[0]是最新，iloc[-1]是最早
-        # shift(-1) 获取下一行（更早的日期）作为"上周"净值
-        self.df["上周净值"] = self.df["单位净值"].shift(-1)
-        self.df["周收益率"] = self.df["单位净值"] / self.df["上周净值"] - 1
-        self.df['周收益率'] = self.df['周收益率'].fillna(0)
-
-    def calculate_all_return(self):
+        """
+        计算周收益率
+
+        净值先重采样到每周五（周内最后一个净值）再计算，
+        日度净值或净值日期不规则时也得到真正的周收益率。
+
+        Returns:
+            pd.Series: 按时间正序排列的周收益率
+        """
+        return self.returns.returns('W')
+
+    def calculate_all_return(self, metrics: dict | None = None):
         """计算成立以来收益率（倒序数据：最新日期在前）"""
+        metrics = self.metrics if metrics is None else metrics
         # iloc[0] = 最新净值, iloc[-1] = 最早净值
         all_return = self.df['单位净值'].iloc[0] / self.df['单位净值'].iloc[-1] - 1
-        self.metrics['all_return'] = all_return
+        metrics['all_return'] = all_return
         return all_return
 
-    def calculate_annual_return(self):
+    def calculate_annual_return(self, metrics: dict | None = None):
         """计算年化收益率"""
-        all_return = self.metrics.get('all_return', self.calculate_all_return())
+        metrics = self.metrics if metrics is None else metrics
+        all_return = metrics.get('all_return', self.calculate_all_return(metrics))
         if all_return is None:
             return None
         whole_time = self.df.index.max() - self.df.index.min()
         days = whole_time.days
         if days <= 0:
             return None
-        weeks = days / 7
-        annual_return_ = (1 + all_return) ** (52 / weeks) - 1
-        self.metrics['annual_return'] = annual_return_
+        # 与持有收益的年化口径一致，按自然日年化
+        annual_return_ = annualize_return(all_return, days)
+        metrics['annual_return'] = annual_return_
         return annual_return_
 
-    def calculate_annual_volatility(self):
-        """计算年化波动率（倒序数据：最新日期在前）"""
-        # 使用 dropna() 移除 NaN 值（最后一行会被移除，因为 shift(-1) 产生 NaN）
-        weekly_returns = self.df["周收益率"].dropna()
-        if len(weekly_returns) == 0:
-            self.metrics['annual_volatility'] = None
+    def calculate_annual_volatility(self, metrics: dict | None = None):
+        """计算年化波动率（按 return_frequency 的收益率和对应年化因子）"""
+        metrics = self.metrics if metrics is None else metrics
+        period_returns = self.returns.values(self.return_frequency)
+        if len(period_returns) < 2:
+            metrics['annual_volatility'] = None
             return None
 
-        # 计算样本标准差
-        variance = weekly_returns.var()  # pandas var() 使用 N-1
-        standard = variance ** 0.5 # type: ignore
+        # 计算样本标准差（N-1）
+        standard = period_returns.std(ddof=1)
 
-        # 年化波动率 = 周波动率 * sqrt(52)
-        annual_volatility = standard * (52 ** 0.5)
-        self.metrics['annual_volatility'] = annual_volatility
+        # 年化波动率 = 周期波动率 * sqrt(每年周期数)，周度为 sqrt(52)
+        annual_volatility = float(standard * (PERIODS_PER_YEAR[self.return_frequency] ** 0.5))
+        metrics['annual_volatility'] = annual_volatility
         return annual_volatility
 
-    def calculate_sharpe_ratio(self):
+    def calculate_sharpe_ratio(self, metrics: dict | None = None):
         """计算夏普比率"""
-        annual_return = self.metrics.get('annual_return')
-        annual_volatility = self.metrics.get('annual_volatility')
+        metrics = self.metrics if metrics is None else metrics
+        annual_return = metrics.get('annual_return')
+        annual_volatility = metrics.get('annual_volatility')
         if annual_return is None or annual_volatility is None:
             return None
         sharpe_ratio = (annual_return - self.risk_free_rate) / annual_volatility
-        self.metrics['sharpe_ratio'] = sharpe_ratio
+        metrics['sharpe_ratio'] = sharpe_ratio
         return sharpe_ratio
 
-    def calculate_max_drawdown(self):
+    def calculate_max_drawdown(self, metrics: dict | None = None):
         """计算最大回撤（倒序数据：最新日期在前）"""
+        metrics = self.metrics if metrics is None else metrics
         # 先转为正序数据，以便正确计算 expanding().max()
         df_sorted = self.df.sort_index()
         df_sorted["历史最高值"] = df_sorted["单位净值"].expanding().max()
@@ -124,12 +137,26 @@ class ProductNetValueCalculator:
         max_drawback = df_sorted["每周回撤"].min()
         max_drawback_date = df_sorted["每周回撤"].idxmin()
 
-        self.metrics['max_drawback'] = max_drawback
-        self.metrics['max_drawback_date'] = max_drawback_date
+        metrics['max_drawback'] = max_drawback
+        metrics['max_drawback_date'] = max_drawback_date
         return max_drawback, max_drawback_date
 
-    def calculate_1year_max_drawdown(self):
+    def calculate_risk_metrics(self, metrics: dict | None = None):
+        """计算风险指标（索提诺、卡玛、VaR/CVaR、偏度峰度、胜率、最大连续亏损期数）"""
+        metrics = self.metrics if metrics is None else metrics
+        risk_metrics = compute_risk_metrics(
+            self.returns.values(self.return_frequency),
+            periods_per_year=PERIODS_PER_YEAR[self.return_frequency],
+            risk_free_rate=self.risk_free_rate,
+            annual_return=metrics.get('annual_return'),
+            max_drawdown=metrics.get('max_drawback')
+        )
+        metrics.update(risk_metrics)
+        return risk_metrics
+
+    def calculate_1year_max_drawdown(self, metrics: dict | None = None):
         """计算近一年最大回撤（倒序数据：最新日期在前）"""
+        metrics = self.metrics if metrics is None else metrics
         end_date = self.df.index.max()
         start_date = end_date - pd.Timedelta(days=365)
 
@@ -137,8 +164,8 @@ class ProductNetValueCalculator:
         df_1year = self.df[self.df.index >= start_date].copy()
 
         if len(df_1year) == 0:
-            self.metrics['max_drawback_1year'] = None
-            self.metrics['max_drawback_date_1year'] = None
+            metrics['max_drawback_1year'] = None
+            metrics['max_drawback_date_1year'] = None
             return None, None
 
         # 获取上一年最后一天的数据作为"历史最高"的起点
@@ -169,32 +196,38 @@ class ProductNetValueCalculator:
         max_drawback_1year = df_1year_sorted["近一年回撤"].min()
         max_drawback_date_1year = df_1year_sorted["近一年回撤"].idxmin()
 
-        self.metrics['max_drawback_1year'] = max_drawback_1year
-        self.metrics['max_drawback_date_1year'] = max_drawback_date_1year
+        metrics['max_drawback_1year'] = max_drawback_1year
+        metrics['max_drawback_date_1year'] = max_drawback_date_1year
         return max_drawback_1year, max_drawback_date_1year
 
-    def get_annual_returns(self):
-        """计算年度收益率（倒序数据：最新日期在前）"""
-        records = []
-        # 获取所有年份，按时间正序排列
-        years = sorted([int(y) for y in self.df.index.year.unique() if pd.notna(y)])  # type: ignore
+    def _period_end_returns(self, freq: str) -> tuple:
+        """
+        按交易日历的周期末交易日计算周期收益（周期初价格 = 上一周期末价格）
 
-        # 初始为最早年份的年初价格（DataFrame最后一行的净值，即最早日期）
-        last_year_end = self.df["单位净值"].iloc[-1]
+        Args:
+            freq: 周期（'M' 月, 'Y' 年）
 
-        # 按时间正序遍历年份
-        for year in years:
-            year_data = self.df[self.df.index.year == year]  # type: ignore
-            start_price = last_year_end  # 年初价格 = 上一年的年末价格
-            end_price = year_data['单位净值'].iloc[0]  # 年末价格 = 该年最新净值（第一行）
-            total_return = (end_price / start_price) - 1
-            records.append({
-                'year': int(year),
-                'start_price': round(start_price, 4),
-                'end_price': round(end_price, 4),
-                'annual_return': f"{total_return:.2%}"
-            })
-            last_year_end = end_price  # 更新为今年的年末价格
+        Returns:
+            tuple: (周期末日期, 周期初价格, 周期末价格)
+        """
+        # 交易日历为升序，净值数据为倒序
+        navs = self.df['单位净值'].sort_index().to_numpy(dtype=float)
+        ends = self.calendar.period_ends(freq)
+        end_prices = navs[ends]
+        # 第一个周期的期初价格为最早净值
+        start_prices = np.concatenate([navs[:1], end_prices[:-1]])
+        return self.calendar.days[ends], start_prices, end_prices
+
+    def get_annual_returns(self):
+        """计算年度收益率（倒序数据：最新日期在前）"""
+        end_dates, start_prices, end_prices = self._period_end_returns('Y')
+        total_returns = end_prices / start_prices - 1
+        records = [{
+            'year': int(end_date.year),
+            'start_price': round(start_price, 4),
+            'end_price': round(end_price, 4),
+            'annual_return': f"{total_return:.2%}"
+        } for end_date, start_price, end_price, total_return in zip(end_dates, start_prices, end_prices, total_returns)]
         return pd.DataFrame(records).set_index('year')
 
     def get_annual_max_drawdown(self, monthly: bool = False):
@@ -254,27 +287,12 @@ class ProductNetValueCalculator:
 
     def get_monthly_return_matrix(self):
         """计算成立以来月度收益矩阵（倒序数据：最新日期在前）"""
-        records = []
-        # 获取所有年月组合，按时间正序排列
-        year_months = sorted([(int(y), int(m)) for y, m in self.df.groupby([self.df.index.year, self.df.index.month]).groups.keys() if pd.notna(y) and pd.notna(m)])  # type: ignore
-
-        # 初始为最早月末价格（DataFrame最后一行的净值，即最早日期）
-        last_month_end = self.df['单位净值'].iloc[-1]
-
-        # 按时间正序遍历年月
-        for (year, month) in year_months:
-            month_data = self.df[(self.df.index.year == year) & (self.df.index.month == month)]  # type: ignore
-            start_price = last_month_end  # 月初价格 = 上月末价格
-            end_price = month_data['单位净值'].iloc[0]  # 月末价格 = 该月最新净值（第一行）
-            month_return = (end_price / start_price) - 1
-            records.append({
-                'year': int(year),
-                'month': month,
-                'monthly_return': month_return
-            })
-            last_month_end = end_price  # 更新为本月末价格
-
-        rec_df = pd.DataFrame(records)
+        end_dates, start_prices, end_prices = self._period_end_returns('M')
+        rec_df = pd.DataFrame({
+            'year': end_dates.year.astype(int),
+            'month': end_dates.month.astype(int),
+            'monthly_return': end_prices / start_prices - 1
+        })
         matrix = rec_df.pivot(index='year', columns='month', values='monthly_return').sort_index()
         matrix = matrix.reindex(columns=range(1, 13))
         annual_pct = rec_df.groupby('year')['monthly_return'].apply(lambda s: (s.add(1).prod() - 1) * 100)
@@ -283,7 +301,11 @@ class ProductNetValueCalculator:
         return matrix
 
     def get_product_info(self):
-        """获取产品信息（产品名称、最新净值日期、最新净值）"""
+        """
+        获取产品信息（产品名称、最新净值日期、最新净值）
+
+        只需要最新净值、不做计算时用 nav_loader.read_latest_nav，倒序文件只读取顶部几行
+        """
         if self.df.empty:
             return None, None, None
 
@@ -293,8 +315,14 @@ class ProductNetValueCalculator:
 
         return product_name, latest_nav_date, latest_nav
 
-    def build_metrics_df(self):
-        """构建业绩指标DataFrame"""
+    def build_metrics_df(self, metrics: dict | None = None):
+        """
+        构建业绩指标DataFrame
+
+        Args:
+            metrics: compute() 返回的指标（可选，默认使用 run_all_calculations 保存的结果）
+        """
+        metrics = self.metrics if metrics is None else metrics
         product_name, latest_nav_date, latest_nav = self.get_product_info()
         product_code = list(self.products.keys())[0] if self.products else None
 
@@ -311,94 +339,68 @@ class ProductNetValueCalculator:
             '产品代码': product_code,
             '最新净值日期': format_date(latest_nav_date),
             '最新净值': latest_nav,
-            '成立以来收益率': self.metrics.get('all_return'),
-            '年化收益率': self.metrics.get('annual_return'),
-            '年化波动率': self.metrics.get('annual_volatility'),
-            '夏普比率': self.metrics.get('sharpe_ratio'),
-            '最大回撤': self.metrics.get('max_drawback'),
-            '最大回撤日期': format_date(self.metrics.get('max_drawback_date')),
-            '近一年最大回撤': self.metrics.get('max_drawback_1year'),
-            '近一年最大回撤日期': format_date(self.metrics.get('max_drawback_date_1year')),
+            '成立以来收益率': metrics.get('all_return'),
+            '年化收益率': metrics.get('annual_return'),
+            '年化波动率': metrics.get('annual_volatility'),
+            '夏普比率': metrics.get('sharpe_ratio'),
+            '最大回撤': metrics.get('max_drawback'),
+            '最大回撤日期': format_date(metrics.get('max_drawback_date')),
+            '近一年最大回撤': metrics.get('max_drawback_1year'),
+            '近一年最大回撤日期': format_date(metrics.get('max_drawback_date_1year')),
+            **{column: metrics.get(key) for key, column in RISK_METRIC_COLUMNS.items()},
         }])
 
+    def compute(self) -> dict:
+        """
+        计算全部业绩指标并返回（不修改实例状态，同一个计算器可在多个线程中同时调用）
+
+        Returns:
+            dict: 指标名 -> 值（与 self.metrics 的键相同）
+        """
+        metrics = {}
+        self.calculate_all_return(metrics)
+        self.calculate_annual_return(metrics)
+        self.calculate_annual_volatility(metrics)
+        self.calculate_sharpe_ratio(metrics)
+        self.calculate_max_drawdown(metrics)
+        self.calculate_1year_max_drawdown(metrics)
+        self.calculate_risk_metrics(metrics)
+        return metrics
+
     def run_all_calculations(self):
-        """执行所有计算"""
-        self.calculate_weekly_return()
-        self.calculate_all_return()
-        self.calculate_annual_return()
-        self.calculate_annual_volatility()
-        self.calculate_sharpe_ratio()
-        self.calculate_max_drawdown()
-        self.calculate_1year_max_drawdown()
-
-    def save_to_excel(self, output_path: str):
+        """执行所有计算（结果保存到 self.metrics）"""
+        self.metrics = self.compute()
+
+    def build_tables(self, metrics: dict | None = None) -> dict:
+        """
+        构建单个产品的全部结果表（Excel各sheet、结果库共用）
+
+        Args:
+            metrics: compute() 返回的指标（可选，默认使用 run_all_calculations 保存的结果）
+
+        Returns:
+            dict: {表名: DataFrame}，带命名索引（year）的表写出时保留索引
+        """
+        return {
+            '业绩指标计算': self.build_metrics_df(metrics),
+            '年度收益率': self.get_annual_returns(),
+            '周频计算历史最大回撤': self.get_annual_max_drawdown(monthly=False),
+            '月频计算历史最大回撤': self.get_annual_max_drawdown(monthly=True),
+            '成立以来月度收益': self.get_monthly_return_matrix(),
+        }
+
+    def save_to_excel(self, output_path: str | BinaryIO):
         """
         保存单个产品的详细结果到Excel文件
 
         Args:
-            output_path: 输出文件路径
+            output_path: 输出文件路径或可写的二进制文件对象（如 BytesIO）
         """
-        metrics_df = self.build_metrics_df()
-        annual_returns_df = self.get_annual_returns()
-        weekly_dd = self.get_annual_max_drawdown(monthly=False)
-        monthly_dd = self.get_annual_max_drawdown(monthly=True)
-        monthly_matrix = self.get_monthly_return_matrix()
-
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            metrics_df.to_excel(writer, sheet_name='业绩指标计算', index=False)
-            annual_returns_df.to_excel(writer, sheet_name='年度收益率')
-            weekly_dd.to_excel(writer, sheet_name='周频计算历史最大回撤')
-            monthly_dd.to_excel(writer, sheet_name='月频计算历史最大回撤')
-            monthly_matrix.to_excel(writer, sheet_name='成立以来月度收益')
-
-            wb = writer.book
-            sheet_map = {
-                '业绩指标计算': metrics_df,
-                '年度收益率': annual_returns_df,
-                '周频计算历史最大回撤': weekly_dd,
-                '月频计算历史最大回撤': monthly_dd,
-                '成立以来月度收益': monthly_matrix
-            }
+        # 数值保留4位小数，year等整数列保持整数格式
+        write_tables(output_path, self.build_tables(), padding=4)
 
-            for sheet_name, df_tmp in sheet_map.items():
-                if df_tmp is None or df_tmp.empty:
-                    continue
-                ws = writer.sheets.get(sheet_name)
-                if ws is None:
-                    ws = wb[sheet_name]
-                tmp = df_tmp.reset_index()
-                for i, col in enumerate(tmp.columns, 1):
-                    try:
-                        # 计算该列数据的最大长度
-                        max_data_len = tmp[col].astype(str).map(len).max()
-                    except Exception:
-                        max_data_len = 0
-                    header_len = len(str(col))
-                    # 列宽 = max(数据最大长度, 表头长度) + 额外缓冲
-                    adjusted_width = max(max_data_len, header_len, 8) + 4
-                    col_letter = get_column_letter(i)
-                    ws.column_dimensions[col_letter].width = min(adjusted_width, 50)  # 最大50防止过长
-
-                # 设置数值格式（year列保持整数格式）
-                try:
-                    year_col_idx = None
-                    # 找到year列的位置
-                    for col_idx, col_name in enumerate(tmp.columns, 1):
-                        if str(col_name).lower() == 'year':
-                            year_col_idx = col_idx
-                            break
-                    for r in ws.iter_rows(min_row=2, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-                        for cell in r:
-                            if isinstance(cell.value, (int, float)):
-                                # year列保持整数格式
-                                if year_col_idx and cell.column == year_col_idx:
-                                    cell.number_format = '0'
-                                else:
-                                    cell.number_format = '0.0000'
-                except Exception:
-                    pass
-
-        print(f'已保存文件: {output_path}')
+        if isinstance(output_path, str):
+            print(f'已保存文件: {output_path}')
 
     def print_summary(self):
         """打印计算结果摘要"""
@@ -438,3 +440,18 @@ class ProductNetValueCalculator:
             print(f"最大回撤发生在{format_date(max_drawback_date)}，为{-max_drawback:.2%}")
         if max_drawback_1year is not None and max_drawback_date_1year is not None:
             print(f"近一年最大回撤发生在{format_date(max_drawback_date_1year)}，为{-max_drawback_1year:.2%}")
+
+        sortino_ratio = self.metrics.get('sortino_ratio')
+        calmar_ratio = self.metrics.get('calmar_ratio')
+        var_hist = self.metrics.get('var_hist')
+        cvar_hist = self.metrics.get('cvar_hist')
+        win_rate = self.metrics.get('win_rate')
+        period_name = FREQUENCY_NAMES[self.return_frequency]
+        if sortino_ratio is not None:
+            print(f"索提诺比率是{sortino_ratio:.4}")
+        if calmar_ratio is not None:
+            print(f"卡玛比率是{calmar_ratio:.4}")
+        if var_hist is not None and cvar_hist is not None:
+            print(f"{period_name}度历史VaR(95%)为{var_hist:.2%}，CVaR(95%)为{cvar_hist:.2%}")
+        if win_rate is not None:
+            print(f"{period_name}胜率为{win_rate:.2%}，最大连续亏损{self.metrics.get('max_losing_streak')}{period_name}")
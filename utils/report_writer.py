@@ -0,0 +1,140 @@
+"""结果工作簿并行输出 - 用进程池渲染各产品的结果工作簿，写入目录或流式写入一个ZIP"""
+import os
+import zipfile
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+from .excel_style import write_tables
+
+
+def render_workbook(tables: dict, padding: int = 4) -> bytes:
+    """
+    把结果表渲染为工作簿（进程池中执行，参数和返回值都可序列化）
+
+    Args:
+        tables: {工作表名: DataFrame}
+        padding: 额外缓冲宽度
+
+    Returns:
+        bytes: xlsx 文件内容
+    """
+    output = BytesIO()
+    write_tables(output, tables, padding=padding)
+    return output.getvalue()
+
+
+def combine_tables(products: list) -> dict:
+    """
+    把多个产品的同名结果表上下拼接为一个表（首列为产品名称、产品代码）
+
+    Args:
+        products: [(产品名称, 产品代码, {表名: DataFrame}), ...]
+
+    Returns:
+        dict: {表名: DataFrame}
+    """
+    combined = {}
+    for product_name, product_code, tables in products:
+        for name, df in tables.items():
+            frame = df.reset_index() if df.index.name is not None else df.copy()
+            frame.columns = [str(c) for c in frame.columns]
+            if '产品名称' not in frame.columns:
+                frame.insert(0, '产品名称', product_name)
+            if '产品代码' not in frame.columns:
+                frame.insert(1, '产品代码', product_code)
+            combined.setdefault(name, []).append(frame)
+    return {name: pd.concat(frames, ignore_index=True) for name, frames in combined.items()}
+
+
+class WorkbookReportWriter:
+    """
+    结果工作簿并行输出
+
+    主进程计算指标后只提交结果表，工作簿在进程池中渲染，按完成顺序写入输出目录或ZIP。
+    同时在途的任务数有上限（默认进程数的2倍），写出后即释放，内存占用与产品数量无关。
+    """
+
+    def __init__(self, output_dir: str | None = None, zip_path: str | None = None,
+                 workers: int | None = None, max_pending: int | None = None):
+        """
+        初始化输出器
+
+        Args:
+            output_dir: 输出目录（zip_path 为空时写入该目录）
+            zip_path: ZIP 文件路径（可选，指定时所有工作簿写入同一个ZIP）
+            workers: 进程数（默认 CPU 核数；1 表示在当前进程中顺序渲染）
+            max_pending: 最多同时在途的任务数（默认 workers * 2）
+        """
+        if not output_dir and not zip_path:
+            raise ValueError("必须指定输出目录或ZIP文件路径")
+        self.output_dir: str | None = output_dir
+        self.zip_path: str | None = zip_path
+        self.workers: int = max(1, workers or os.cpu_count() or 1)
+        self.max_pending: int = max_pending or self.workers * 2
+        self.written: list = []
+        self._pending: dict = {}
+        self._executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+        self._zip = None
+        if zip_path:
+            os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+            self._zip = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            os.makedirs(output_dir, exist_ok=True)  # type: ignore
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, name: str, data: bytes):
+        """写出一个已渲染的工作簿"""
+        if self._zip is not None:
+            self._zip.writestr(name, data)
+        else:
+            with open(os.path.join(self.output_dir, name), 'wb') as f:  # type: ignore
+                f.write(data)
+        self.written.append(name)
+
+    def _drain(self, block_until: int):
+        """写出已完成的任务，直到在途任务数不超过 block_until"""
+        while self._pending and len(self._pending) > block_until:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = self._pending.pop(future)
+                try:
+                    self._write(name, future.result())
+                except Exception as e:
+                    print(f"  ❌ 生成失败 {name}: {e}")
+
+    def submit(self, name: str, tables: dict, padding: int = 4):
+        """
+        提交一个工作簿
+
+        Args:
+            name: 文件名（ZIP 内或输出目录中的文件名）
+            tables: {工作表名: DataFrame}
+            padding: 额外缓冲宽度
+        """
+        if self._executor is None:
+            self._write(name, render_workbook(tables, padding))
+            return
+        self._drain(self.max_pending - 1)
+        self._pending[self._executor.submit(render_workbook, tables, padding)] = name
+
+    def close(self) -> list:
+        """
+        等待全部任务完成并关闭ZIP
+
+        Returns:
+            list: 已写出的文件名
+        """
+        self._drain(0)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        return self.written
@@ -0,0 +1,352 @@
+"""结果缓存 - 线程安全的LRU缓存，用于在多次请求之间复用计算结果"""
+import os
+import io
+import json
+import stat
+import time
+import hashlib
+import datetime
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# npz 直接保存的 numpy 列类型（布尔、整数、浮点、复数、日期时间、时间差）
+_ARRAY_KINDS = 'biufcmM'
+
+
+def _encode(value, arrays: dict):
+    """
+    把缓存值编码为可 JSON 序列化的结构，数值列和二进制内容放入 arrays
+
+    只支持 None/bool/数值/字符串/bytes/日期、dict/list/tuple 和 DataFrame 的组合，
+    其他类型抛出 TypeError（该值不写入磁盘缓存）。
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (int, float)):
+        return value if not isinstance(value, float) or np.isfinite(value) else {'t': 'float', 'v': repr(value)}
+    if isinstance(value, pd.Timestamp) or value is pd.NaT:
+        return {'t': 'ts', 'v': None if value is pd.NaT else value.isoformat()}
+    if isinstance(value, datetime.datetime):
+        return {'t': 'ts', 'v': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'t': 'date', 'v': value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        name = f"a{len(arrays)}"
+        arrays[name] = np.frombuffer(bytes(value), dtype=np.uint8)
+        return {'t': 'bytes', 'a': name}
+    if isinstance(value, (list, tuple)):
+        return {'t': 'list' if isinstance(value, list) else 'tuple', 'v': [_encode(v, arrays) for v in value]}
+    if isinstance(value, dict):
+        return {'t': 'dict', 'v': [[_encode(k, arrays), _encode(v, arrays)] for k, v in value.items()]}
+    if isinstance(value, pd.DataFrame):
+        if value.columns.nlevels > 1 or value.index.nlevels > 1:
+            raise TypeError("不支持多级索引的 DataFrame")
+        return {
+            't': 'frame',
+            'columns': _encode_index(value.columns, arrays),
+            'data': [_encode_column(value.iloc[:, i], arrays) for i in range(value.shape[1])],
+            'index': _encode_index(value.index, arrays),
+        }
+    raise TypeError(f"不支持写入磁盘缓存的类型: {type(value).__name__}")
+
+
+def _encode_column(values, arrays: dict):
+    """编码一列（numpy 数值/日期列放入 arrays，其他列逐个元素编码并记录 dtype）"""
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in _ARRAY_KINDS:
+        name = f"a{len(arrays)}"
+        arrays[name] = np.asarray(values)
+        return {'t': 'array', 'a': name}
+    items = [None if v is None or v is pd.NA or v is pd.NaT or (isinstance(v, float) and np.isnan(v))
+             else _encode(v, arrays) for v in values.to_numpy(dtype=object)]
+    return {'t': 'objects', 'dtype': str(dtype), 'v': items}
+
+
+def _encode_index(index: pd.Index, arrays: dict):
+    """编码行索引（RangeIndex 只记录起止）"""
+    name = _encode(index.name, arrays)
+    if isinstance(index, pd.RangeIndex):
+        return {'t': 'range', 'v': [index.start, index.stop, index.step], 'name': name}
+    return {'t': 'index', 'v': _encode_column(index.to_series(), arrays), 'name': name}
+
+
+def _decode(node, arrays):
+    """_encode 的逆操作"""
+    if not isinstance(node, dict):
+        return node
+    kind = node['t']
+    if kind == 'float':
+        return float(node['v'])
+    if kind == 'ts':
+        return pd.NaT if node['v'] is None else pd.Timestamp(node['v'])
+    if kind == 'date':
+        return datetime.date.fromisoformat(node['v'])
+    if kind == 'bytes':
+        return arrays[node['a']].tobytes()
+    if kind == 'list':
+        return [_decode(v, arrays) for v in node['v']]
+    if kind == 'tuple':
+        return tuple(_decode(v, arrays) for v in node['v'])
+    if kind == 'dict':
+        return {_decode(k, arrays): _decode(v, arrays) for k, v in node['v']}
+    if kind == 'frame':
+        index = _decode_index(node['index'], arrays)
+        data = {i: _decode_column(column, arrays, index) for i, column in enumerate(node['data'])}
+        frame = pd.DataFrame(data, index=index)
+        frame.columns = _decode_index(node['columns'], arrays)
+        return frame
+    raise ValueError(f"未知的缓存数据类型: {kind}")
+
+
+def _decode_column(node, arrays, index=None) -> pd.Series:
+    """_encode_column 的逆操作"""
+    if node['t'] == 'array':
+        return pd.Series(arrays[node['a']], index=index, copy=False)
+    series = pd.Series([_decode(v, arrays) for v in node['v']], index=index, dtype=object)
+    return series if node['dtype'] == 'object' else series.astype(node['dtype'])
+
+
+def _decode_index(node, arrays) -> pd.Index:
+    """_encode_index 的逆操作"""
+    name = _decode(node['name'], arrays)
+    if node['t'] == 'range':
+        return pd.RangeIndex(*node['v'], name=name)
+    return pd.Index(_decode_column(node['v'], arrays), name=name)
+
+
+def dumps(value) -> bytes:
+    """
+    把缓存值序列化为 npz（结构为 JSON，数值列为 numpy 数组；不使用 pickle，读取时不会执行任何代码）
+
+    Args:
+        value: 缓存值（见 _encode 支持的类型）
+
+    Returns:
+        bytes: npz 文件内容
+    """
+    arrays = {}
+    meta = json.dumps(_encode(value, arrays), ensure_ascii=False, allow_nan=False)
+    arrays['meta'] = np.frombuffer(meta.encode('utf-8'), dtype=np.uint8)
+    output = io.BytesIO()
+    np.savez(output, **arrays)
+    return output.getvalue()
+
+
+def loads(data) -> object:
+    """
+    dumps 的逆操作（allow_pickle=False，含 pickle 对象的文件直接报错）
+
+    Args:
+        data: npz 文件内容或文件对象
+
+    Returns:
+        缓存值
+    """
+    source = io.BytesIO(data) if isinstance(data, (bytes, bytearray)) else data
+    with np.load(source, allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files}
+    return _decode(json.loads(arrays.pop('meta').tobytes().decode('utf-8')), arrays)
+
+
+def ensure_private_dir(directory: str) -> str:
+    """
+    创建（或检查）只有当前用户可访问的缓存目录
+
+    目录不存在时以 0700 创建；已存在时必须是当前用户拥有的真实目录（不是符号链接），
+    且组和其他用户没有任何权限，否则拒绝使用，避免其他用户预先放入缓存文件。
+
+    Args:
+        directory: 目录路径
+
+    Returns:
+        str: 目录的绝对路径
+    """
+    directory = os.path.abspath(directory)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"缓存目录不是真实目录（可能是符号链接）: {directory}")
+    if hasattr(os, 'getuid'):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"缓存目录不属于当前用户: {directory}")
+        if info.st_mode & 0o077:
+            raise PermissionError(f"缓存目录权限过宽（应为 0700）: {directory}，请执行 chmod 700 或换用其他目录")
+    return directory
+
+
+class DiskCache:
+    """
+    磁盘缓存 - 多个工作进程共享同一目录中的计算结果
+
+    每个键对应一个 npz 文件（见 dumps，不使用 pickle），先写临时文件再原子替换，
+    并发写入同一个键时读者只会看到完整的旧值或新值。
+    目录必须只有当前用户可访问（见 ensure_private_dir）；超过有效期的文件视为未命中，
+    每次写入后按有效期和总大小清理（先删最久未使用的文件）。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, ttl: float | None = 24 * 3600):
+        """
+        初始化磁盘缓存
+
+        Args:
+            directory: 缓存目录（不存在时以 0700 创建）
+            max_bytes: 缓存文件总大小上限（字节）
+            ttl: 有效期（秒，None 表示不过期）
+        """
+        self.directory: str = ensure_private_dir(directory)
+        self.max_bytes: int = max_bytes
+        self.ttl: float | None = ttl
+
+    def _path(self, key) -> str:
+        """缓存键对应的文件路径"""
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.npz")
+
+    def _expired(self, mtime: float, now: float) -> bool:
+        return self.ttl is not None and now - mtime > self.ttl
+
+    def get(self, key, default=None):
+        """读取缓存值（文件不存在、已过期或已损坏时返回 default）"""
+        path = self._path(key)
+        try:
+            if self._expired(os.path.getmtime(path), time.time()):
+                os.remove(path)
+                return default
+            with open(path, 'rb') as f:
+                value = loads(f.read())
+            os.utime(path)  # 记录最近使用时间，清理时按最久未使用淘汰
+            return value
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return default
+
+    def put(self, key, value):
+        """写入缓存值（不支持的类型或写入失败时忽略，不影响本次计算结果）"""
+        try:
+            data = dumps(value)
+        except (TypeError, ValueError):
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            return
+        self.evict()
+
+    def evict(self):
+        """删除过期文件；总大小超过上限时按最近使用时间从旧到新删除"""
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith('.npz'):
+                        continue
+                    try:
+                        info = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+        except OSError:
+            return
+
+        total = 0
+        for mtime, size, path in sorted(entries, reverse=True):
+            total += size
+            if self._expired(mtime, now) or total > self.max_bytes:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def __contains__(self, key) -> bool:
+        path = self._path(key)
+        try:
+            return not self._expired(os.path.getmtime(path), time.time())
+        except OSError:
+            return False
+
+
+class LRUCache:
+    """线程安全的LRU缓存（可选磁盘缓存作为多进程共享的二级缓存）"""
+
+    def __init__(self, max_size: int = 64, disk_dir: str | None = None, **disk_options):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最多缓存的条目数，超出时淘汰最久未使用的条目
+            disk_dir: 磁盘缓存目录（可选），多个工作进程指向同一目录即可共享结果
+            disk_options: 传给 DiskCache 的 max_bytes、ttl
+        """
+        self.max_size: int = max_size
+        self.disk: DiskCache | None = DiskCache(disk_dir, **disk_options) if disk_dir else None
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """获取缓存值（命中时标记为最近使用）"""
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        """写入缓存值"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def lookup(self, key):
+        """
+        只查询缓存（内存未命中时查磁盘缓存），不计算
+
+        Returns:
+            缓存值，都未命中时为None
+        """
+        value = self.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def get_or_create(self, key, factory):
+        """
+        获取缓存值，不存在时调用 factory() 计算并写入
+
+        内存未命中时先查磁盘缓存（其他工作进程可能已经算过），都未命中才计算。
+        计算过程不持有锁，同一个键并发未命中时可能重复计算，但结果一致。
+
+        Args:
+            key: 缓存键
+            factory: 无参数的计算函数
+
+        Returns:
+            缓存值
+        """
+        value = self.lookup(key)
+        if value is None:
+            value = factory()
+            self.put(key, value)
+            if self.disk is not None:
+                self.disk.put(key, value)
+        return value
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
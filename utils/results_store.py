@@ -0,0 +1,302 @@
+"""结果库 - 把批量计算的业绩指标和各结果表保存到SQLite，按产品代码直接查询"""
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+import pandas as pd
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    product_code    TEXT PRIMARY KEY,
+    product_name    TEXT,
+    latest_nav_date TEXT,
+    latest_nav      REAL,
+    source_file     TEXT,
+    file_hash       TEXT,
+    metrics_json    TEXT,
+    updated_at      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_products_file_hash ON products (file_hash);
+
+CREATE TABLE IF NOT EXISTS result_tables (
+    product_code TEXT NOT NULL,
+    table_name   TEXT NOT NULL,
+    payload_json TEXT NOT NULL,
+    PRIMARY KEY (product_code, table_name)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS nav_history (
+    product_code TEXT NOT NULL,
+    nav_date     TEXT NOT NULL,
+    unit_nav     REAL,
+    cum_nav      REAL,
+    PRIMARY KEY (product_code, nav_date)
+) WITHOUT ROWID;
+"""
+
+
+def _frame_to_json(df) -> str:
+    """DataFrame 转为 JSON 记录列表（命名索引作为普通列保留）"""
+    frame = df.reset_index() if df.index.name is not None else df
+    frame = frame.rename(columns=str)
+    return frame.to_json(orient='records', force_ascii=False, date_format='iso')
+
+
+def _nav_rows(product_code: str, nav: pd.DataFrame) -> list:
+    """以日期为索引的净值DataFrame转为 nav_history 的行（按日期升序）"""
+    nav = nav.sort_index()
+    unit_navs = pd.to_numeric(nav['单位净值'], errors='coerce')
+    cum_navs = pd.to_numeric(nav['累计净值'], errors='coerce')
+    return [
+        (product_code, date.strftime('%Y-%m-%d'),
+         None if pd.isna(unit_nav) else float(unit_nav), None if pd.isna(cum_nav) else float(cum_nav))
+        for date, unit_nav, cum_nav in zip(nav.index, unit_navs, cum_navs)
+    ]
+
+
+class ResultsStore:
+    """
+    SQLite 结果库
+
+    - products: 每个产品一行（最新净值、来源文件哈希、业绩指标）
+    - result_tables: (产品代码, 表名) -> 结果表 JSON
+    - nav_history: (产品代码, 日期) -> 净值
+
+    三张表都以产品代码为主键前缀，按产品查询为一次索引查找。
+    每个线程使用独立连接，数据库为 WAL 模式，批量写入时API仍可并发读取。
+    """
+
+    def __init__(self, db_path: str):
+        """
+        初始化结果库（不存在时自动创建）
+
+        Args:
+            db_path: SQLite 数据库文件路径
+        """
+        self.db_path: str = db_path
+        self._local = threading.local()
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(_SCHEMA)
+        conn.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        """当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def has_file(self, file_hash: str) -> bool:
+        """结果库中是否已有该文件内容的计算结果"""
+        row = self._connection().execute(
+            'SELECT 1 FROM products WHERE file_hash = ? LIMIT 1', (file_hash,)
+        ).fetchone()
+        return row is not None
+
+    def save_calculator(self, calculator, source_file: str | None = None, file_hash: str | None = None) -> str | None:
+        """
+        保存一个已完成计算的产品（业绩指标、各结果表、净值序列），同一事务内覆盖旧结果
+
+        Args:
+            calculator: 已执行 run_all_calculations 的 ProductNetValueCalculator
+            source_file: 来源文件路径（可选）
+            file_hash: 来源文件内容哈希（可选）
+
+        Returns:
+            str: 产品代码（文件中没有产品代码时不保存，返回None）
+        """
+        product_code = list(calculator.products.keys())[0] if calculator.products else None
+        if not product_code:
+            return None
+        product_name, latest_nav_date, latest_nav = calculator.get_product_info()
+        tables = calculator.build_tables()
+        metrics = json.loads(_frame_to_json(tables['业绩指标计算']))
+
+        nav_rows = _nav_rows(product_code, calculator.df)
+
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                '''INSERT OR REPLACE INTO products
+                   (product_code, product_name, latest_nav_date, latest_nav, source_file, file_hash, metrics_json, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                (product_code, product_name,
+                 latest_nav_date.strftime('%Y-%m-%d') if latest_nav_date is not None else None,
+                 float(latest_nav) if latest_nav is not None else None,
+                 os.path.abspath(source_file) if source_file else None, file_hash,
+                 json.dumps(metrics[0] if metrics else {}, ensure_ascii=False),
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+            conn.execute('DELETE FROM result_tables WHERE product_code = ?', (product_code,))
+            conn.executemany(
+                'INSERT INTO result_tables (product_code, table_name, payload_json) VALUES (?, ?, ?)',
+                [(product_code, name, _frame_to_json(df)) for name, df in tables.items()]
+            )
+            conn.execute('DELETE FROM nav_history WHERE product_code = ?', (product_code,))
+            conn.executemany(
+                'INSERT INTO nav_history (product_code, nav_date, unit_nav, cum_nav) VALUES (?, ?, ?, ?)',
+                nav_rows
+            )
+        return product_code
+
+    def list_products(self) -> list:
+        """全部产品的概要信息（按产品代码排序）"""
+        rows = self._connection().execute(
+            '''SELECT product_code, product_name, latest_nav_date, latest_nav, updated_at
+               FROM products ORDER BY product_code'''
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_product(self, product_code: str, tables: list | None = None) -> dict | None:
+        """
+        按产品代码查询业绩指标和结果表（一次索引查询）
+
+        Args:
+            product_code: 产品代码
+            tables: 只返回指定的结果表（可选，默认全部）
+
+        Returns:
+            dict: 产品信息、'metrics' 和 'tables'；产品不存在时为None
+        """
+        rows = self._connection().execute(
+            '''SELECT p.product_code, p.product_name, p.latest_nav_date, p.latest_nav,
+                      p.source_file, p.file_hash, p.metrics_json, p.updated_at,
+                      t.table_name, t.payload_json
+               FROM products p LEFT JOIN result_tables t ON t.product_code = p.product_code
+               WHERE p.product_code = ?''',
+            (product_code,)
+        ).fetchall()
+        if not rows:
+            return None
+
+        first = rows[0]
+        result = {key: first[key] for key in ('product_code', 'product_name', 'latest_nav_date', 'latest_nav',
+                                              'source_file', 'updated_at')}
+        result['metrics'] = json.loads(first['metrics_json'] or '{}')
+        result['tables'] = {
+            row['table_name']: json.loads(row['payload_json'])
+            for row in rows
+            if row['table_name'] is not None and (tables is None or row['table_name'] in tables)
+        }
+        return result
+
+    def get_nav_history(self, product_code: str, start_date: str | None = None,
+                        end_date: str | None = None) -> list:
+        """
+        查询产品的净值序列（按日期升序，主键范围扫描）
+
+        Args:
+            product_code: 产品代码
+            start_date: 开始日期（YYYY-MM-DD，可选）
+            end_date: 结束日期（YYYY-MM-DD，可选）
+
+        Returns:
+            list: [{'date', 'unit_nav', 'cum_nav'}, ...]
+        """
+        rows = self._connection().execute(
+            '''SELECT nav_date, unit_nav, cum_nav FROM nav_history
+               WHERE product_code = ? AND nav_date >= ? AND nav_date <= ?
+               ORDER BY nav_date''',
+            (product_code, start_date or '0000-00-00', end_date or '9999-99-99')
+        ).fetchall()
+        return [{'date': row['nav_date'], 'unit_nav': row['unit_nav'], 'cum_nav': row['cum_nav']} for row in rows]
+
+    def get_nav_frame(self, product_code: str, start_date: str | None = None,
+                      end_date: str | None = None) -> pd.DataFrame:
+        """
+        查询产品的净值序列，格式与 parse_nav_sheet 相同（以日期为索引、按日期升序）
+
+        Args:
+            product_code: 产品代码
+            start_date: 开始日期（YYYY-MM-DD，可选）
+            end_date: 结束日期（YYYY-MM-DD，可选）
+
+        Returns:
+            pd.DataFrame: 列为 单位净值、累计净值
+        """
+        history = self.get_nav_history(product_code, start_date, end_date)
+        frame = pd.DataFrame(history, columns=['date', 'unit_nav', 'cum_nav'])
+        frame = frame.rename(columns={'date': '日期', 'unit_nav': '单位净值', 'cum_nav': '累计净值'})
+        frame['日期'] = pd.to_datetime(frame['日期'])
+        return frame.set_index('日期')
+
+    def ingest_nav_file(self, file_path: str) -> dict:
+        """
+        增量写入净值文件中的新增净值
+
+        按来源文件找到已保存的产品，只读取倒序文件顶部晚于已保存最新日期的行（见 read_nav_head），
+        追加到 nav_history 并更新产品的最新净值；已保存的业绩指标和结果表不变（需重新计算时仍用 save_calculator）。
+        第一次写入的文件完整读取。
+
+        Args:
+            file_path: 净值文件路径
+
+        Returns:
+            dict: {'product_code', 'product_name', 'new_rows', 'latest_nav_date', 'latest_nav'}
+        """
+        from .nav_loader import read_nav_head
+
+        source_file = os.path.abspath(file_path)
+        conn = self._connection()
+        row = conn.execute(
+            '''SELECT p.product_code, MAX(h.nav_date) AS last_date
+               FROM products p LEFT JOIN nav_history h ON h.product_code = p.product_code
+               WHERE p.source_file = ? GROUP BY p.product_code''',
+            (source_file,)
+        ).fetchone()
+        stop_date = row['last_date'] if row is not None else None
+
+        product_name, product_code, new_df = read_nav_head(file_path, stop_date=stop_date)
+        if row is not None and product_code != row['product_code']:
+            # 文件已换成其他产品，按新产品完整读取
+            product_name, product_code, new_df = read_nav_head(file_path)
+        if not product_code or product_code == 'nan':
+            raise ValueError(f"文件中没有产品代码: {file_path}")
+
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        with conn:
+            if len(new_df):
+                conn.executemany(
+                    '''INSERT OR REPLACE INTO nav_history (product_code, nav_date, unit_nav, cum_nav)
+                       VALUES (?, ?, ?, ?)''',
+                    _nav_rows(product_code, new_df)
+                )
+            latest = conn.execute(
+                '''SELECT nav_date, unit_nav FROM nav_history WHERE product_code = ?
+                   ORDER BY nav_date DESC LIMIT 1''',
+                (product_code,)
+            ).fetchone()
+            latest_date = latest['nav_date'] if latest is not None else None
+            latest_nav = latest['unit_nav'] if latest is not None else None
+            updated = conn.execute(
+                '''UPDATE products SET product_name = ?, latest_nav_date = ?, latest_nav = ?, source_file = ?,
+                   updated_at = ? WHERE product_code = ?''',
+                (product_name, latest_date, latest_nav, source_file, updated_at, product_code)
+            )
+            if updated.rowcount == 0:
+                conn.execute(
+                    '''INSERT INTO products (product_code, product_name, latest_nav_date, latest_nav, source_file,
+                       updated_at) VALUES (?, ?, ?, ?, ?, ?)''',
+                    (product_code, product_name, latest_date, latest_nav, source_file, updated_at)
+                )
+
+        return {
+            'product_code': product_code,
+            'product_name': product_name,
+            'new_rows': len(new_df),
+            'latest_nav_date': latest_date,
+            'latest_nav': latest_nav,
+        }
@@ -0,0 +1,87 @@
+"""收益率序列 - 按频率重采样净值并缓存各频率的收益率"""
+import numpy as np
+import pandas as pd
+from .trading_calendar import PERIODS_PER_YEAR
+
+# 重采样规则：周度取每周五（周内最后一个净值），月度取月末；日度直接使用每个净值日
+RESAMPLE_RULES = {'D': None, 'W': 'W-FRI', 'M': 'ME'}
+
+# 收益率频率的中文名称
+FREQUENCY_NAMES = {'D': '日', 'W': '周', 'M': '月'}
+
+
+def check_frequency(frequency: str):
+    """检查收益率频率是否受支持"""
+    if frequency not in RESAMPLE_RULES:
+        raise ValueError(f"不支持的频率: {frequency}. 可用频率: {list(RESAMPLE_RULES.keys())}")
+
+
+def resample_nav(nav: pd.Series, frequency: str = 'W') -> pd.Series:
+    """
+    将净值序列重采样到指定频率（每期取最后一个净值）
+
+    Args:
+        nav: 以日期为索引的净值序列（顺序不限）
+        frequency: 收益率频率（'D' 日度, 'W' 周度, 'M' 月度）
+
+    Returns:
+        pd.Series: 升序排列的每期期末净值
+    """
+    check_frequency(frequency)
+    nav = nav.astype(float).sort_index()
+    rule = RESAMPLE_RULES[frequency]
+    if rule is None:
+        return nav[~nav.index.duplicated(keep='last')].dropna()
+    return nav.resample(rule).last().dropna()
+
+
+class ReturnSeries:
+    """
+    收益率序列
+
+    同一产品的净值只排序一次，各频率的期末净值和收益率在第一次使用时计算并缓存，
+    波动率、夏普、索提诺等指标共用同一份收益率。
+    缓存只会写入相同的计算结果，多个线程同时使用时最多重复计算一次，无需加锁。
+    """
+
+    def __init__(self, nav: pd.Series):
+        """
+        初始化收益率序列
+
+        Args:
+            nav: 以日期为索引的单位净值序列（顺序不限）
+        """
+        self.nav: pd.Series = nav.astype(float).sort_index()
+        self._navs: dict = {}
+        self._returns: dict = {}
+
+    def period_nav(self, frequency: str = 'W') -> pd.Series:
+        """指定频率的期末净值（计算一次后缓存）"""
+        if frequency not in self._navs:
+            self._navs[frequency] = resample_nav(self.nav, frequency)
+        return self._navs[frequency]
+
+    def returns(self, frequency: str = 'W') -> pd.Series:
+        """
+        指定频率的收益率（计算一次后缓存）
+
+        Args:
+            frequency: 收益率频率（'D' 日度, 'W' 周度, 'M' 月度）
+
+        Returns:
+            pd.Series: 按时间正序排列、以期末日期为索引的收益率（不含第一期）
+        """
+        if frequency not in self._returns:
+            nav = self.period_nav(frequency)
+            self._returns[frequency] = nav.pct_change().iloc[1:]
+        return self._returns[frequency]
+
+    def values(self, frequency: str = 'W') -> np.ndarray:
+        """指定频率收益率的 numpy 数组"""
+        return self.returns(frequency).to_numpy(dtype=float)
+
+    @staticmethod
+    def periods_per_year(frequency: str = 'W') -> int:
+        """指定频率的年化因子"""
+        check_frequency(frequency)
+        return PERIODS_PER_YEAR[frequency]
@@ -0,0 +1,111 @@
+"""风险指标计算 - 基于周期收益率数组一次性计算全部风险指标"""
+import math
+from statistics import NormalDist
+import numpy as np
+
+
+# 风险指标：metrics键 -> 业绩指标表中的列名
+RISK_METRIC_COLUMNS = {
+    'sortino_ratio': '索提诺比率',
+    'calmar_ratio': '卡玛比率',
+    'downside_deviation': '下行波动率',
+    'var_hist': '历史VaR(95%)',
+    'cvar_hist': '历史CVaR(95%)',
+    'var_param': '参数VaR(95%)',
+    'cvar_param': '参数CVaR(95%)',
+    'skewness': '偏度',
+    'kurtosis': '峰度',
+    'win_rate': '胜率',
+    'max_losing_streak': '最大连续亏损期数',
+}
+
+# 以百分比展示的风险指标列
+RISK_PERCENT_COLUMNS = ['下行波动率', '历史VaR(95%)', '历史CVaR(95%)', '参数VaR(95%)', '参数CVaR(95%)', '胜率']
+
+
+def _quantile_sorted(sorted_returns: np.ndarray, q: float) -> float:
+    """在已排序数组上做线性插值分位数（与 numpy 默认方法一致）"""
+    pos = q * (len(sorted_returns) - 1)
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(sorted_returns) - 1)
+    return float(sorted_returns[lo] + (pos - lo) * (sorted_returns[hi] - sorted_returns[lo]))
+
+
+def _max_run_length(flags: np.ndarray) -> int:
+    """布尔数组中最长连续 True 的长度"""
+    if not flags.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return int((ends - starts).max())
+
+
+def compute_risk_metrics(returns, periods_per_year: int = 52, risk_free_rate: float = 0.02,
+                         annual_return: float | None = None, max_drawdown: float | None = None,
+                         confidence: float = 0.95) -> dict:
+    """
+    计算风险指标
+
+    VaR/CVaR 以收益率表示（亏损为负数），与最大回撤的符号一致。
+
+    Args:
+        returns: 按时间正序排列的周期收益率
+        periods_per_year: 每年周期数（周收益率为52）
+        risk_free_rate: 无风险利率（年化）
+        annual_return: 年化收益率（计算索提诺、卡玛比率使用）
+        max_drawdown: 最大回撤（负数，计算卡玛比率使用）
+        confidence: VaR/CVaR 置信水平
+
+    Returns:
+        dict: 键见 RISK_METRIC_COLUMNS，无法计算的指标为 None
+    """
+    metrics = {key: None for key in RISK_METRIC_COLUMNS}
+    r = np.asarray(returns, dtype=float)
+    r = r[np.isfinite(r)]
+    n = len(r)
+    if n < 2:
+        return metrics
+
+    # 中心矩：一次计算均值、方差、偏度、峰度
+    mean = r.mean()
+    centered = r - mean
+    sq = centered * centered
+    m2 = sq.mean()
+    m3 = (sq * centered).mean()
+    m4 = (sq * sq).mean()
+    std = math.sqrt(m2 * n / (n - 1))
+    if m2 > 0:
+        metrics['skewness'] = float(m3 / m2 ** 1.5)
+        metrics['kurtosis'] = float(m4 / m2 ** 2 - 3)  # 超额峰度
+
+    # 下行波动率（目标收益率为0）与索提诺比率
+    downside = np.minimum(r, 0.0)
+    downside_deviation = math.sqrt((downside * downside).mean()) * math.sqrt(periods_per_year)
+    metrics['downside_deviation'] = downside_deviation
+    if annual_return is not None and downside_deviation > 0:
+        metrics['sortino_ratio'] = (annual_return - risk_free_rate) / downside_deviation
+
+    # 卡玛比率
+    if annual_return is not None and max_drawdown:
+        metrics['calmar_ratio'] = annual_return / abs(max_drawdown)
+
+    # 历史VaR/CVaR：共用一次排序结果
+    alpha = 1 - confidence
+    sorted_returns = np.sort(r)
+    metrics['var_hist'] = _quantile_sorted(sorted_returns, alpha)
+    tail_count = max(1, int(math.ceil(alpha * n)))
+    metrics['cvar_hist'] = float(sorted_returns[:tail_count].mean())
+
+    # 参数法（正态分布）VaR/CVaR
+    if std > 0:
+        normal = NormalDist()
+        z = normal.inv_cdf(alpha)
+        metrics['var_param'] = float(mean + z * std)
+        metrics['cvar_param'] = float(mean - std * normal.pdf(z) / alpha)
+
+    # 胜率与最大连续亏损期数
+    metrics['win_rate'] = float((r > 0).mean())
+    metrics['max_losing_streak'] = _max_run_length(r < 0)
+
+    return metrics
@@ -0,0 +1,345 @@
+"""买入规则表达式 - 用简单的表达式组合买入规则，编译为交易日索引上的向量化掩码
+
+示例:
+    last(M)                      每月最后一个交易日
+    nth_weekday(2, 1)            每月第二个周二
+    roll(day(20))                每月20日，遇非交易日顺延到当月下一个交易日
+    every(2, fri)                隔周五（从第一个符合的周五起每隔一次）
+    (fri | day(1)) & !month(2)   每周五或每月1日，但2月除外
+    weekday(0) & between(2020-01-01, 2024-12-31)
+
+运算符: & / and（且）、| / or（或）、! / not（非），括号改变优先级（非 > 且 > 或）
+"""
+import re
+import numpy as np
+import pandas as pd
+from .buy_rules import BuyRule
+from .trading_calendar import TradingCalendar
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<date>\d{4}-\d{2}-\d{2}|\d{8}(?![\d]))
+      | (?P<number>-?\d+)
+      | (?P<name>[A-Za-z_][A-Za-z_0-9]*)
+      | (?P<op>[&|!~(),])
+    )""", re.VERBOSE)
+
+_WEEKDAY_ALIASES = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+_PERIODS = ('W', 'M', 'Q', 'Y')
+
+
+def _tokenize(text: str) -> list:
+    """把表达式拆成 (类型, 值) 列表"""
+    tokens, position = [], 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"规则表达式第 {position + 1} 个字符无法识别: {text[position:]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)  # type: ignore
+        if kind == 'name' and value.lower() in ('and', 'or', 'not'):
+            kind, value = 'op', {'and': '&', 'or': '|', 'not': '!'}[value.lower()]
+        tokens.append((kind, '!' if value == '~' else value))
+        position = match.end()
+    return tokens
+
+
+def _normalized(dates: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(dates).normalize()
+
+
+def _to_timestamp(value) -> pd.Timestamp:
+    text = str(value)
+    return pd.Timestamp(text if '-' in text else pd.to_datetime(text, format='%Y%m%d'))
+
+
+def _to_period(value) -> str:
+    period = str(value).upper()
+    if period not in _PERIODS:
+        raise ValueError(f"周期必须是 {'/'.join(_PERIODS)} 之一: {value}")
+    return period
+
+
+def _to_weekday(value) -> int:
+    if isinstance(value, str) and value.lower() in _WEEKDAY_ALIASES:
+        return _WEEKDAY_ALIASES[value.lower()]
+    weekday = int(value)
+    if not 0 <= weekday <= 6:
+        raise ValueError("weekday 必须在 0-6 之间（0=周一, 6=周日）")
+    return weekday
+
+
+# 每个节点都是 (dates, calendar) -> 与 dates 等长的布尔数组
+def _weekday_node(*weekdays):
+    values = [_to_weekday(w) for w in weekdays] or [4]
+    return lambda dates, calendar: np.isin(dates.weekday, values)
+
+
+def _day_node(*days):
+    if not days:
+        raise ValueError("day 需要至少一个日期，如 day(20) 或 day(-1)")
+    values = [int(d) for d in days]
+    positive = [d for d in values if d > 0]
+    negative = [d for d in values if d < 0]
+
+    def node(dates, calendar):
+        mask = np.isin(dates.day, positive)
+        if negative:
+            # 负数从月末倒数：-1 为当月最后一个自然日
+            from_end = np.asarray(dates.day - dates.days_in_month - 1)
+            mask |= np.isin(from_end, negative)
+        return mask
+    return node
+
+
+def _month_node(*months):
+    values = [int(m) for m in months]
+    if not values or not all(1 <= m <= 12 for m in values):
+        raise ValueError("month 需要 1-12 之间的月份，如 month(3, 6, 9, 12)")
+    return lambda dates, calendar: np.isin(dates.month, values)
+
+
+def _nth_weekday_node(n, weekday):
+    n, weekday = int(n), _to_weekday(weekday)
+    if n == 0 or not -5 <= n <= 5:
+        raise ValueError("nth_weekday 的第一个参数为 1-5（第几个）或 -1 到 -5（倒数第几个）")
+
+    def node(dates, calendar):
+        if n > 0:
+            nth = np.asarray((dates.day - 1) // 7 + 1)
+        else:
+            nth = -np.asarray((dates.days_in_month - dates.day) // 7 + 1)
+        return np.asarray(dates.weekday == weekday) & (nth == n)
+    return node
+
+
+def _date_node(*values):
+    targets = pd.DatetimeIndex([_to_timestamp(v) for v in values])
+    return lambda dates, calendar: np.asarray(_normalized(dates).isin(targets))
+
+
+def _after_node(value):
+    start = _to_timestamp(value)
+    return lambda dates, calendar: np.asarray(_normalized(dates) >= start)
+
+
+def _before_node(value):
+    end = _to_timestamp(value)
+    return lambda dates, calendar: np.asarray(_normalized(dates) <= end)
+
+
+def _between_node(start, end):
+    after, before = _after_node(start), _before_node(end)
+    return lambda dates, calendar: after(dates, calendar) & before(dates, calendar)
+
+
+def _all_node():
+    return lambda dates, calendar: np.ones(len(dates), dtype=bool)
+
+
+def _period_edge_node(edge: str):
+    def build(period='M'):
+        freq = _to_period(period)
+
+        def node(dates, calendar):
+            positions = calendar.period_starts(freq) if edge == 'first' else calendar.period_ends(freq)
+            return np.asarray(_normalized(dates).isin(calendar.days[positions]))
+        return node
+    return build
+
+
+def _roll_node(inner, period='M'):
+    freq = _to_period(period)
+
+    def node(dates, calendar):
+        if len(dates) == 0 or len(calendar) == 0:
+            return np.zeros(len(dates), dtype=bool)
+        # 在覆盖数据范围的自然日上找到规则日期，再顺延到同一周期内的下一个交易日
+        first_day = min(dates[0], calendar.days[0]).to_period(freq).start_time
+        natural_days = pd.date_range(first_day, max(dates[-1], calendar.days[-1]).normalize(), freq='D')
+        rule_days = natural_days[inner(natural_days, calendar)]
+        positions = calendar.roll_forward(rule_days, within=freq)
+        return np.asarray(_normalized(dates).isin(calendar.days[positions[positions >= 0]]))
+    return node
+
+
+def _every_node(step, inner, anchor=None):
+    step = int(step)
+    if step < 1:
+        raise ValueError("every 的间隔必须为正整数")
+    anchor_date = _to_timestamp(anchor) if anchor is not None else None
+
+    def node(dates, calendar):
+        matched = inner(dates, calendar)
+        positions = np.flatnonzero(matched)
+        # 从锚定日期（默认第一个符合的日期）起，每 step 次取一次
+        start = 0 if anchor_date is None else int(np.searchsorted(_normalized(dates)[positions], anchor_date))
+        order = np.arange(len(positions))
+        keep = (order >= start) & ((order - start) % step == 0)
+        mask = np.zeros(len(dates), dtype=bool)
+        mask[positions[keep]] = True
+        return mask
+    return node
+
+
+# 函数名 -> (构造函数, 参数中哪些位置是子表达式)
+_FUNCTIONS = {
+    'weekday': (_weekday_node, ()),
+    'day': (_day_node, ()),
+    'month': (_month_node, ()),
+    'nth_weekday': (_nth_weekday_node, ()),
+    'date': (_date_node, ()),
+    'after': (_after_node, ()),
+    'before': (_before_node, ()),
+    'between': (_between_node, ()),
+    'all': (_all_node, ()),
+    'first': (_period_edge_node('first'), ()),
+    'last': (_period_edge_node('last'), ()),
+    'roll': (_roll_node, (0,)),
+    'every': (_every_node, (1,)),
+}
+
+
+class _Parser:
+    """递归下降解析：or := and ('|' and)*；and := not ('&' not)*；not := '!' not | atom"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, token = self.peek()
+        if kind is None or (value is not None and token != value):
+            expected = f"'{value}'" if value else '表达式'
+            raise ValueError(f"规则表达式不完整或有误，此处需要 {expected}: {self.text}")
+        self.position += 1
+        return kind, token
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"规则表达式在 {self.peek()[1]!r} 处有多余内容: {self.text}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == ('op', '|'):
+            self.take()
+            nodes.append(self.parse_and())
+        if len(nodes) == 1:
+            return nodes[0]
+        return lambda dates, calendar: np.logical_or.reduce([n(dates, calendar) for n in nodes])
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == ('op', '&'):
+            self.take()
+            nodes.append(self.parse_not())
+        if len(nodes) == 1:
+            return nodes[0]
+        return lambda dates, calendar: np.logical_and.reduce([n(dates, calendar) for n in nodes])
+
+    def parse_not(self):
+        if self.peek() == ('op', '!'):
+            self.take()
+            inner = self.parse_not()
+            return lambda dates, calendar: ~inner(dates, calendar)
+        return self.parse_atom()
+
+    def parse_atom(self):
+        kind, token = self.take()
+        if token == '(' and kind == 'op':
+            node = self.parse_or()
+            self.take(')')
+            return node
+        if kind != 'name':
+            raise ValueError(f"规则表达式在 {token!r} 处有误: {self.text}")
+
+        name = token.lower()
+        if name in _WEEKDAY_ALIASES:
+            return _weekday_node(name)
+        if name not in _FUNCTIONS:
+            raise ValueError(f"未知的规则函数: {token}. 可用: {', '.join(list(_FUNCTIONS) + list(_WEEKDAY_ALIASES))}")
+
+        builder, expression_args = _FUNCTIONS[name]
+        args = []
+        if self.peek() == ('op', '('):
+            self.take()
+            while self.peek() != ('op', ')'):
+                if len(args) in expression_args:
+                    args.append(self.parse_or())
+                else:
+                    _, value = self.take()
+                    if value in ('(', ')', ',', '&', '|', '!'):
+                        raise ValueError(f"{name} 的参数有误: {self.text}")
+                    args.append(value)
+                if self.peek() != ('op', ')'):
+                    self.take(',')
+            self.take(')')
+        try:
+            return builder(*args)
+        except TypeError:
+            raise ValueError(f"{name} 的参数个数有误: {self.text}") from None
+
+
+def compile_rule(expression: str):
+    """
+    编译规则表达式
+
+    Args:
+        expression: 规则表达式
+
+    Returns:
+        callable: (dates, calendar) -> 布尔掩码
+    """
+    if not expression or not expression.strip():
+        raise ValueError("规则表达式不能为空")
+    return _Parser(expression).parse()
+
+
+class ExprRule(BuyRule):
+    """表达式买入规则 - 表达式在创建时编译一次，之后每次只计算一个向量化掩码"""
+
+    def __init__(self, expression: str):
+        """
+        初始化表达式买入规则
+
+        Args:
+            expression: 规则表达式（见模块说明）
+        """
+        self.expression: str = expression.strip()
+        self._mask = compile_rule(self.expression)
+
+    def should_buy(self, date, available_dates: set) -> bool:
+        """
+        判断是否应该买入（在全部可用交易日上计算掩码后查询）
+
+        Args:
+            date: 要判断的日期
+            available_dates: 所有可用的交易日集合
+
+        Returns:
+            bool: 是否应该买入
+        """
+        trading_days = pd.DatetimeIndex(sorted(available_dates))
+        bought = trading_days[self.get_buy_mask(trading_days)]
+        return pd.Timestamp(date).normalize() in _normalized(bought)
+
+    def match_dates(self, dates: pd.DatetimeIndex) -> np.ndarray:
+        """向量化规则判断（给定日期同时视为交易日）"""
+        return self.get_buy_mask(dates)
+
+    def get_buy_mask(self, trading_days: pd.DatetimeIndex,
+                     calendar: TradingCalendar | None = None) -> np.ndarray:
+        """在交易日索引上计算买入掩码"""
+        trading_days = pd.DatetimeIndex(trading_days)
+        calendar = calendar or TradingCalendar(trading_days)
+        return np.asarray(self._mask(trading_days, calendar), dtype=bool)
+
+    def get_rule_name(self) -> str:
+        return f"表达式规则({self.expression})"
@@ -0,0 +1,156 @@
+"""运行清单 - 记录批量处理进度，支持断点续跑"""
+import os
+import json
+import hashlib
+from datetime import datetime
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的SHA256哈希
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 分块读取大小
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_sha256(data: bytes) -> str:
+    """
+    计算内存中文件内容的SHA256哈希（与 file_sha256 对同一文件的结果一致）
+
+    Args:
+        data: 文件内容
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def _json_default(value):
+    """将numpy/pandas标量等转换为JSON可序列化的值"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class RunManifest:
+    """
+    运行清单
+
+    每个输入文件记录一条：内容哈希、计算参数、状态、输出路径以及可选的结果数据。
+    重新运行时，哈希和参数都一致且已完成的输入可以直接跳过。
+    """
+
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+
+    def __init__(self, manifest_path: str):
+        """
+        初始化运行清单
+
+        Args:
+            manifest_path: 清单文件路径（JSON）
+        """
+        self.manifest_path: str = manifest_path
+        self.entries: dict = {}
+        self._load()
+
+    def _load(self):
+        """读取已有清单（文件不存在或损坏时从空清单开始）"""
+        if not os.path.exists(self.manifest_path):
+            return
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.entries = data.get('entries', {})
+        except (OSError, ValueError) as e:
+            print(f"警告: 运行清单读取失败，将重新处理所有文件 - {e}")
+            self.entries = {}
+
+    @staticmethod
+    def entry_key(input_path: str) -> str:
+        """清单中的键（规范化的绝对路径）"""
+        return os.path.normcase(os.path.abspath(input_path))
+
+    def get_entry(self, input_path: str) -> dict | None:
+        """获取某个输入文件的清单记录"""
+        return self.entries.get(self.entry_key(input_path))
+
+    def is_completed(self, input_path: str, file_hash: str, params: dict) -> bool:
+        """
+        判断输入是否已按相同参数处理完成
+
+        Args:
+            input_path: 输入文件路径
+            file_hash: 当前文件内容哈希
+            params: 当前计算参数
+
+        Returns:
+            bool: 哈希、参数一致且输出文件仍存在时返回True
+        """
+        entry = self.get_entry(input_path)
+        if not entry or entry.get('status') != self.STATUS_COMPLETED:
+            return False
+        if entry.get('hash') != file_hash or entry.get('params') != params:
+            return False
+        output_path = entry.get('output_path')
+        if output_path and not os.path.exists(output_path):
+            return False
+        return True
+
+    def mark_completed(self, input_path: str, file_hash: str, params: dict,
+                       output_path: str | None = None, payload=None, save: bool = True):
+        """
+        记录处理成功，默认立即写回清单
+
+        Args:
+            input_path: 输入文件路径
+            file_hash: 文件内容哈希
+            params: 计算参数
+            output_path: 输出文件路径（可选）
+            payload: 需要复用的结果数据（可选，须可JSON序列化）
+            save: 是否立即写回清单（批量更新时可在最后统一调用save）
+        """
+        self.entries[self.entry_key(input_path)] = {
+            'input_path': input_path,
+            'hash': file_hash,
+            'params': params,
+            'status': self.STATUS_COMPLETED,
+            'output_path': output_path,
+            'payload': payload,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        if save:
+            self.save()
+
+    def mark_failed(self, input_path: str, file_hash: str, params: dict, error: str):
+        """记录处理失败，并立即写回清单"""
+        self.entries[self.entry_key(input_path)] = {
+            'input_path': input_path,
+            'hash': file_hash,
+            'params': params,
+            'status': self.STATUS_FAILED,
+            'error': error,
+            'updated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        self.save()
+
+    def save(self):
+        """原子写入清单文件（先写临时文件再替换，避免中断时损坏）"""
+        manifest_dir = os.path.dirname(self.manifest_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'entries': self.entries}, f, ensure_ascii=False, indent=2, default=_json_default)
+        os.replace(tmp_path, self.manifest_path)
@@ -2,11 +2,13 @@
 import os
 import glob
 import pandas as pd
-from openpyxl.utils import get_column_letter
 from .product_calculator import ProductNetValueCalculator
+from .risk_metrics import RISK_PERCENT_COLUMNS
+from .excel_style import excel_engine, style_sheet
 
 
-def process_single_file(file_path: str, output_dir: str | None = None, risk_free_rate: float = 0.02):
+def process_single_file(file_path: str, output_dir: str | None = None, risk_free_rate: float = 0.02,
+                        return_frequency: str = 'W'):
     """
     处理单个产品文件
 
@@ -14,26 +16,47 @@ def process_single_file(file_path: str, output_dir: str | None = None, risk_free
         file_path: Excel文件路径
         output_dir: 输出目录（可选）
         risk_free_rate: 无风险利率
+        return_frequency: 波动率、夏普、风险指标使用的收益率频率（'D'/'W'/'M'）
 
     Returns:
         业绩指标DataFrame
     """
+    calculator = run_single_file(file_path, output_dir, risk_free_rate, return_frequency)
+    return calculator.build_metrics_df()
+
+
+def run_single_file(file_path: str | pd.DataFrame, output_dir: str | None = None, risk_free_rate: float = 0.02,
+                    return_frequency: str = 'W', name: str | None = None) -> ProductNetValueCalculator:
+    """
+    处理单个产品文件并返回计算器（保留已解析的净值和指标，供常驻进程复用）
+
+    Args:
+        file_path: Excel文件路径，或多产品工作簿中已读入的原始sheet
+        output_dir: 输出目录（可选）
+        risk_free_rate: 无风险利率
+        return_frequency: 波动率、夏普、风险指标使用的收益率频率（'D'/'W'/'M'）
+        name: 显示和输出文件名使用的名称（默认取文件名；传入原始sheet时必须指定）
+
+    Returns:
+        ProductNetValueCalculator: 已完成全部计算的计算器
+    """
+    name = name or os.path.splitext(os.path.basename(file_path))[0]  # type: ignore
     print(f"\n{'='*60}")
-    print(f"正在处理: {os.path.basename(file_path)}")
+    print(f"正在处理: {name if isinstance(file_path, pd.DataFrame) else os.path.basename(file_path)}")
     print('='*60)
 
-    calculator = ProductNetValueCalculator(file_path=file_path, risk_free_rate=risk_free_rate)
+    calculator = ProductNetValueCalculator(file_path=file_path, risk_free_rate=risk_free_rate,
+                                           return_frequency=return_frequency)
     calculator.run_all_calculations()
     calculator.print_summary()
 
     # 保存详细结果
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
-        base_name = os.path.splitext(os.path.basename(file_path))[0]
-        output_path = os.path.join(output_dir, f"{base_name}_结果.xlsx")
+        output_path = os.path.join(output_dir, f"{name}_结果.xlsx")
         calculator.save_to_excel(output_path)
 
-    return calculator.build_metrics_df()
+    return calculator
 
 
 def generate_summary_file(all_metrics: list, output_path: str):
@@ -52,7 +75,7 @@ def generate_summary_file(all_metrics: list, output_path: str):
     summary_df = pd.concat(all_metrics, ignore_index=True)
 
     # 格式化数值列
-    for col in ['成立以来收益率', '年化收益率', '年化波动率', '夏普比率', '最大回撤', '近一年最大回撤']:
+    for col in ['成立以来收益率', '年化收益率', '年化波动率', '夏普比率', '最大回撤', '近一年最大回撤'] + RISK_PERCENT_COLUMNS:
         if col in summary_df.columns:
             summary_df[col] = summary_df[col].apply(
                 lambda x: f"{x:.2%}" if pd.notna(x) and isinstance(x, (int, float)) else x
@@ -72,14 +95,9 @@ def generate_summary_file(all_metrics: list, output_path: str):
     summary_df = summary_df.drop('_sort_key', axis=1)
 
     # 保存汇总文件
-    with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output_path, engine=excel_engine()) as writer:
         summary_df.to_excel(writer, sheet_name='业绩汇总', index=False)
-
-        # 调整列宽
-        ws = writer.sheets['业绩汇总']
-        for i, col in enumerate(summary_df.columns, 1):
-            max_len = max(len(str(col)), 15)
-            ws.column_dimensions[get_column_letter(i)].width = max_len + 2
+        style_sheet(writer, '业绩汇总', summary_df, min_width=15)
 
     print(f"\n汇总文件已保存: {output_path}")
     print("\n汇总预览:")
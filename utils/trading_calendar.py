@@ -0,0 +1,206 @@
+"""交易日历 - 预先计算的交易日数组，供买入规则和各计算器共用"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# 年化统一按自然日计算：年化收益率 = (1 + 区间收益率) ** (365 / 持有天数) - 1
+DAYS_PER_YEAR = 365
+
+# 按收益率频率的年化因子（波动率 × sqrt(因子)）
+PERIODS_PER_YEAR = {'D': 252, 'W': 52, 'M': 12}
+
+
+def annualize_return(total_return, days):
+    """
+    按自然日年化区间收益率（标量或数组均可）
+
+    Args:
+        total_return: 区间收益率
+        days: 持有天数（自然日）
+
+    Returns:
+        年化收益率；持有天数不大于0时为0
+    """
+    total_return = np.asarray(total_return, dtype=float)
+    days = np.asarray(days, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponent = np.divide(DAYS_PER_YEAR, days, out=np.zeros(np.broadcast(total_return, days).shape), where=days > 0)
+        result = np.where(days > 0, (1 + total_return) ** exponent - 1, 0.0)
+    return result.item() if result.ndim == 0 else result
+
+
+class TradingCalendar:
+    """
+    交易日历
+
+    交易日保存为升序数组，同时预先计算覆盖首尾交易日之间每个自然日的查找表，
+    下一个/上一个交易日查询为 O(1)（超出范围时退化为 O(log n) 二分查找）。
+    周/月/年末交易日表按需计算一次后缓存。
+    """
+
+    def __init__(self, trading_days):
+        """
+        初始化交易日历
+
+        Args:
+            trading_days: 交易日序列（如净值数据的日期索引），顺序和重复不限
+        """
+        days = pd.DatetimeIndex(pd.to_datetime(list(trading_days))).normalize().unique().sort_values()
+        self.days: pd.DatetimeIndex = days
+        self._ordinals = days.values.astype('datetime64[D]').astype(np.int64)
+        self._period_ends: dict = {}
+        self._period_starts: dict = {}
+
+        if len(days) == 0:
+            self._origin = 0
+            self._count_le = np.zeros(0, dtype=np.int64)
+            self._is_trading = np.zeros(0, dtype=bool)
+            return
+
+        # 查找表：相对首个交易日的偏移 -> 不晚于该日的交易日个数
+        self._origin = int(self._ordinals[0])
+        span = int(self._ordinals[-1]) - self._origin + 1
+        self._is_trading = np.zeros(span, dtype=bool)
+        self._is_trading[self._ordinals - self._origin] = True
+        self._count_le = np.cumsum(self._is_trading)
+
+    @classmethod
+    def from_holiday_file(cls, holiday_path: str, start_date, end_date) -> 'TradingCalendar':
+        """
+        由节假日文件生成交易日历（工作日剔除节假日）
+
+        节假日文件可以是每行一个日期的文本文件（YYYYMMDD 或 YYYY-MM-DD），
+        也可以是第一列为日期的Excel文件。
+
+        Args:
+            holiday_path: 节假日文件路径
+            start_date: 日历开始日期
+            end_date: 日历结束日期
+
+        Returns:
+            TradingCalendar: 交易日历
+        """
+        if holiday_path.lower().endswith(('.xlsx', '.xls', '.xlsm')):
+            raw = pd.read_excel(holiday_path, header=None).iloc[:, 0].dropna().astype(str)
+        else:
+            with open(holiday_path, 'r', encoding='utf-8') as f:
+                raw = pd.Series([line.strip() for line in f if line.strip() and not line.startswith('#')])
+        holidays = pd.DatetimeIndex(pd.to_datetime(raw.str.replace('-', '').str.slice(0, 8), format='%Y%m%d'))
+
+        weekdays = pd.bdate_range(pd.Timestamp(start_date), pd.Timestamp(end_date))
+        return cls(weekdays.difference(holidays))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def _to_ordinals(self, dates) -> np.ndarray:
+        """日期转为自然日序号"""
+        if isinstance(dates, (str, datetime, np.datetime64)):
+            dates = [dates]
+        values = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+        return values.values.astype('datetime64[D]').astype(np.int64)
+
+    def _count_not_after(self, ordinals: np.ndarray) -> np.ndarray:
+        """不晚于给定日期的交易日个数"""
+        offsets = ordinals - self._origin
+        inside = (offsets >= 0) & (offsets < len(self._count_le))
+        counts = np.searchsorted(self._ordinals, ordinals, side='right')
+        counts[inside] = self._count_le[offsets[inside]]
+        return counts
+
+    def is_trading_day(self, dates) -> np.ndarray:
+        """判断日期是否为交易日（向量化）"""
+        ordinals = self._to_ordinals(dates)
+        offsets = ordinals - self._origin
+        inside = (offsets >= 0) & (offsets < len(self._is_trading))
+        result = np.zeros(len(ordinals), dtype=bool)
+        result[inside] = self._is_trading[offsets[inside]]
+        return result
+
+    def next_index(self, dates) -> np.ndarray:
+        """
+        不早于给定日期的第一个交易日位置（向量化）
+
+        Returns:
+            np.ndarray: 交易日位置，没有后续交易日时为 len(self)
+        """
+        ordinals = self._to_ordinals(dates)
+        return self._count_not_after(ordinals) - self.is_trading_day(dates)
+
+    def prev_index(self, dates) -> np.ndarray:
+        """
+        不晚于给定日期的最后一个交易日位置（向量化）
+
+        Returns:
+            np.ndarray: 交易日位置，没有之前的交易日时为 -1
+        """
+        return self._count_not_after(self._to_ordinals(dates)) - 1
+
+    def next_trading_day(self, date):
+        """不早于给定日期的第一个交易日（没有时返回None）"""
+        pos = int(self.next_index([date])[0])
+        return self.days[pos] if pos < len(self.days) else None
+
+    def prev_trading_day(self, date):
+        """不晚于给定日期的最后一个交易日（没有时返回None）"""
+        pos = int(self.prev_index([date])[0])
+        return self.days[pos] if pos >= 0 else None
+
+    def roll_forward(self, dates, within: str | None = None) -> np.ndarray:
+        """
+        将日期顺延到下一个交易日（向量化）
+
+        Args:
+            dates: 日期序列
+            within: 顺延范围限制（'W' 同一周, 'M' 同一月, 'Y' 同一年；None 不限制）
+
+        Returns:
+            np.ndarray: 顺延后的交易日位置，无法顺延（超出范围或越过限制）时为 -1
+        """
+        dates = pd.DatetimeIndex(pd.to_datetime(dates)).normalize()
+        positions = self.next_index(dates)
+        valid = positions < len(self.days)
+        if within is not None and valid.any():
+            rolled = self.days[np.where(valid, positions, 0)]
+            valid &= np.asarray(rolled.to_period(within) == dates.to_period(within))
+        return np.where(valid, positions, -1)
+
+    def _period_codes(self, freq: str) -> np.ndarray:
+        """每个交易日所属周期的编号"""
+        return np.asarray(self.days.to_period(freq).asi8)
+
+    def period_ends(self, freq: str) -> np.ndarray:
+        """
+        每个周期最后一个交易日的位置（计算一次后缓存）
+
+        Args:
+            freq: 周期（'W' 周, 'M' 月, 'Y' 年）
+
+        Returns:
+            np.ndarray: 升序排列的交易日位置
+        """
+        if freq not in self._period_ends:
+            if len(self.days) == 0:
+                self._period_ends[freq] = np.zeros(0, dtype=np.int64)
+            else:
+                codes = self._period_codes(freq)
+                self._period_ends[freq] = np.append(np.flatnonzero(codes[1:] != codes[:-1]), len(codes) - 1)
+        return self._period_ends[freq]
+
+    def period_starts(self, freq: str) -> np.ndarray:
+        """
+        每个周期第一个交易日的位置（计算一次后缓存）
+
+        Args:
+            freq: 周期（'W' 周, 'M' 月, 'Y' 年）
+
+        Returns:
+            np.ndarray: 升序排列的交易日位置
+        """
+        if freq not in self._period_starts:
+            if len(self.days) == 0:
+                self._period_starts[freq] = np.zeros(0, dtype=np.int64)
+            else:
+                codes = self._period_codes(freq)
+                self._period_starts[freq] = np.insert(np.flatnonzero(codes[1:] != codes[:-1]) + 1, 0, 0)
+        return self._period_starts[freq]